@@ -8,9 +8,27 @@ import math
 
 from typing import Any
 
+import numpy as np
+
+from js import Window, Worker, window
 from pyodide import ffi
 
-from js import Window, window
+import loop
+import spatial
+import sprites
+import timestep
+import utils
+import workers
+
+from physics import (
+    FRICTION,
+    GRAVITY,
+    MAX_DIAMETER,
+    SLEEP_SECONDS,
+    SLEEP_SPEED,
+    SPRING,
+    BallArrays,
+)
 
 # Convenience
 p5js: Window = window
@@ -21,30 +39,61 @@ class Ball():
         self.x: float = x
         self.y: float = y
         self.diameter: float = dia
+        # px/second
         self.vx = 0.0
         self.vy = 0.0
+        # Position as of the previous simulation step, for `display()`
+        self.prev_x: float = x
+        self.prev_y: float = y
+        # With `?sleep=1` (see physics.SLEEP_SPEED): whether it's asleep,
+        # whether a collision this step woke it, and for how many seconds it's
+        # been slower than SLEEP_SPEED
+        self.asleep: bool = False
+        self.waking: bool = False
+        self.still: float = 0.0
 
-    def collide(self) -> None:
-        for other_ball in BALLS:
-            dx: float = other_ball.x - self.x
-            dy: float = other_ball.y - self.y
-            distance: float = math.sqrt(dx * dx + dy * dy)
-            min_dist: float = other_ball.diameter / 2 + self.diameter / 2
-            if (distance < min_dist):
-                angle: float = math.atan2(dy, dx)
-                targetX: float = self.x + math.cos(angle) * min_dist
-                targetY: float = self.y + math.sin(angle) * min_dist
-                ax: float = (targetX - other_ball.x) * SPRING
-                ay: float = (targetY - other_ball.y) * SPRING
+    def collide(self, other_ball: 'Ball', dt: float) -> None:
+        # Called once per candidate pair (see `step()`). Every ball used to
+        # check every other, so each overlapping pair got this push twice,
+        # once from each side: it's doubled here to keep the same response.
+        # A sleeping ball only takes a push that wakes it.
+        dx: float = other_ball.x - self.x
+        dy: float = other_ball.y - self.y
+        distance: float = math.sqrt(dx * dx + dy * dy)
+        min_dist: float = other_ball.diameter / 2 + self.diameter / 2
+        if (distance < min_dist):
+            angle: float = math.atan2(dy, dx)
+            targetX: float = self.x + math.cos(angle) * min_dist
+            targetY: float = self.y + math.sin(angle) * min_dist
+            ax: float = (targetX - other_ball.x) * SPRING * dt * 2
+            ay: float = (targetY - other_ball.y) * SPRING * dt * 2
+            kick: bool = math.hypot(ax, ay) > SLEEP_SPEED
+            if kick:
+                # Not woken until every pair's been seen, so the order the
+                # pairs come in doesn't matter
+                self.waking = other_ball.waking = True
+            if kick or not self.asleep:
                 self.vx -= ax
                 self.vy -= ay
+            if kick or not other_ball.asleep:
                 other_ball.vx += ax
                 other_ball.vy += ay
 
-    def move(self) -> None:
-        self.vy += GRAVITY
-        self.x += self.vx
-        self.y += self.vy
+    def touches(self, other_ball: 'Ball') -> bool:
+        return (math.hypot(other_ball.x - self.x, other_ball.y - self.y)
+                < other_ball.diameter / 2 + self.diameter / 2)
+
+    def move(self, dt: float) -> None:
+        self.prev_x = self.x
+        self.prev_y = self.y
+        if self.waking:
+            self.asleep = self.waking = False
+            self.still = 0.0
+        if self.asleep:
+            return
+        self.vy += GRAVITY * dt
+        self.x += self.vx * dt
+        self.y += self.vy * dt
         if self.x + self.diameter / 2 > WIDTH:
             self.x = WIDTH - self.diameter / 2
             self.vx *= FRICTION
@@ -59,39 +108,186 @@ class Ball():
             self.y = self.diameter / 2
             self.vy *= FRICTION
 
-    def display(self) -> None:
-        p5js.ellipse(self.x, self.y, self.diameter, self.diameter)
+        if SLEEP:
+            self.still = self.still + dt if math.hypot(self.vx, self.vy) < SLEEP_SPEED else 0.0
+            if self.still >= SLEEP_SECONDS:
+                self.asleep = True
+                self.vx = self.vy = 0.0
 
+    def display(self, alpha: float = 1.0) -> None:
+        # `alpha` of the way from the previous simulation step to the latest
+        x: float = self.prev_x + (self.x - self.prev_x) * alpha
+        y: float = self.prev_y + (self.y - self.prev_y) * alpha
+        if SPRITES is not None:
+            SPRITES.draw(x, y, self.diameter)
+            return
+        p5js.ellipse(x, y, self.diameter, self.diameter)
 
-NUM_BALLS = 13
-SPRING = 0.05
-GRAVITY = 0.03
-FRICTION: float = -0.9
+
+# `?balls=N` for more (or fewer) bubbles, `?width=N&height=N` for more room
+NUM_BALLS = int(utils.query_param('balls', '13'))
 BALLS: list[Ball] = []
-HEIGHT = 400
-WIDTH = 720
+# `?engine=numpy` runs the physics on `BallArrays` instead of `BALLS`, and
+# `?engine=worker` runs `BallArrays` in a Web Worker (physics_worker.py),
+# leaving the page to draw its latest snapshot (`&broadphase=0` to test
+# every pair)
+ENGINE: str = utils.query_param('engine', 'python')
+ARRAYS: BallArrays | None = None
+SIMULATION: workers.SimulationClient | None = None
+# `?sleep=1` stops simulating balls that have come to rest, until something
+# knocks them (see physics.SLEEP_SPEED)
+SLEEP: bool = utils.query_param('sleep') == '1'
+# Snapshots only have positions
+DIAMETERS: np.ndarray = np.zeros(0)
+# `?sprites=1` draws each bubble as a blit of a pre-rendered circle
+SPRITES: sprites.SpriteCache | None = None
+FILL: tuple[float, ...] = (255, 204)
+# Calls `draw()` every frame, through one long-lived proxy
+LOOP: loop.AnimationLoop | None = None
+# `teardown()`, for the page's 'pagehide'
+TEARDOWN: ffi.JsProxy | None = None
+# Simulates at a fixed rate (`?sim_hz=N`, default 60) whatever the display's,
+# with drawing optionally capped by `?render_hz=N`
+TIMESTEP: timestep.FixedTimestep = timestep.FixedTimestep.from_query()
+# Broad phase: only balls in the same or neighboring cells can touch
+GRID: spatial.SpatialHash = spatial.SpatialHash(MAX_DIAMETER)
+HEIGHT = int(utils.query_param('height', '400'))
+WIDTH = int(utils.query_param('width', '720'))
 
 # These functions are named per convention: p5.js doesn't know anything about them
 
 def setup() -> None:
     global BALLS
+    global LOOP
+    global ARRAYS
+    global SIMULATION
+    global DIAMETERS
+    global SPRITES
+    global TEARDOWN
 
-    p5js.createCanvas(WIDTH, HEIGHT)
-    BALLS = [Ball(p5js.random(WIDTH), p5js.random(HEIGHT), p5js.random(30, 70))
+    renderer: Any = p5js.createCanvas(WIDTH, HEIGHT)
+    BALLS = [Ball(p5js.random(WIDTH), p5js.random(HEIGHT), p5js.random(30, MAX_DIAMETER))
              for _ in range(NUM_BALLS)]
+    broad_phase: bool = utils.query_param('broadphase') != '0'
+    if ENGINE == 'numpy':
+        ARRAYS = BallArrays([ball.x for ball in BALLS], [ball.y for ball in BALLS],
+                            [ball.diameter for ball in BALLS], WIDTH, HEIGHT, broad_phase, SLEEP)
+    elif ENGINE == 'worker':
+        state: np.ndarray = np.array([(ball.x, ball.y, ball.diameter) for ball in BALLS],
+                                     dtype=np.float32)
+        DIAMETERS = state[:, 2].astype(float)
+        SIMULATION = workers.SimulationClient(Worker.new('physics_worker.js'),
+                                              state[:, :2].reshape(-1))
+        SIMULATION.start(state.reshape(-1), width=WIDTH, height=HEIGHT,
+                         sim_hz=TIMESTEP.sim_hz, broad_phase=broad_phase, sleep=SLEEP)
+    if utils.query_param('sprites') == '1':
+        SPRITES = sprites.SpriteCache(p5js, FILL)
     p5js.noStroke()
-    p5js.fill(255, 204)
+    p5js.fill(*FILL)
     p5js.background(0)
+    LOOP = loop.AnimationLoop(draw, renderer.elt, on_suspend=suspend)
+    TEARDOWN = ffi.create_proxy(teardown)
+    window.addEventListener('pagehide', TEARDOWN)
+
+
+def suspend(suspended: bool) -> None:
+    # While nothing's drawn (hidden tab, canvas scrolled away), the worker
+    # needn't simulate either
+    if SIMULATION is None:
+        return
+    if suspended:
+        SIMULATION.pause()
+    else:
+        SIMULATION.resume()
+
+
+def teardown(event: Any = None) -> None:
+    # Leaving the page: stop the worker, and let go of the loop's proxies.
+    # A page kept in the back/forward cache (`persisted`) may yet come back;
+    # it's paused already, its tab being hidden.
+    global SIMULATION
+    if event is not None and getattr(event, 'persisted', False):
+        return
+    if SIMULATION is not None:
+        SIMULATION.destroy()
+        SIMULATION = None
+    LOOP.destroy()
+    window.removeEventListener('pagehide', TEARDOWN)
+    TEARDOWN.destroy()
+
+
+def step(dt: float) -> None:
+    # One simulation step: push apart every overlapping pair, then move
+    if ARRAYS is not None:
+        ARRAYS.step(dt)
+        return
+    for index, ball in enumerate(BALLS):
+        GRID.update(index, ball.x, ball.y)
+    pairs: list[tuple[int, int]] = GRID.pairs()
+    for first, second in pairs:
+        if BALLS[first].asleep and BALLS[second].asleep:
+            continue
+        BALLS[first].collide(BALLS[second], dt)
+    if SLEEP and any(ball.waking for ball in BALLS):
+        wake_islands(pairs)
+    for ball in BALLS:
+        ball.move(dt)
+
+
+def wake_islands(pairs: list[tuple[int, int]]) -> None:
+    # Spread `waking` from the balls a collision woke to every ball touching
+    # one of them, through any chain of touching pairs (see
+    # `BallArrays._wake_islands()`)
+    contacts: list[tuple[Ball, Ball]] = [(BALLS[first], BALLS[second]) for first, second in pairs
+                                         if BALLS[first].touches(BALLS[second])]
+    spreading: bool = True
+    while spreading:
+        spreading = False
+        for first, second in contacts:
+            if first.waking != second.waking:
+                first.waking = second.waking = True
+                spreading = True
+
+
+def awake_count() -> int:
+    # Balls being simulated; the worker's, as of the snapshot last drawn
+    if ARRAYS is not None:
+        return ARRAYS.awake_count
+    if SIMULATION is not None:
+        return SIMULATION.awake_count if SIMULATION.step >= 0 else len(BALLS)
+    return sum(1 for ball in BALLS if not ball.asleep)
+
+
+def display(x: np.ndarray, y: np.ndarray, diameter: np.ndarray) -> None:
+    # The array engines' `Ball.display()`
+    if SPRITES is not None:
+        for x_pos, y_pos, dia in zip(x.tolist(), y.tolist(), diameter.tolist()):
+            SPRITES.draw(x_pos, y_pos, dia)
+        return
+    for x_pos, y_pos, dia in zip(x.tolist(), y.tolist(), diameter.tolist()):
+        p5js.ellipse(x_pos, y_pos, dia, dia)
 
 
 def draw(*args: dict[str, Any]) -> None:
+    if not TIMESTEP.frame(p5js.millis()):
+        return
+    if SIMULATION is not None:
+        # The worker keeps its own time: draw whatever it last published
+        SIMULATION.latest()
+        p5js.background(0)
+        display(SIMULATION.values[0::2], SIMULATION.values[1::2], DIAMETERS)
+        return
+    for _ in range(TIMESTEP.steps):
+        step(TIMESTEP.dt)
     p5js.background(0)
+    if ARRAYS is not None:
+        alpha: float = TIMESTEP.alpha
+        display(ARRAYS.prev_x + (ARRAYS.x - ARRAYS.prev_x) * alpha,
+                ARRAYS.prev_y + (ARRAYS.y - ARRAYS.prev_y) * alpha, ARRAYS.diameter)
+        return
     for ball in BALLS:
-        ball.collide()
-        ball.move()
-        ball.display()
-    p5js.requestAnimationFrame(ffi.create_proxy(draw))
+        ball.display(TIMESTEP.alpha)
 
 
 setup()
-window.requestAnimationFrame(ffi.create_proxy(draw))
+LOOP.start()
@@ -0,0 +1,188 @@
+# Bouncy Bubbles' physics on NumPy arrays, with no drawing (and no p5.js), so
+# the same code runs in the page (`?engine=numpy`) and in the physics worker
+# (`?engine=worker`, see physics_worker.py).
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+import spatial
+
+MAX_DIAMETER = 70
+# Per second, for a fixed-timestep simulation at `TIMESTEP.sim_hz`; at 60 Hz
+# these are the original per-frame 0.05 and 0.03
+# 1/second^2: each step, an overlap of `d` px changes velocity by `d * SPRING * dt`
+SPRING = 180.0
+# px/second^2
+GRAVITY = 108.0
+FRICTION: float = -0.9
+# A ball that's moved slower than SLEEP_SPEED (px/second) for SLEEP_SECONDS
+# goes to sleep: it's left out of `move()`, and of `collide()` against other
+# sleepers, until a collision pushes it harder than SLEEP_SPEED. Pushes
+# gentler than that don't move it: it's a fixed obstacle. A ball that wakes
+# wakes its whole island too: every sleeper touching it, or touching one
+# that touches it, and so on, so nothing's left resting on a ball that's
+# gone.
+SLEEP_SPEED = 10.0
+SLEEP_SECONDS = 0.5
+
+
+class BallArrays():
+    # The same physics as the sketch's `Ball` and `step()`, for every ball at
+    # once: state lives in NumPy arrays, one slot per ball, and each step is a
+    # handful of vectorized operations. Starting from the same `Ball`s (so the
+    # same seed), the trajectories match the scalar version's to within
+    # floating-point rounding - impulses are just summed in another order.
+    def __init__(self, x: np.ndarray, y: np.ndarray, diameter: np.ndarray,
+                 width: float, height: float, broad_phase: bool = True,
+                 sleep: bool = False) -> None:
+        self.x: np.ndarray = np.array(x, dtype=float)
+        self.y: np.ndarray = np.array(y, dtype=float)
+        self.vx: np.ndarray = np.zeros_like(self.x)
+        self.vy: np.ndarray = np.zeros_like(self.x)
+        self.diameter: np.ndarray = np.array(diameter, dtype=float)
+        self.radius: np.ndarray = self.diameter / 2
+        self.prev_x: np.ndarray = self.x.copy()
+        self.prev_y: np.ndarray = self.y.copy()
+        self.width: float = width
+        self.height: float = height
+        # Without the broad phase, every pair is tested
+        self.broad_phase: bool = broad_phase
+        self._all_pairs: tuple[np.ndarray, np.ndarray] = np.triu_indices(len(self.x), 1)
+        # See SLEEP_SPEED
+        self.sleep: bool = sleep
+        self.asleep: np.ndarray = np.zeros(len(self.x), dtype=bool)
+        # Seconds each ball has been slower than SLEEP_SPEED
+        self.still: np.ndarray = np.zeros_like(self.x)
+
+    @property
+    def awake_count(self) -> int:
+        return len(self.x) - int(np.count_nonzero(self.asleep))
+
+    @property
+    def snapshot_length(self) -> int:
+        # See `write_snapshot()`
+        return 2 * len(self.x)
+
+    def step(self, dt: float) -> None:
+        self.collide(dt)
+        self.move(dt)
+
+    def collide(self, dt: float) -> None:
+        # `Ball.collide()` for every candidate pair
+        first, second = (spatial.grid_pairs(self.x, self.y, MAX_DIAMETER) if self.broad_phase
+                         else self._all_pairs)
+        asleep: np.ndarray = self.asleep
+        # Every candidate pair, sleepers' included, for `_wake_islands()`
+        candidates: tuple[np.ndarray, np.ndarray] = (first, second)
+        if self.sleep:
+            moving: np.ndarray = ~(asleep[first] & asleep[second])
+            first, second = first[moving], second[moving]
+        dx: np.ndarray = self.x[second] - self.x[first]
+        dy: np.ndarray = self.y[second] - self.y[first]
+        distance: np.ndarray = np.sqrt(dx * dx + dy * dy)
+        min_dist: np.ndarray = self.radius[second] + self.radius[first]
+        touching: np.ndarray = distance < min_dist
+        first, second = first[touching], second[touching]
+        min_dist = min_dist[touching]
+        angle: np.ndarray = np.arctan2(dy[touching], dx[touching])
+        ax: np.ndarray = (self.x[first] + np.cos(angle) * min_dist - self.x[second]) * (SPRING * dt * 2)
+        ay: np.ndarray = (self.y[first] + np.sin(angle) * min_dist - self.y[second]) * (SPRING * dt * 2)
+        count: int = len(self.x)
+        if self.sleep:
+            # Sleepers only take pushes that wake them, and only wake once
+            # every pair has been seen, as `Ball.collide()`
+            kick: np.ndarray = np.hypot(ax, ay) > SLEEP_SPEED
+            to_first: np.ndarray = ~asleep[first] | kick
+            to_second: np.ndarray = ~asleep[second] | kick
+            self.vx -= np.bincount(first[to_first], ax[to_first], count)
+            self.vy -= np.bincount(first[to_first], ay[to_first], count)
+            self.vx += np.bincount(second[to_second], ax[to_second], count)
+            self.vy += np.bincount(second[to_second], ay[to_second], count)
+            woken: np.ndarray = np.concatenate((first[kick], second[kick]))
+            if len(woken):
+                self._wake_islands(woken, *candidates)
+            return
+        self.vx -= np.bincount(first, ax, count)
+        self.vy -= np.bincount(first, ay, count)
+        self.vx += np.bincount(second, ax, count)
+        self.vy += np.bincount(second, ay, count)
+
+    def _wake_islands(self, woken: np.ndarray, first: np.ndarray, second: np.ndarray) -> None:
+        # Wake `woken` (indices), and every ball touching one of them, through
+        # any chain of touching pairs among the candidates `first`, `second`
+        dx: np.ndarray = self.x[second] - self.x[first]
+        dy: np.ndarray = self.y[second] - self.y[first]
+        touching: np.ndarray = np.hypot(dx, dy) < self.radius[first] + self.radius[second]
+        first, second = first[touching], second[touching]
+        waking: np.ndarray = np.zeros(len(self.x), dtype=bool)
+        waking[woken] = True
+        while True:
+            # One more contact out from the balls already waking
+            spreading: np.ndarray = waking[first] != waking[second]
+            if not spreading.any():
+                break
+            waking[first[spreading]] = True
+            waking[second[spreading]] = True
+        self.asleep[waking] = False
+        self.still[waking] = 0.0
+
+    def move(self, dt: float) -> None:
+        # `Ball.move()` for every ball
+        self.prev_x[:] = self.x
+        self.prev_y[:] = self.y
+        if self.sleep:
+            self._move(np.flatnonzero(~self.asleep), dt)
+            return
+        self.vy += GRAVITY * dt
+        self.x += self.vx * dt
+        self.y += self.vy * dt
+        radius: np.ndarray = self.radius
+        for position, velocity, limit in ((self.x, self.vx, self.width),
+                                          (self.y, self.vy, self.height)):
+            high: np.ndarray = position + radius > limit
+            # As `Ball.move()`'s `elif`: only checked when not past the far wall
+            low: np.ndarray = ~high & (position - radius < 0)
+            position[high] = limit - radius[high]
+            position[low] = radius[low]
+            velocity[high | low] *= FRICTION
+
+    def _move(self, awake: np.ndarray, dt: float) -> None:
+        # `move()` for just the `awake` balls (indices), then put the ones
+        # that have been slow for long enough to sleep
+        vx: np.ndarray = self.vx[awake]
+        vy: np.ndarray = self.vy[awake] + GRAVITY * dt
+        x: np.ndarray = self.x[awake] + vx * dt
+        y: np.ndarray = self.y[awake] + vy * dt
+        radius: np.ndarray = self.radius[awake]
+        for position, velocity, limit in ((x, vx, self.width), (y, vy, self.height)):
+            high: np.ndarray = position + radius > limit
+            low: np.ndarray = ~high & (position - radius < 0)
+            position[high] = limit - radius[high]
+            position[low] = radius[low]
+            velocity[high | low] *= FRICTION
+        slow: np.ndarray = np.hypot(vx, vy) < SLEEP_SPEED
+        still: np.ndarray = np.where(slow, self.still[awake] + dt, 0.0)
+        tired: np.ndarray = still >= SLEEP_SECONDS
+        vx[tired] = 0.0
+        vy[tired] = 0.0
+        self.x[awake] = x
+        self.y[awake] = y
+        self.vx[awake] = vx
+        self.vy[awake] = vy
+        self.still[awake] = still
+        self.asleep[awake[tired]] = True
+
+    def write_snapshot(self, out: np.ndarray) -> None:
+        # The latest positions, interleaved: x0, y0, x1, y1...
+        out[0::2] = self.x
+        out[1::2] = self.y
@@ -0,0 +1,38 @@
+/*
+Web Worker for `?engine=worker`: starts a pyodide of its own, fetches the
+physics' Python (the same files the page uses, plus physics_worker.py) into
+its file system, and hands the worker's global scope to
+`physics_worker.main()`, which takes it from there.
+
+Loading takes a while; messages the page posts meanwhile are held, and
+replayed once Python is listening.
+*/
+importScripts('https://cdn.jsdelivr.net/npm/pyodide@0.23.4/pyodide.js')
+
+// Relative to this file
+const SOURCES = {
+    '../static/py/utils/': ['spatial.py', 'timestep.py', 'utils.py', 'workers.py'],
+    './': ['physics.py', 'physics_worker.py'],
+}
+
+const early = []
+const hold = (event) => early.push(event)
+self.addEventListener('message', hold)
+
+async function start() {
+    const pyodide = await loadPyodide()
+    await pyodide.loadPackage('numpy')
+    for (const [directory, files] of Object.entries(SOURCES)) {
+        for (const file of files) {
+            const response = await fetch(directory + file)
+            pyodide.FS.writeFile(file, await response.text())
+        }
+    }
+    pyodide.runPython('import js, physics_worker; physics_worker.main(js)')
+    self.removeEventListener('message', hold)
+    for (const event of early) {
+        self.dispatchEvent(new MessageEvent('message', {data: event.data}))
+    }
+}
+
+start()
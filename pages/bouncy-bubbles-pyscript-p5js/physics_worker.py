@@ -0,0 +1,35 @@
+# Bouncy Bubbles' physics in a Web Worker, for `?engine=worker`: loaded by
+# physics_worker.js into the worker's own pyodide, it steps `BallArrays` and
+# publishes the bubbles' positions to the page (see static/py/utils/workers.py).
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any
+
+import numpy as np
+
+import physics
+import workers
+
+
+def create(data: Any) -> physics.BallArrays:
+    # From the 'start' message: `state` is x, y, diameter for each bubble,
+    # interleaved, and the canvas is `width` by `height`
+    state: np.ndarray = np.zeros(data.state.length, dtype=np.float32)
+    data.state.assign_to(state)
+    return physics.BallArrays(state[0::3], state[1::3], state[2::3],
+                              data.width, data.height, broad_phase=data.broad_phase,
+                              sleep=data.sleep)
+
+
+def main(scope: Any) -> workers.SimulationHost:
+    return workers.SimulationHost(scope, create)
@@ -21,7 +21,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import datetime as dt
+import time
 
 from typing import Any
 
@@ -37,11 +37,13 @@ from js.three import (
     LineSegments,
     Mesh,
     MeshLambertMaterial,
+    Object3D,
     PerspectiveCamera,
     Scene,
     WebGLRenderer,
 )
 
+import quality
 import utils
 
 BoxGeometry: ffi.JsProxy
@@ -52,6 +54,7 @@ LineBasicMaterial: ffi.JsProxy
 LineSegments: ffi.JsProxy
 Mesh: ffi.JsProxy
 MeshLambertMaterial: ffi.JsProxy
+Object3D: ffi.JsProxy
 PerspectiveCamera: ffi.JsProxy
 Scene: ffi.JsProxy
 WebGLRenderer: ffi.JsProxy
@@ -71,11 +74,83 @@ class Edges():
         return self._lines_mesh
 
 
-def _handle_resize(event: Any) -> None:
-    _CAMERA.aspect = window.innerWidth / window.innerHeight
+class MergedEdges():
+    # All of `_DATA`'s edges in one `LineSegments`, colored per vertex: one
+    # geometry, one (opaque) material and one draw call, for `?merged=1`
+    def __init__(self, data: dict[str, dict[str, ffi.JsProxy]]) -> None:
+        positions: list[float] = []
+        colors: list[float] = []
+        for record in data.values():
+            verts: list[float] = list(record['verts'].to_py())
+            color: Color = record['color']
+            positions.extend(verts)
+            colors.extend([color.r, color.g, color.b] * (len(verts) // 3))
+        geometry: BufferGeometry = BufferGeometry.new()
+        geometry.setAttribute('position', BufferAttribute.new(Float32Array.new(positions), 3))
+        geometry.setAttribute('color', BufferAttribute.new(Float32Array.new(colors), 3))
+        material: LineBasicMaterial = LineBasicMaterial.new(vertexColors=True)
+        self._lines_mesh: LineSegments = LineSegments.new(geometry, material)
+
+    def get_mesh_object(self) -> LineSegments:
+        return self._lines_mesh
+
+
+class ClockState():
+    # The box's scale along x, y and z shows the time: seconds, minutes and
+    # hours, mapped to 1-12 and truncated. Those targets only change once a
+    # second, so they're only worked out then, from the wall clock; between
+    # changes, `scale` eases from the old targets to the new ones over
+    # TWEEN_SECONDS, and then stays put.
+    TWEEN_SECONDS = 0.5
+
+    def __init__(self) -> None:
+        self._second: int | None = None
+        self._start: tuple[float, float, float] = (1.0, 1.0, 1.0)
+        self._target: tuple[float, float, float] = (1.0, 1.0, 1.0)
+        # When the targets last changed, in `update()`'s `now_s`
+        self._changed_s: float = 0.0
+        self.scale: tuple[float, float, float] = (1.0, 1.0, 1.0)
+
+    def update(self, epoch_s: float, now_s: float) -> bool:
+        # `epoch_s` is the wall clock (`time.time()`), `now_s` a monotonic
+        # one, both in seconds. Returns whether `scale` changed.
+        second: int = int(epoch_s)
+        if second != self._second:
+            local: time.struct_time = time.localtime(second)
+            target: tuple[float, float, float] = (
+                float(int(utils.map_linear(local.tm_sec, 0, 59, 1, 12))),
+                float(int(utils.map_linear(local.tm_min, 0, 59, 1, 12))),
+                float(int(utils.map_linear(local.tm_hour, 0, 23, 1, 12))),
+            )
+            first: bool = self._second is None
+            self._second = second
+            self._start = self.scale
+            self._target = target
+            self._changed_s = now_s
+            if first:
+                # No easing in from nowhere
+                self.scale = target
+                return True
+        if self.scale == self._target:
+            return False
+        progress: float = min((now_s - self._changed_s) / self.TWEEN_SECONDS, 1.0)
+        if progress >= 1.0:
+            self.scale = self._target
+            return True
+        # Smoothstep
+        ease: float = progress * progress * (3 - 2 * progress)
+        start: tuple[float, float, float] = self._start
+        target = self._target
+        self.scale = (start[0] + (target[0] - start[0]) * ease,
+                      start[1] + (target[1] - start[1]) * ease,
+                      start[2] + (target[2] - start[2]) * ease)
+        return True
+
+
+def _handle_resize(width: int, height: int) -> None:
+    # At most once per frame, after `_QUALITY` has resized the renderer
+    _CAMERA.aspect = width / height
     _CAMERA.updateProjectionMatrix()
-    _RENDERER.setSize(window.innerWidth, window.innerHeight)
-    _RENDERER.setPixelRatio(window.devicePixelRatio)
 
 
 _WIDTH: int = window.innerWidth
@@ -86,9 +161,16 @@ _GREEN: Color = Color.new(0x4dba00)
 _BLUE: Color = Color.new(0x061982)
 _BACKGROUND: Color = Color.new(0x191919)
 
-_BOX: Mesh = None
+# The box: an invisible `Mesh` with the edges as children, or with
+# `?merged=1`, a plain `Object3D` with `MergedEdges` as its only child
+_BOX: Mesh | Object3D = None
+_MERGED: bool = utils.query_param('merged') == '1'
+# Radians/second about each axis
+_ROTATION_SPEED = 0.048
+_CLOCK: ClockState = ClockState()
 _CAMERA: PerspectiveCamera = None
-_RENDERER: WebGLRenderer = None
+# Owns the renderer; adapts resolution etc. to hold the frame rate
+_QUALITY: quality.QualityGovernor = None
 _SCENE: Scene = None
 
 _DATA: dict[str, dict[str, ffi.JsProxy]] = {
@@ -140,7 +222,7 @@ _DATA: dict[str, dict[str, ffi.JsProxy]] = {
 def _init() -> None:
     global _SCENE
     global _CAMERA
-    global _RENDERER
+    global _QUALITY
 
     _SCENE = Scene.new()
     _CAMERA = PerspectiveCamera.new(
@@ -149,7 +231,8 @@ def _init() -> None:
         0.1,  # Near clip.
         10000  # Far clip.
     )
-    _RENDERER = utils.renderer_config(WebGLRenderer, _WIDTH, _HEIGHT, _BACKGROUND)
+    _QUALITY = quality.QualityGovernor.from_query(
+        WebGLRenderer, _WIDTH, _HEIGHT, _BACKGROUND, on_resize=_handle_resize)
 
 
 def _setup() -> None:
@@ -160,37 +243,36 @@ def _setup() -> None:
     # Seconds - lines along local `x`: Red
     # Minutes - lines along local `y`: Green
     # Hours - lines along local `z`: Blue
-    # Scale down a teensy bit to prevent edge/face "fighting"
-    geometry: BoxGeometry = BoxGeometry.new(1.999, 1.999, 1.999)
-    material: MeshLambertMaterial = MeshLambertMaterial.new(
-        transparent=True,
-        opacity=0)
     _CAMERA.position.z = 50
-    _BOX = Mesh.new(geometry, material)
-    for _, record in _DATA.items():
-        edge: Edges = Edges(record).get_mesh_object()
-        _BOX.add(edge)
+    if _MERGED:
+        _BOX = Object3D.new()
+        _BOX.add(MergedEdges(_DATA).get_mesh_object())
+    else:
+        # Scale down a teensy bit to prevent edge/face "fighting"
+        geometry: BoxGeometry = BoxGeometry.new(1.999, 1.999, 1.999)
+        material: MeshLambertMaterial = MeshLambertMaterial.new(
+            transparent=True,
+            opacity=0)
+        _BOX = Mesh.new(geometry, material)
+        for _, record in _DATA.items():
+            edge: Edges = Edges(record).get_mesh_object()
+            _BOX.add(edge)
     _SCENE.add(_BOX)
-    window.addEventListener('resize', ffi.create_proxy(_handle_resize))
-    document.body.appendChild(_RENDERER.domElement)
-    _RENDERER.setAnimationLoop(ffi.create_proxy(_animate))
-    _RENDERER.render(_SCENE, _CAMERA)
-
-
-def _animate(*args: dict[str, Any]) -> None:
-    tick = 0.0008
-    date: dt.datetime = dt.datetime.now()
-    seconds: int = int(utils.map_linear(date.second, 0, 59, 1, 12))
-    minutes: int = int(utils.map_linear(date.minute, 0, 59, 1, 12))
-    hours: int = int(utils.map_linear(date.hour, 0, 23, 1, 12))
-
-    _BOX.rotation.x += tick
-    _BOX.rotation.y += tick
-    _BOX.rotation.z += tick
-    _BOX.scale.x = seconds
-    _BOX.scale.y = minutes
-    _BOX.scale.z = hours
-    _RENDERER.render(_SCENE, _CAMERA)
+    document.body.appendChild(_QUALITY.renderer.domElement)
+    _QUALITY.start(_animate)
+    _QUALITY.renderer.render(_SCENE, _CAMERA)
+
+
+def _animate(*args: Any) -> None:
+    if not _QUALITY.frame():
+        return
+    # The frame's timestamp (ms, as `performance.now()`), when there is one
+    now_s: float = (args[0] if args else window.performance.now()) / 1000
+    angle: float = _ROTATION_SPEED * now_s
+    _BOX.rotation.set(angle, angle, angle)
+    if _CLOCK.update(time.time(), now_s):
+        _BOX.scale.set(*_CLOCK.scale)
+    _QUALITY.renderer.render(_SCENE, _CAMERA)
 
 _init()
 _setup()
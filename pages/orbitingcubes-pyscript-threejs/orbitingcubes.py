@@ -31,18 +31,23 @@
 
 import math
 
-from typing import Any, Tuple
+from typing import Any
+
+import numpy as np
 
 from pyodide import ffi
-from js import document, window
+from js import document, Float32Array, window
 from js.three import (
     AmbientLight,
     BoxGeometry,
     Color,
     DirectionalLight,
     DoubleSide,
+    DynamicDrawUsage,
     EdgesGeometry,
-    Euler,
+    InstancedBufferAttribute,
+    InstancedBufferGeometry,
+    InstancedMesh,
     LineBasicMaterial,
     LineSegments,
     Mesh,
@@ -50,10 +55,18 @@ from js.three import (
     Object3D,
     PerspectiveCamera,
     Scene,
+    ShaderMaterial,
     Vector3,
     WebGLRenderer,
 )
 
+import bridge
+import orbits
+import palette
+import pool
+import profiler
+import quality
+import sampling
 import utils
 
 AmbientLight: ffi.JsProxy
@@ -61,8 +74,12 @@ BoxGeometry: ffi.JsProxy
 Color: ffi.JsProxy
 DirectionalLight: ffi.JsProxy
 DoubleSide: ffi.JsProxy
+DynamicDrawUsage: ffi.JsProxy
 EdgesGeometry: ffi.JsProxy
-Euler: ffi.JsProxy
+Float32Array: ffi.JsProxy
+InstancedBufferAttribute: ffi.JsProxy
+InstancedBufferGeometry: ffi.JsProxy
+InstancedMesh: ffi.JsProxy
 LineBasicMaterial: ffi.JsProxy
 LineSegments: ffi.JsProxy
 Mesh: ffi.JsProxy
@@ -70,6 +87,7 @@ MeshLambertMaterial: ffi.JsProxy
 Object3D: ffi.JsProxy
 PerspectiveCamera: ffi.JsProxy
 Scene: ffi.JsProxy
+ShaderMaterial: ffi.JsProxy
 Vector3: ffi.JsProxy
 WebGLRenderer: ffi.JsProxy
 
@@ -79,14 +97,15 @@ class Cube():
     CUBE_MIN_SIZE = 1.25
     CUBE_MAX_SIZE = 2.0
 
-    # ORBIT_SPEED and SELF_ROT are degrees/frame
-    # [-0.13, 0.13] within 0.01 degree of 0
-    ORBIT_SPEED_LIMIT = 0.13
-    ORBIT_SPEED_TOLERANCE = 0.01
+    # ORBIT_SPEED and SELF_ROT are degrees/second (the original 60 fps
+    # degrees/frame, times 60)
+    # [-7.8, 7.8] within 0.6 degree of 0
+    ORBIT_SPEED_LIMIT = 7.8
+    ORBIT_SPEED_TOLERANCE = 0.6
 
-    # [-1.3, 1.3] within 0.5 degree of 0
-    SELF_ROT_SPEED_LIMIT = 1.3
-    SELF_ROT_TOLERANCE = 0.5
+    # [-78, 78] within 30 degrees of 0
+    SELF_ROT_SPEED_LIMIT = 78.0
+    SELF_ROT_TOLERANCE = 30.0
 
     # Pythagoras in 3D
     CUBE_MAX_EXTENT: float = math.sqrt(3) * CUBE_MAX_SIZE
@@ -97,123 +116,185 @@ class Cube():
         FIRST_ORBIT, FIRST_ORBIT * 2,
         FIRST_ORBIT * 3, FIRST_ORBIT * 4
     )
-
-    def __init__(self) -> None:
-        self._position: Vector3 = None
-        self._radius: float = 0.0
-        self._size: float = utils.rand_float(self.CUBE_MIN_SIZE, self.CUBE_MAX_SIZE)
-        self._position, self._radius = Cube._position_on_orbit()
-        self._angle: float = self._update_angle()
-        self._rotation: Euler = Euler.new(0.0, 0.0, utils.rand_float(0.0, math.tau))
-        self._orbit_angular_speed: float = utils.avoid_zero(self.ORBIT_SPEED_LIMIT,
-                                                            self.ORBIT_SPEED_TOLERANCE)
-        self._object_angular_speed: float = utils.avoid_zero(self.SELF_ROT_SPEED_LIMIT,
-                                                             self.SELF_ROT_TOLERANCE)
-        self._cube_geometry: BoxGeometry = BoxGeometry.new(self._size, self._size, self._size)
-        self._outline_geometry: EdgesGeometry = EdgesGeometry.new(self._cube_geometry)
-        alpha: float = utils.map_linear(self._radius, self.ORBITS[1] - 2, self.ORBITS[3], 1.0, 0.5)
-        self._cube_material: MeshLambertMaterial = MeshLambertMaterial.new(
-            transparent=True,
-            side=DoubleSide,
-            opacity=alpha)
-        self._outline_material: LineBasicMaterial = LineBasicMaterial.new(
-            transparent=True,
-            side=DoubleSide,
-            opacity=alpha)
-        self._outline_mesh: LineSegments = LineSegments.new(self._outline_geometry,
-                                              self._outline_material)
-        self._cube_mesh: Mesh = Mesh.new(self._cube_geometry, self._cube_material)
-        self._cube_mesh.position.copy(self._position)
-        self._cube_mesh.rotation.copy(self._rotation)
+    # How likely each orbit is. Larger orbits are favored, as they have room
+    # for more cubes.
+    ORBIT_WEIGHTS: tuple[float, float, float, float] = (0.16, 0.24, 0.32, 0.28)
+
+    # Colors run blue -> green from the right of the circle to the left
+    FILL_COLORS = palette.GradientLUT(0x1515eb, 0x95c251)
+    OUTLINE_COLORS = palette.GradientLUT(0x0a0a73, 0x394a1f)
+
+    # Every cube shares one unit box (scaled per mesh) and draws its
+    # materials from a bounded set, by opacity and color
+    POOL = pool.ResourcePool()
+    FILLS = pool.BucketedMaterials(POOL, 'fill', MeshLambertMaterial, FILL_COLORS,
+                                   opacity_range=(0.5, 1.0),
+                                   transparent=True,
+                                   side=DoubleSide)
+    OUTLINES = pool.BucketedMaterials(POOL, 'outline', LineBasicMaterial, OUTLINE_COLORS,
+                                      opacity_range=(0.5, 1.0),
+                                      transparent=True,
+                                      side=DoubleSide)
+
+    def __init__(self, engine: orbits.OrbitEngine, index: int) -> None:
+        # All of the per-frame state lives in `engine`; this object is a view
+        # onto slot `self._index`, filled in by `spawn()`
+        self._engine: orbits.OrbitEngine = engine
+        self._index: int = index
+        size: float = float(engine.size[self._index])
+        radius: float = float(engine.radius[self._index])
+        box: BoxGeometry = Cube.unit_box()
+        edges: EdgesGeometry = Cube.POOL.acquire('box-edges', lambda: EdgesGeometry.new(box))
+        alpha: float = utils.map_linear(radius, self.ORBITS[1] - 2, self.ORBITS[3], 1.0, 0.5)
+        # Attached in engine index order, so their slots are our `_index`
+        self._outline_mesh: LineSegments = Cube.OUTLINES.attach(
+            lambda material: LineSegments.new(edges, material), alpha, self._angle)
+        self._cube_mesh: Mesh = Cube.FILLS.attach(
+            lambda material: Mesh.new(box, material), alpha, self._angle)
         self._cube_mesh.add(self._outline_mesh)
-        self.recolor()
+        self._cube_mesh.scale.setScalar(size)
+        self.orbit()
+        self.rotate()
 
-    def _update_angle(self) -> float:
-        return math.atan2(self._position.y, self._position.x)
+    @property
+    def _angle(self) -> float:
+        return float(self._engine.angle[self._index])
 
     def get_mesh_object(self) -> Mesh:
         return self._cube_mesh
 
+    # `orbit()` and `rotate()` copy this cube's slot out of the engine, after
+    # `OrbitEngine.seek()` has advanced all cubes at once
     def orbit(self) -> None:
-        x_pos: float = self._position.x
-        y_pos: float = self._position.y
-        theta: float = math.radians(self._orbit_angular_speed)
-        self._position.x = x_pos * math.cos(theta) + y_pos * math.sin(theta)
-        self._position.y = y_pos * math.cos(theta) - x_pos * math.sin(theta)
-        self._cube_mesh.position.copy(self._position)
-        self._angle = self._update_angle()
+        x_pos, y_pos, z_pos = self._engine.position[self._index].tolist()
+        self._cube_mesh.position.set(x_pos, y_pos, z_pos)
 
     def rotate(self) -> None:
-        self._rotation.x += math.radians(self._object_angular_speed)
-        self._rotation.y += math.radians(self._object_angular_speed)
-        self._rotation.z += math.radians(self._object_angular_speed)
-        self._cube_mesh.rotation.x = self._rotation.x
-        self._cube_mesh.rotation.y = self._rotation.y
-        self._cube_mesh.rotation.z = self._rotation.z
+        x_rot, y_rot, z_rot = self._engine.rotation[self._index].tolist()
+        self._cube_mesh.rotation.set(x_rot, y_rot, z_rot)
 
     def recolor(self) -> None:
-        blue: Color = Color.new(0x1515eb)
-        dk_blue: Color = Color.new(0x0a0a73)
-        green: Color = Color.new(0x95c251)
-        dk_green: Color = Color.new(0x394a1f)
-        angle: float = abs(self._angle)
-        half_pi: float = math.pi / 2
-        # Left half
-        if angle >= half_pi:
-            shade: float = utils.map_linear(angle, math.pi, half_pi, 0, 0.5)
-            color: Color = green.clone()
-            other_color: Color = blue.clone()
-            outline_color: Color = dk_green.clone()
-            other_outline_color: Color = dk_blue.clone()
-        # Right half.
-        else:
-            shade = utils.map_linear(angle, 0, half_pi, 0, 0.5)
-            color = blue.clone()
-            other_color = green.clone()
-            outline_color = dk_blue.clone()
-            other_outline_color = dk_green.clone()
-
-        self._cube_material.color = color.clone()
-        self._cube_material.color.lerp(
-            other_color.clone(),
-            # avoid obvious color bands
-            shade + utils.rand_float(-0.02, 0.02))
-        self._outline_material.color = outline_color.clone()
-        self._outline_material.color.lerp(
-            other_outline_color.clone(),
-            # avoid obvious color bands
-            shade + utils.rand_float(-0.02, 0.02))
+        # Switch to the shared materials for this cube's current color
+        # bucket; `BucketedMaterials.update()` does this for every cube
+        Cube.FILLS.recolor(self._index, self._angle)
+        Cube.OUTLINES.recolor(self._index, self._angle)
 
     @staticmethod
-    def _choose_orbit() -> float:
-        # Randomly choose an orbit, based on a set of probabilities.
-        # The probabilities favor larger orbits, as they have room for more cubes.
-        chance: float = utils.rand_float(0.0, 1.0)
-        if chance < 0.16:
-            return Cube.ORBITS[0]
-        if chance < 0.40:
-            return Cube.ORBITS[1]
-        if chance < 0.72:
-            return Cube.ORBITS[2]
-        if chance < 1.0:
-            return Cube.ORBITS[3]
-
-        return 0
+    def unit_box() -> BoxGeometry:
+        return Cube.POOL.acquire('box', lambda: BoxGeometry.new(1, 1, 1))
 
     @staticmethod
-    def _position_on_orbit() -> Tuple[Vector3, float]:
-        # Generate a random position on the circumference of the orbit chosen for
-        # this item.
-        angle: float = utils.rand_float(0.0, math.tau)
-        orbit: float = Cube._choose_orbit()
-
-        # Randomly offset the position on the orbit, so we don't end up with multiple
-        # cubes orbiting on *exactly* the same circles.
-        radius: float = orbit + utils.rand_float(0.0, Cube.ORBITS[0])
-        creation_x: float = math.cos(angle) * radius
-        creation_y: float = math.sin(angle) * radius
-        position: Vector3 = Vector3.new(creation_x, creation_y, 0)
-        return (position, radius)
+    def spawn(engine: orbits.OrbitEngine, count: int, rng: np.random.Generator) -> np.ndarray:
+        # Add `count` randomly-chosen cubes to `engine` in one go, returning
+        # their indices. Each is placed at a random angle on one of `ORBITS`,
+        # randomly offset so we don't end up with multiple cubes orbiting on
+        # *exactly* the same circles.
+        return orbits.scatter(
+            engine, rng, count,
+            Cube.ORBITS, Cube.ORBIT_WEIGHTS, Cube.ORBITS[0],
+            orbit_speed=(Cube.ORBIT_SPEED_LIMIT, Cube.ORBIT_SPEED_TOLERANCE),
+            spin_speed=(Cube.SELF_ROT_SPEED_LIMIT, Cube.SELF_ROT_TOLERANCE),
+            size=(Cube.CUBE_MIN_SIZE, Cube.CUBE_MAX_SIZE))
+
+
+class InstancedCubes():
+    # The same cubes as `Cube`, drawn as instances of one shared unit box: a
+    # single draw call for all of the fills and one for all of the outlines,
+    # however many cubes there are. Per-cube transforms come straight from
+    # `OrbitEngine.write_matrices()`, per-cube colors from the same gradient
+    # tables as `Cube.recolor()`.
+
+    # `InstancedMesh` only takes a per-instance color, so the fills share an
+    # opacity (the middle of `Cube`'s 1.0 - 0.5 range). The outlines use their
+    # own shader, which does get per-cube opacity.
+    FILL_OPACITY = 0.75
+
+    OUTLINE_VERTEX_SHADER = """
+        attribute mat4 outlineMatrix;
+        attribute vec3 outlineColor;
+        attribute float outlineAlpha;
+        varying vec4 vColor;
+        void main() {
+            vColor = vec4(outlineColor, outlineAlpha);
+            gl_Position = projectionMatrix * modelViewMatrix * outlineMatrix * vec4(position, 1.0);
+        }
+    """
+    # Colors are in three's linear working space, the canvas is sRGB
+    OUTLINE_FRAGMENT_SHADER = """
+        varying vec4 vColor;
+        void main() {
+            vec3 srgb = mix(vColor.rgb * 12.92,
+                            1.055 * pow(vColor.rgb, vec3(1.0 / 2.4)) - 0.055,
+                            step(0.0031308, vColor.rgb));
+            gl_FragColor = vec4(srgb, vColor.a);
+        }
+    """
+
+    def __init__(self, engine: orbits.OrbitEngine) -> None:
+        # One instance per cube already in `engine`, see `Cube.spawn()`
+        self._engine: orbits.OrbitEngine = engine
+        count: int = engine.count
+        # Backs all of the per-instance attributes below, see `update()`
+        self._transforms: bridge.TransformBuffer = bridge.TransformBuffer(
+            count, matrix=16, color=3, outline=3)
+        alpha: np.ndarray = utils.map_linear(engine.radius[:count],
+                                             Cube.ORBITS[1] - 2, Cube.ORBITS[3], 1.0, 0.5)
+
+        box: BoxGeometry = Cube.unit_box()
+        material: MeshLambertMaterial = MeshLambertMaterial.new(
+            transparent=True,
+            side=DoubleSide,
+            opacity=self.FILL_OPACITY)
+        self._mesh: InstancedMesh = InstancedMesh.new(box, material, count)
+        self._mesh.instanceMatrix.setUsage(DynamicDrawUsage)
+        self._mesh.instanceColor = InstancedBufferAttribute.new(Float32Array.new(count * 3), 3)
+        self._mesh.instanceColor.setUsage(DynamicDrawUsage)
+        self._transforms.bind_attribute('matrix', self._mesh.instanceMatrix)
+        self._transforms.bind_attribute('color', self._mesh.instanceColor)
+        # Instances orbit well outside the unit box's bounding sphere
+        self._mesh.frustumCulled = False
+
+        outline_geometry: InstancedBufferGeometry = InstancedBufferGeometry.new()
+        outline_geometry.setAttribute('position',
+                                      EdgesGeometry.new(box).getAttribute('position'))
+        # Shares the fills' matrices, so they're uploaded once per frame
+        outline_geometry.setAttribute('outlineMatrix', self._mesh.instanceMatrix)
+        outline_color: InstancedBufferAttribute = InstancedBufferAttribute.new(
+            Float32Array.new(count * 3), 3)
+        outline_color.setUsage(DynamicDrawUsage)
+        outline_geometry.setAttribute('outlineColor', outline_color)
+        self._transforms.bind_attribute('outline', outline_color)
+        outline_alpha: Float32Array = Float32Array.new(count)
+        outline_alpha.assign(alpha.astype(np.float32))
+        outline_geometry.setAttribute('outlineAlpha',
+                                      InstancedBufferAttribute.new(outline_alpha, 1))
+        outline_geometry.instanceCount = count
+        outline_material: ShaderMaterial = ShaderMaterial.new(
+            vertexShader=self.OUTLINE_VERTEX_SHADER,
+            fragmentShader=self.OUTLINE_FRAGMENT_SHADER,
+            transparent=True)
+        self._outline_mesh: LineSegments = LineSegments.new(outline_geometry, outline_material)
+        self._outline_mesh.frustumCulled = False
+        self._mesh.add(self._outline_mesh)
+        self.update()
+
+    def get_mesh_object(self) -> InstancedMesh:
+        return self._mesh
+
+    def set_active(self, count: int) -> None:
+        # Draw only the first `count` cubes
+        self._mesh.count = count
+        self._outline_mesh.geometry.instanceCount = count
+
+    def update(self, count: int | None = None) -> None:
+        # Write every cube's (or the first `count`'s) transform and colors,
+        # after `OrbitEngine.seek()`, and hand them all to three.js in one call
+        count = self._engine.count if count is None else count
+        self._engine.write_matrices(self._transforms.section('matrix'), count=count)
+        angles: np.ndarray = self._engine.angle[:count]
+        Cube.FILL_COLORS.lookup_into(angles, self._transforms.section('color')[:count])
+        Cube.OUTLINE_COLORS.lookup_into(angles, self._transforms.section('outline')[:count])
+        self._transforms.apply(count)
 
 
 _WIDTH: int = window.innerWidth
@@ -223,17 +304,46 @@ _AMB_LIGHT: AmbientLight = None
 _CAMERA: PerspectiveCamera = None
 _CLICKED: int = 0
 _LIGHT: DirectionalLight = None
-_RENDERER: WebGLRenderer = None
+# Owns the renderer; adapts resolution etc. to hold the frame rate
+_QUALITY: quality.QualityGovernor = None
 _SCENE: Scene = None
 
+# `?instanced=1` draws all of the cubes as instances of one shared box,
+# `?cubes=N` sets how many cubes there are, `?seed=N` makes the scene
+# reproducible
+_INSTANCED: bool = utils.query_param('instanced') == '1'
+_NUM_CUBES: int = int(utils.query_param('cubes', '100'))
+
 _CUBES: list[Cube] = []
+# How many of them are shown (`None`: all), see `_handle_quality()`
+_ACTIVE: int | None = None
+_ENGINE: orbits.OrbitEngine = None
+_START_MS: float = 0.0
+# Off unless the page has `?profile=1`
+_PROFILER: profiler.FrameProfiler = None
+_INSTANCES: InstancedCubes = None
+# Transforms for all of the (non-instanced) `_CUBES`
+_TRANSFORMS: bridge.TransformBuffer = None
+
+
+def _handle_resize(width: int, height: int) -> None:
+    # At most once per frame, after `_QUALITY` has resized the renderer
+    _CAMERA.aspect = width / height
+    _CAMERA.updateProjectionMatrix()
 
 
-def _handle_resize(event: Any) -> None:
-    _CAMERA.aspect = window.innerWidth / window.innerHeight
-    _CAMERA.updateProjectionMatrix()
-    _RENDERER.setSize(window.innerWidth, window.innerHeight)
-    _RENDERER.setPixelRatio(window.devicePixelRatio)
+def _handle_quality(level: quality.QualityLevel) -> None:
+    # Show only this quality level's share of the cubes. Only the ones that
+    # change are touched.
+    global _ACTIVE
+    active: int = level.active(_ENGINE.count)
+    if _INSTANCES is not None:
+        _INSTANCES.set_active(active)
+    else:
+        shown: int = len(_CUBES) if _ACTIVE is None else _ACTIVE
+        for index in range(min(active, shown), max(active, shown)):
+            _CUBES[index].get_mesh_object().visible = index < active
+    _ACTIVE = active
 
 
 def _handle_click(event: Any) -> None:
@@ -262,7 +372,7 @@ def _init() -> None:
     global _AMB_LIGHT
     global _LIGHT
     global _CAMERA
-    global _RENDERER
+    global _QUALITY
 
     _SCENE = Scene.new()
 
@@ -277,13 +387,20 @@ def _init() -> None:
         30,  # Near clip
         34  # Far clip
     )
-    _RENDERER = utils.renderer_config(WebGLRenderer, _WIDTH, _HEIGHT, 0x46474c)  # Middle grey
+    _QUALITY = quality.QualityGovernor.from_query(
+        WebGLRenderer, _WIDTH, _HEIGHT, 0x46474c,  # Middle grey
+        on_level=_handle_quality, on_resize=_handle_resize)
 
 
 def _setup() -> None:
     global _CUBES
+    global _ENGINE
+    global _START_MS
+    global _PROFILER
+    global _INSTANCES
+    global _TRANSFORMS
 
-    num_cubes = 100
+    num_cubes = _NUM_CUBES
 
     _CAMERA.setFocalLength = 70
     _CAMERA.position.z = 32
@@ -293,22 +410,54 @@ def _setup() -> None:
     _AMB_LIGHT.intensity = 0.6
     _SCENE.add(_LIGHT)
     _SCENE.add(_AMB_LIGHT)
-    _CUBES = [Cube() for _ in range(num_cubes)]
-    for cube in _CUBES:
-        _SCENE.add(cube.get_mesh_object())
+    _ENGINE = orbits.OrbitEngine(num_cubes)
+    indices: np.ndarray = Cube.spawn(_ENGINE, num_cubes, sampling.generator())
+    if _INSTANCED:
+        _INSTANCES = InstancedCubes(_ENGINE)
+        _SCENE.add(_INSTANCES.get_mesh_object())
+    else:
+        _CUBES = [Cube(_ENGINE, index) for index in indices.tolist()]
+        for cube in _CUBES:
+            _SCENE.add(cube.get_mesh_object())
+        _TRANSFORMS = bridge.TransformBuffer(num_cubes, matrix=16)
+        _TRANSFORMS.bind_objects('matrix', [cube.get_mesh_object() for cube in _CUBES])
     window.addEventListener('click', ffi.create_proxy(_handle_click))
-    window.addEventListener('resize', ffi.create_proxy(_handle_resize))
-    document.body.appendChild(_RENDERER.domElement)
-    _RENDERER.setAnimationLoop(ffi.create_proxy(_animate))
-    _RENDERER.render(_SCENE, _CAMERA)
+    document.body.appendChild(_QUALITY.renderer.domElement)
+    _PROFILER = profiler.FrameProfiler.from_query()
+    _START_MS = window.performance.now()
+    _QUALITY.start(_animate)
+    _QUALITY.renderer.render(_SCENE, _CAMERA)
+
+
+def _update_cubes() -> None:
+    # What `Cube.orbit()` and `rotate()` do, for every cube shown at once,
+    # handed to three.js in a single call. Only cubes whose color bucket
+    # changed this frame get a different material.
+    count: int = _ENGINE.count if _ACTIVE is None else _ACTIVE
+    _ENGINE.write_matrices(_TRANSFORMS.section('matrix'), count=count)
+    angles: np.ndarray = _ENGINE.angle[:count]
+    Cube.FILLS.update(angles)
+    Cube.OUTLINES.update(angles)
+    _TRANSFORMS.apply(count)
 
 
 def _animate(*args: dict[str, Any]) -> None:
-    for cube in _CUBES:
-        cube.rotate()
-        cube.orbit()
-        cube.recolor()
-    _RENDERER.render(_SCENE, _CAMERA)
+    # Positions are a function of wall-clock time, so a slow frame just
+    # skips ahead rather than slowing everything down
+    if not _QUALITY.frame():
+        return
+    _PROFILER.begin_frame()
+    # Cubes the quality level hides aren't moved (they catch up when shown)
+    _ENGINE.seek(utils.seconds_since(_START_MS), count=_ACTIVE)
+    _PROFILER.mark('simulate')
+    if _INSTANCES is not None:
+        _INSTANCES.update(_ACTIVE)
+    else:
+        _update_cubes()
+    _PROFILER.mark('update')
+    _QUALITY.renderer.render(_SCENE, _CAMERA)
+    _PROFILER.mark('render')
+    _PROFILER.end_frame(_QUALITY.renderer)
 
 _init()
 _setup()
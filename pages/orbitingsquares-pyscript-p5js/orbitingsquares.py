@@ -35,32 +35,46 @@ import math
 
 from typing import Any
 
-from pyodide.ffi import create_proxy
+import numpy as np
+
 from js import Window, window
 
-from utils import map_linear
+from bridge import QuadBatch
+from loop import AnimationLoop
+from palette import GradientLUT
+from utils import query_param
 
 p5js: Window = window
 
 
 class Square():
-    # p5.js DEFAULT IS RADIANS!!
-    ROTATION_LIMIT = 0.065
-    ROTATION_TOLERANCE = 0.009
-    ORBIT_LIMIT = 0.0065
-    ORBIT_TOLERANCE = 0.0001
+    # p5.js DEFAULT IS RADIANS!! Speeds are radians/second (the original
+    # 60 fps radians/frame, times 60).
+    ROTATION_LIMIT = 3.9
+    ROTATION_TOLERANCE = 0.54
+    ORBIT_LIMIT = 0.39
+    ORBIT_TOLERANCE = 0.006
+    # Out of 255
+    STROKE_OPACITY = 165
+    FILL_OPACITY = 130
 
     def __init__(self) -> None:
         self._orbit: float = self._chooseOrbit() + p5js.random(0, int(WIDTH / 23))
-        self._orbit_angle: float = p5js.random(math.tau)
+        # Orbit and rotation angles are closed-form functions of time, from
+        # these starting phases
+        self._orbit_phase: float = p5js.random(math.tau)
+        self._orbit_angle: float = self._orbit_phase
         self._position: p5js.createVector = p5js.createVector(math.cos(self._orbit_angle) * self._orbit,
                                            math.sin(self._orbit_angle) * self._orbit)
         self._size: float = p5js.random(45, 90)
-        self._rot_angle: float = p5js.random(math.tau)
-        self._s_color: p5js.color = p5js.color(0)
-        self._s_opac = 165
-        self._f_color: p5js.color = None
-        self._f_opac = 130
+        # Half the diagonal; a rotated square never reaches further than this
+        self._reach: float = self._size * math.sqrt(0.5)
+        self._rot_phase: float = p5js.random(math.tau)
+        self._rot_angle: float = self._rot_phase
+        self._s_color: tuple[float, float, float] = (0.0, 0.0, 0.0)
+        self._s_opac = Square.STROKE_OPACITY
+        self._f_color: tuple[float, float, float] = (0.0, 0.0, 0.0)
+        self._f_opac = Square.FILL_OPACITY
         self._recolor()
         self._rot_speed: float = Square.avoidZero(Square.ROTATION_LIMIT, Square.ROTATION_TOLERANCE)
         self._orbit_speed: float = Square.avoidZero(Square.ORBIT_LIMIT, Square.ORBIT_TOLERANCE)
@@ -95,53 +109,47 @@ class Square():
         # chance < 1.0
         return 800
 
-    def _move(self) -> None:
+    def _move(self, time: float) -> None:
         '''
-        Generate a random position on the circumference of the orbit chosen for
-        this item.
+        Put this item where it is on its orbit at `time` (in seconds). The
+        angle *decreases* at `_orbit_speed`, as the original incremental
+        rotation did.
         '''
-        x: float = self._position.x
-        y: float = self._position.y
-        self._position.x = x * math.cos(self._orbit_speed) + y * math.sin(self._orbit_speed)
-        self._position.y = y * math.cos(self._orbit_speed) - x * math.sin(self._orbit_speed)
-        self._orbit_angle = math.atan2(self._position.y, self._position.x)
+        self._orbit_angle = math.remainder(self._orbit_phase - self._orbit_speed * time, math.tau)
+        self._position.x = math.cos(self._orbit_angle) * self._orbit
+        self._position.y = math.sin(self._orbit_angle) * self._orbit
+        self._rot_angle = math.remainder(self._rot_phase + self._rot_speed * time, math.tau)
+
+    def _on_screen(self) -> bool:
+        return (abs(self._position.x) - self._reach < WIDTH / 2 and
+                abs(self._position.y) - self._reach < HEIGHT / 2)
 
     def _recolor(self) -> None:
-        angle: float = abs(self._orbit_angle)
-        half_pi: float = math.pi / 2
-        # Left half
-        if angle >= half_pi:
-            shade: float = map_linear(angle, math.pi, half_pi, 0, 0.5)
-            this_fill_color: p5js.color = DK_GREEN
-            other_fill_color: p5js.color = DK_BLUE
-            this_stroke_color: p5js.color = GREEN
-            other_stroke_color: p5js.color = BLUE
-        # Right half
-        else:
-            shade = map_linear(angle, 0, half_pi, 0, 0.5)
-            this_fill_color = DK_BLUE
-            other_fill_color = DK_GREEN
-            this_stroke_color = BLUE
-            other_stroke_color = GREEN
-        self._f_color = p5js.lerpColor(this_fill_color, other_fill_color,
-                                       shade + p5js.random(-0.02, 0.02))
-        self._s_color = p5js.lerpColor(this_stroke_color, other_stroke_color,
-                                       shade + p5js.random(-0.02, 0.02))
-
-    def draw(self) -> None:
-        self._move()
+        # Straight from the precomputed gradients: no p5 colors, no lerping
+        self._f_color = FILL_COLORS.lookup(self._orbit_angle)
+        self._s_color = STROKE_COLORS.lookup(self._orbit_angle)
+
+    def draw(self, time: float) -> None:
+        self._move(time)
+        # Off-screen squares don't need colors or any drawing calls
+        if not self._on_screen():
+            return
         self._recolor()
-        self._s_color.setAlpha(self._s_opac)
-        p5js.stroke(self._s_color)
-        self._f_color.setAlpha(self._f_opac)
-        p5js.fill(self._f_color)
+        red, green, blue = self._s_color
+        p5js.stroke(red, green, blue, self._s_opac)
+        red, green, blue = self._f_color
+        p5js.fill(red, green, blue, self._f_opac)
         p5js.push()
         p5js.translate(self._position.x, self._position.y)
-        self._rot_angle += self._rot_speed
         p5js.rotate(self._rot_angle)
         p5js.rect(0, 0, self._size, self._size)
         p5js.pop()
 
+    def state(self) -> tuple[float, float, float, float, float, float, float]:
+        # Everything `SquareBatch` needs to animate this square
+        return (self._orbit, self._orbit_phase, self._orbit_speed,
+                self._rot_phase, self._rot_speed, self._size, self._reach)
+
     def __str__(self) -> str:
         return(f'Square:\n'
                f'orbit: {self._orbit}\n'
@@ -156,25 +164,76 @@ class Square():
                )
 
 
+class SquareBatch():
+    # The same squares, moved and colored all at once with NumPy and drawn
+    # as one shape: a single `QuadBatch.draw()` call per frame, instead of
+    # seven or so p5.js calls per square.
+
+    # Corners of a unit square around its center, in `beginShape(QUADS)`
+    # order
+    CORNERS: np.ndarray = np.array([(-0.5, -0.5), (0.5, -0.5), (0.5, 0.5), (-0.5, 0.5)])
+
+    def __init__(self, squares: list[Square]) -> None:
+        count: int = len(squares)
+        (self._orbit, self._orbit_phase, self._orbit_speed, self._rot_phase,
+         self._rot_speed, self._size, self._reach) = np.array(
+            [square.state() for square in squares]).reshape(count, 7).T
+        self._quads: QuadBatch = QuadBatch(count)
+        # Opacities never change
+        self._quads.fills[:, :, 3] = Square.FILL_OPACITY
+        self._quads.strokes[:, :, 3] = Square.STROKE_OPACITY
+        self._fill_rgb: np.ndarray = np.zeros((count, 3), dtype=np.float32)
+        self._stroke_rgb: np.ndarray = np.zeros((count, 3), dtype=np.float32)
+
+    def draw(self, time: float) -> None:
+        # `Square.draw()` for every square: positions and angles at `time`
+        # (in seconds), then only the on-screen squares are written and drawn
+        orbit_angle: np.ndarray = self._orbit_phase - self._orbit_speed * time
+        # `math.remainder()`: the result is in [-pi, pi], which the color
+        # gradients are indexed by
+        orbit_angle -= np.round(orbit_angle / math.tau) * math.tau
+        x_pos: np.ndarray = np.cos(orbit_angle) * self._orbit
+        y_pos: np.ndarray = np.sin(orbit_angle) * self._orbit
+        visible: np.ndarray = np.flatnonzero(
+            (np.abs(x_pos) - self._reach < WIDTH / 2) & (np.abs(y_pos) - self._reach < HEIGHT / 2))
+        count: int = len(visible)
+        rot_angle: np.ndarray = self._rot_phase[visible] + self._rot_speed[visible] * time
+        cos: np.ndarray = (np.cos(rot_angle) * self._size[visible])[:, np.newaxis]
+        sin: np.ndarray = (np.sin(rot_angle) * self._size[visible])[:, np.newaxis]
+        corner_x: np.ndarray = SquareBatch.CORNERS[:, 0]
+        corner_y: np.ndarray = SquareBatch.CORNERS[:, 1]
+        positions: np.ndarray = self._quads.positions[:count]
+        positions[:, :, 0] = x_pos[visible, np.newaxis] + corner_x * cos - corner_y * sin
+        positions[:, :, 1] = y_pos[visible, np.newaxis] + corner_x * sin + corner_y * cos
+        angles: np.ndarray = orbit_angle[visible]
+        FILL_COLORS.lookup_into(angles, self._fill_rgb[:count])
+        STROKE_COLORS.lookup_into(angles, self._stroke_rgb[:count])
+        self._quads.fills[:count, :, 0:3] = self._fill_rgb[:count, np.newaxis]
+        self._quads.strokes[:count, :, 0:3] = self._stroke_rgb[:count, np.newaxis]
+        self._quads.draw(count)
+
+
 HEIGHT: int = window.innerHeight
 WIDTH: int = window.innerWidth
 
 NUM_SQUARES = 100
-BLUE: p5js.color = None
-DK_BLUE: p5js.color = None
-GREEN: p5js.color = None
-DK_GREEN: p5js.color = None
+# Colors run blue -> green from the right of the circle to the left
+FILL_COLORS = GradientLUT(0x0a0a73, 0x394a1f, linear=False, scale=255)
+STROKE_COLORS = GradientLUT(0x1515eb, 0x95c251, linear=False, scale=255)
 
 SQUARES: list[Square] = []
+# `?batched=1` draws all of the squares as one shape, see `SquareBatch`
+BATCHED: bool = query_param('batched') == '1'
+BATCH: SquareBatch | None = None
+# Calls `draw()` every frame, through one long-lived proxy
+LOOP: AnimationLoop | None = None
 
 # These are named per convention: p5.js doesn't know anything about them
 
 def setup() -> None:
     global SQUARES
-    global BLUE
-    global DK_BLUE
-    global GREEN
-    global DK_GREEN
+    global BATCH
+    global LOOP
 
     p5js.frameRate(60)
     renderer: Any = p5js.createCanvas(p5js.windowWidth, p5js.windowHeight, p5js.WEBGL)
@@ -186,22 +245,26 @@ def setup() -> None:
     p5js.strokeWeight(2)
     p5js.rectMode(p5js.CENTER)
     p5js.background(p5js.color(70, 71, 76))
-    BLUE = p5js.color(21, 21, 235)
-    DK_BLUE = p5js.color(10, 10, 115)
-    GREEN = p5js.color(149, 194, 81)
-    DK_GREEN = p5js.color(57, 74, 31)
     SQUARES = [Square() for _ in range(NUM_SQUARES)]
+    if BATCHED:
+        BATCH = SquareBatch(SQUARES)
+    LOOP = AnimationLoop(draw, renderer.elt)
 
 
 def draw(*args: dict[str, Any]) -> None:
     p5js.background(p5js.color(70, 71, 76))
     # Remove if using 2D renderer!
     # p5js.translate(640, 360, 0)
-    for square in SQUARES:
-        # js.console.log(square.__str__())
-        square.draw()
-    p5js.requestAnimationFrame(create_proxy(draw))
+    # Time since the sketch started, in seconds; dropped frames are skipped
+    # over instead of slowing the animation down
+    time: float = p5js.millis() / 1000
+    if BATCH is not None:
+        BATCH.draw(time)
+    else:
+        for square in SQUARES:
+            # js.console.log(square.__str__())
+            square.draw(time)
 
 
 setup()
-window.requestAnimationFrame(create_proxy(draw))
+LOOP.start()
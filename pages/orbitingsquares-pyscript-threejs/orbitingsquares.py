@@ -30,17 +30,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import math
-
 from typing import Any
 
+import numpy as np
+
 from pyodide import ffi
 from js import document, window
 from js.three import (
-    Color,
     DoubleSide,
     EdgesGeometry,
-    Euler,
     LineBasicMaterial,
     LineSegments,
     Mesh,
@@ -52,12 +50,17 @@ from js.three import (
     WebGLRenderer,
 )
 
+import bridge
+import orbits
+import palette
+import pool
+import profiler
+import quality
+import sampling
 import utils
 
-Color: ffi.JsProxy
 DoubleSide: ffi.JsProxy
 EdgesGeometry: ffi.JsProxy
-Euler: ffi.JsProxy
 LineBasicMaterial: ffi.JsProxy
 LineSegments: ffi.JsProxy
 Mesh: ffi.JsProxy
@@ -74,126 +77,123 @@ class Rect():
     RECT_MIN_SIZE = 0.75
     RECT_MAX_SIZE = 1.5
 
-    def __init__(self) -> None:
-        self._size: float = utils.rand_float(self.RECT_MIN_SIZE, self.RECT_MAX_SIZE)
-        self._position: Vector3 = Rect._position_on_orbit()
-        self._angle: float = self._get_angle()
-        self._rotation: Euler = Euler.new(0, 0, utils.rand_float(0, math.tau))
-        # [-0.19, 0.19] within 0.03 degree of 0.
-        self._orbit_angular_speed: float = utils.avoid_zero(0.19, 0.03)
-        # [-1.5, 1.5] within 0.3 degree of 0.
-        self._object_angular_speed: float = utils.avoid_zero(1.25, 0.3)
-        self._plane_geometry: PlaneGeometry = PlaneGeometry.new(self._size, self._size)
-        self._outline_geometry: EdgesGeometry = EdgesGeometry.new(self._plane_geometry)
-        self._plane_material: MeshBasicMaterial = MeshBasicMaterial.new(
-            transparent=True,
-            side=DoubleSide,
-            opacity=0.35
-        )
-        self._outline_material: LineBasicMaterial = LineBasicMaterial.new(
-            transparent=True,
-            side=DoubleSide,
-            opacity=0.65,
-            linewidth=2
-        )
-        self._plane_mesh: Mesh = Mesh.new(self._plane_geometry, self._plane_material)
-        self._outline_mesh: LineSegments = LineSegments.new(self._outline_geometry,
-                                              self._outline_material)
-        self._plane_mesh.position.copy(self._position)
-        self._plane_mesh.rotation.copy(self._rotation)
+    ORBITS: tuple[float, float, float, float] = (3, 6, 9, 12)
+    ORBIT_WEIGHTS: tuple[float, float, float, float] = (0.18, 0.32, 0.28, 0.22)
+
+    # Colors run blue -> green from the right of the circle to the left
+    COLORS = palette.GradientLUT(0x2525C4, 0x7DB528)
+
+    # Every rect shares one unit plane (scaled per rect) and draws its
+    # materials from one per color bucket
+    POOL = pool.ResourcePool()
+    PLANES = pool.BucketedMaterials(POOL, 'plane', MeshBasicMaterial, COLORS,
+                                    transparent=True,
+                                    side=DoubleSide,
+                                    opacity=0.35)
+    OUTLINES = pool.BucketedMaterials(POOL, 'outline', LineBasicMaterial, COLORS,
+                                      transparent=True,
+                                      side=DoubleSide,
+                                      opacity=0.65,
+                                      linewidth=2)
+
+    def __init__(self, engine: orbits.OrbitEngine, index: int) -> None:
+        # All of the per-frame state lives in `engine`; this object is a view
+        # onto slot `self._index`, filled in by `spawn()`
+        self._engine: orbits.OrbitEngine = engine
+        self._index: int = index
+        size: float = float(engine.size[index])
+        plane: PlaneGeometry = Rect.POOL.acquire('plane', lambda: PlaneGeometry.new(1, 1))
+        edges: EdgesGeometry = Rect.POOL.acquire('plane-edges', lambda: EdgesGeometry.new(plane))
+        # Attached in engine index order, so their slots are our `_index`
+        self._outline_mesh: LineSegments = Rect.OUTLINES.attach(
+            lambda material: LineSegments.new(edges, material), 1.0, self._angle)
+        self._plane_mesh: Mesh = Rect.PLANES.attach(
+            lambda material: Mesh.new(plane, material), 1.0, self._angle)
         self._plane_mesh.add(self._outline_mesh)
-        self.recolor()
+        self._plane_mesh.scale.setScalar(size)
+        self.orbit()
+        self.rotate()
+
+    @property
+    def _angle(self) -> float:
+        return float(self._engine.angle[self._index])
 
     def get_mesh_object(self) -> Mesh:
         return self._plane_mesh
 
-    def _get_angle(self) -> float:
-        return math.atan2(self._position.y, self._position.x)
-
+    # `orbit()` and `rotate()` copy this rect's slot out of the engine, after
+    # `OrbitEngine.seek()` has advanced all rects at once
     def orbit(self) -> None:
-        x_pos: float = self._position.x
-        y_pos: float = self._position.y
-        theta: float = math.radians(self._orbit_angular_speed)
-        self._position.x = x_pos * math.cos(theta) + y_pos * math.sin(theta)
-        self._position.y = y_pos * math.cos(theta) - x_pos * math.sin(theta)
-        self._plane_mesh.position.copy(self._position)
-        self._angle = self._get_angle()
+        x_pos, y_pos, z_pos = self._engine.position[self._index].tolist()
+        self._plane_mesh.position.set(x_pos, y_pos, z_pos)
 
     def rotate(self) -> None:
-        self._rotation.z += math.radians(self._object_angular_speed)
-        self._plane_mesh.rotation.z = self._rotation.z
+        self._plane_mesh.rotation.z = float(self._engine.rotation[self._index, 2])
 
     def recolor(self) -> None:
-        blue: Color = Color.new(0x2525C4)
-        green: Color = Color.new(0x7DB528)
-        angle: float = abs(self._angle)
-        half_pi: float = math.pi / 2
-        # Left half
-        if angle >= half_pi:
-            shade: float = utils.map_linear(angle, math.pi, half_pi, 0, 0.5)
-            color: Color = green.clone()
-            other_color: Color = blue.clone()
-        # Right half.
-        else:
-            shade = utils.map_linear(angle, 0, half_pi, 0, 0.5)
-            color = blue.clone()
-            other_color = green.clone()
-        self._plane_material.color = color.clone()
-        self._plane_material.color.lerp(other_color,
-                                        shade + utils.rand_float(-0.02, 0.02))
-        self._outline_material.color = self._plane_material.color
+        # Switch to the shared materials for this rect's current color
+        # bucket; `BucketedMaterials.update()` does this for every rect
+        Rect.PLANES.recolor(self._index, self._angle)
+        Rect.OUTLINES.recolor(self._index, self._angle)
 
     @staticmethod
-    def _choose_orbit() -> float:
-        # Randomly choose an orbit, based on a set of weights.
-        chance: float = utils.rand_float(0.0, 1.0)
-        if chance < 0.18:
-            return 3
-        if chance < 0.50:
-            return 6
-        if chance < 0.78:
-            return 9
-        if chance < 1.0:
-            return 12
-
-        return 0
-
-    @staticmethod
-    def _position_on_orbit() -> Vector3:
-        # Generate a random position on the circumference of the orbit chosen for
-        # this item.
-        angle: float = utils.rand_float(0, math.tau)
-        # Slightly offsets the position so we don't end up with the
-        # visible rects orbiting on *exact* circles.
-        radius: float = Rect._choose_orbit() + utils.rand_float(0, 3)
-        creation_x: float = math.cos(angle) * radius
-        creation_y: float = math.sin(angle) * radius
-        # Add a teensy z-offset to mitigate z-fighting
-        creation_z: float = utils.rand_float(-0.01, 0.01)
-        return Vector3.new(creation_x, creation_y, creation_z)
+    def spawn(engine: orbits.OrbitEngine, count: int, rng: np.random.Generator) -> np.ndarray:
+        # Add `count` randomly-chosen rects to `engine` in one go, returning
+        # their indices. Positions are slightly offset from `ORBITS` so we
+        # don't end up with the visible rects orbiting on *exact* circles,
+        # with a teensy z-offset to mitigate z-fighting.
+        return orbits.scatter(
+            engine, rng, count,
+            Rect.ORBITS, Rect.ORBIT_WEIGHTS, 3.0,
+            # Degrees/second. [-11.4, 11.4] within 1.8 degrees of 0.
+            orbit_speed=(11.4, 1.8),
+            # [-75, 75] within 18 degrees of 0.
+            spin_speed=(75.0, 18.0),
+            size=(Rect.RECT_MIN_SIZE, Rect.RECT_MAX_SIZE),
+            position_z=(-0.01, 0.01),
+            spin_axes=orbits.SPIN_Z)
 
 
 _HEIGHT: int = window.innerHeight
 _WIDTH: int = window.innerWidth
 
 _CAMERA: PerspectiveCamera = None
-_RENDERER: WebGLRenderer = None
+# Owns the renderer; adapts resolution etc. to hold the frame rate
+_QUALITY: quality.QualityGovernor = None
 _SCENE: Scene = None
 
 _RECTS: list[Rect] = []
+# How many of them are shown (`None`: all), see `_handle_quality()`
+_ACTIVE: int | None = None
+_ENGINE: orbits.OrbitEngine = None
+# Transforms for all of the `_RECTS`
+_TRANSFORMS: bridge.TransformBuffer = None
+_START_MS: float = 0.0
+# Off unless the page has `?profile=1`
+_PROFILER: profiler.FrameProfiler = None
+
+
+def _handle_resize(width: int, height: int) -> None:
+    # At most once per frame, after `_QUALITY` has resized the renderer
+    _CAMERA.aspect = width / height
+    _CAMERA.updateProjectionMatrix()
 
 
-def _handle_resize(event: Any) -> None:
-    _CAMERA.aspect = window.innerWidth / window.innerHeight
-    _CAMERA.updateProjectionMatrix()
-    _RENDERER.setSize(window.innerWidth, window.innerHeight)
-    _RENDERER.setPixelRatio(window.devicePixelRatio)
+def _handle_quality(level: quality.QualityLevel) -> None:
+    # Show only this quality level's share of the rects. Only the ones
+    # that change are touched.
+    global _ACTIVE
+    active: int = level.active(len(_RECTS))
+    shown: int = len(_RECTS) if _ACTIVE is None else _ACTIVE
+    for index in range(min(active, shown), max(active, shown)):
+        _RECTS[index].get_mesh_object().visible = index < active
+    _ACTIVE = active
 
 
 def _init() -> None:
     global _SCENE
     global _CAMERA
-    global _RENDERER
+    global _QUALITY
 
     _SCENE = Scene.new()
     _CAMERA = PerspectiveCamera.new(
@@ -204,32 +204,59 @@ def _init() -> None:
     )
     _CAMERA.lookAt(Vector3.new(0, 0, 0))
     _CAMERA.updateProjectionMatrix()
-    _RENDERER = utils.renderer_config(WebGLRenderer, _WIDTH, _HEIGHT, 0x46474c)  # Middle grey
+    _QUALITY = quality.QualityGovernor.from_query(
+        WebGLRenderer, _WIDTH, _HEIGHT, 0x46474c,  # Middle grey
+        on_level=_handle_quality, on_resize=_handle_resize)
 
 
 def _setup() -> None:
     global _RECTS
+    global _ENGINE
+    global _START_MS
+    global _PROFILER
+    global _TRANSFORMS
 
     num_rects = 100
 
     _CAMERA.setFocalLength = 70
     _CAMERA.position.z = 20
     _CAMERA.updateProjectionMatrix()
-    _RECTS = [Rect() for _ in range(num_rects)]
+    _ENGINE = orbits.OrbitEngine(num_rects)
+    indices: np.ndarray = Rect.spawn(_ENGINE, num_rects, sampling.generator())
+    _RECTS = [Rect(_ENGINE, index) for index in indices.tolist()]
     for rect in _RECTS:
         _SCENE.add(rect.get_mesh_object())
-    window.addEventListener('resize', ffi.create_proxy(_handle_resize))
-    document.body.appendChild(_RENDERER.domElement)
-    _RENDERER.setAnimationLoop(ffi.create_proxy(_animate))
-    _RENDERER.render(_SCENE, _CAMERA)
+    _TRANSFORMS = bridge.TransformBuffer(len(_RECTS), matrix=16)
+    _TRANSFORMS.bind_objects('matrix', [rect.get_mesh_object() for rect in _RECTS])
+    document.body.appendChild(_QUALITY.renderer.domElement)
+    _PROFILER = profiler.FrameProfiler.from_query()
+    _START_MS = window.performance.now()
+    _QUALITY.start(_animate)
+    _QUALITY.renderer.render(_SCENE, _CAMERA)
 
 
 def _animate(*args: dict[str, Any]) -> None:
-    for rect in _RECTS:
-        rect.rotate()
-        rect.orbit()
-        rect.recolor()
-    _RENDERER.render(_SCENE, _CAMERA)
+    # Positions are a function of wall-clock time, so a slow frame just
+    # skips ahead rather than slowing everything down
+    if not _QUALITY.frame():
+        return
+    _PROFILER.begin_frame()
+    # Rects the quality level hides aren't moved (they catch up when shown)
+    count: int = _ENGINE.count if _ACTIVE is None else _ACTIVE
+    _ENGINE.seek(utils.seconds_since(_START_MS), count=count)
+    _PROFILER.mark('simulate')
+    # What `Rect.orbit()` and `rotate()` do, for every rect shown at once,
+    # handed to three.js in a single call. Only rects whose color bucket
+    # changed this frame get different materials.
+    _ENGINE.write_matrices(_TRANSFORMS.section('matrix'), count=count)
+    angles: np.ndarray = _ENGINE.angle[:count]
+    Rect.PLANES.update(angles)
+    Rect.OUTLINES.update(angles)
+    _TRANSFORMS.apply(count)
+    _PROFILER.mark('update')
+    _QUALITY.renderer.render(_SCENE, _CAMERA)
+    _PROFILER.mark('render')
+    _PROFILER.end_frame(_QUALITY.renderer)
 
 _init()
 _setup()
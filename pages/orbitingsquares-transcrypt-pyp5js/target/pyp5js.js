@@ -1,4 +1,4 @@
-// Transcrypt'ed from Python, 2022-02-26 21:36:45
+// Transcrypt'ed from Python, 2026-10-17 11:14:14
 import {AssertionError, AttributeError, BaseException, DeprecationWarning, Exception, IndexError, IterableError, KeyError, NotImplementedError, RuntimeWarning, StopIteration, UserWarning, ValueError, Warning, __JsIterator__, __PyIterator__, __Terminal__, __add__, __and__, __call__, __class__, __envir__, __eq__, __floordiv__, __ge__, __get__, __getcm__, __getitem__, __getslice__, __getsm__, __gt__, __i__, __iadd__, __iand__, __idiv__, __ijsmod__, __ilshift__, __imatmul__, __imod__, __imul__, __in__, __init__, __ior__, __ipow__, __irshift__, __isub__, __ixor__, __jsUsePyNext__, __jsmod__, __k__, __kwargtrans__, __le__, __lshift__, __lt__, __matmul__, __mergefields__, __mergekwargtrans__, __mod__, __mul__, __ne__, __neg__, __nest__, __or__, __pow__, __pragma__, __pyUseJsNext__, __rshift__, __setitem__, __setproperty__, __setslice__, __sort__, __specialattrib__, __sub__, __super__, __t__, __terminal__, __truediv__, __withblock__, __xor__, all, any, assert, bool, bytearray, bytes, callable, chr, deepcopy, delattr, dict, dir, divmod, enumerate, getattr, hasattr, isinstance, issubclass, len, list, object, ord, print, property, py_TypeError, py_iter, py_metatype, py_next, py_reversed, py_typeof, range, repr, setattr, sorted, sum, tuple, zip} from './org.transcrypt.__runtime__.js';
 import {PythonFunctions} from './python_functions.js';
 var __name__ = 'pyp5js';
@@ -116,6 +116,7 @@ export var VIDEO = null;
 export var WAIT = null;
 export var WEBGL = null;
 export var P2D = null;
+export var P3D = null;
 var PI = null;
 export var frameCount = null;
 export var focused = null;
@@ -4053,7 +4054,21 @@ setattr (PVector, 'angleBetween', p5.Vector.angleBetween);
 setattr (PVector, 'fromAngle', p5.Vector.fromAngle);
 setattr (PVector, 'fromAngles', p5.Vector.fromAngles);
 setattr (PVector, 'equals', p5.Vector.equals);
-export var pre_draw = function (p5_instance, draw_func) {
+export var _FRAME_STATE = tuple (['frameCount', 'focused', 'disableFriendlyErrors']);
+export var _SIZE_STATE = tuple (['displayWidth', 'displayHeight', 'windowWidth', 'windowHeight', 'width', 'height']);
+export var _MOTION_STATE = tuple (['deviceOrientation', 'accelerationX', 'accelerationY', 'accelerationZ', 'pAccelerationX', 'pAccelerationY', 'pAccelerationZ', 'rotationX', 'rotationY', 'rotationZ', 'pRotationX', 'pRotationY', 'pRotationZ', 'turnAxis']);
+export var _KEYS_STATE = tuple (['keyIsPressed', 'key', 'keyCode']);
+export var _MOUSE_STATE = tuple (['mouseX', 'mouseY', 'pmouseX', 'pmouseY', 'winMouseX', 'winMouseY', 'pwinMouseX', 'pwinMouseY', 'mouseButton', 'mouseIsPressed']);
+export var _TOUCHES_STATE = tuple (['touches']);
+export var _PIXELS_STATE = tuple (['pixels']);
+export var _REFRESH_FRAME = true;
+export var _REFRESH_SIZE = true;
+export var _REFRESH_MOTION = true;
+export var _REFRESH_KEYS = true;
+export var _REFRESH_MOUSE = true;
+export var _REFRESH_TOUCHES = true;
+export var _REFRESH_PIXELS = true;
+export var bind_constants = function (p5_instance) {
 	if (arguments.length) {
 		var __ilastarg0__ = arguments.length - 1;
 		if (arguments [__ilastarg0__] && arguments [__ilastarg0__].hasOwnProperty ("__kwargtrans__")) {
@@ -4061,7 +4076,6 @@ export var pre_draw = function (p5_instance, draw_func) {
 			for (var __attrib0__ in __allkwargs0__) {
 				switch (__attrib0__) {
 					case 'p5_instance': var p5_instance = __allkwargs0__ [__attrib0__]; break;
-					case 'draw_func': var draw_func = __allkwargs0__ [__attrib0__]; break;
 				}
 			}
 		}
@@ -4141,7 +4155,7 @@ export var pre_draw = function (p5_instance, draw_func) {
 	OPTION = p5_instance.OPTION;
 	OVERLAY = p5_instance.OVERLAY;
 	P2D = p5_instance.P2D;
-	var P3D = p5_instance.WEBGL;
+	P3D = p5_instance.WEBGL;
 	PI = p5_instance.PI;
 	PIE = p5_instance.PIE;
 	POINTS = p5_instance.POINTS;
@@ -4182,44 +4196,187 @@ export var pre_draw = function (p5_instance, draw_func) {
 	VIDEO = p5_instance.VIDEO;
 	WAIT = p5_instance.WAIT;
 	WEBGL = p5_instance.WEBGL;
-	frameCount = p5_instance.frameCount;
-	focused = p5_instance.focused;
-	displayWidth = p5_instance.displayWidth;
-	displayHeight = p5_instance.displayHeight;
-	windowWidth = p5_instance.windowWidth;
-	windowHeight = p5_instance.windowHeight;
-	width = p5_instance.width;
-	height = p5_instance.height;
-	disableFriendlyErrors = p5_instance.disableFriendlyErrors;
-	deviceOrientation = p5_instance.deviceOrientation;
-	accelerationX = p5_instance.accelerationX;
-	accelerationY = p5_instance.accelerationY;
-	accelerationZ = p5_instance.accelerationZ;
-	pAccelerationX = p5_instance.pAccelerationX;
-	pAccelerationY = p5_instance.pAccelerationY;
-	pAccelerationZ = p5_instance.pAccelerationZ;
-	rotationX = p5_instance.rotationX;
-	rotationY = p5_instance.rotationY;
-	rotationZ = p5_instance.rotationZ;
-	pRotationX = p5_instance.pRotationX;
-	pRotationY = p5_instance.pRotationY;
-	pRotationZ = p5_instance.pRotationZ;
-	turnAxis = p5_instance.turnAxis;
-	keyIsPressed = p5_instance.keyIsPressed;
-	key = p5_instance.key;
-	keyCode = p5_instance.keyCode;
-	mouseX = p5_instance.mouseX;
-	mouseY = p5_instance.mouseY;
-	pmouseX = p5_instance.pmouseX;
-	pmouseY = p5_instance.pmouseY;
-	winMouseX = p5_instance.winMouseX;
-	winMouseY = p5_instance.winMouseY;
-	pwinMouseX = p5_instance.pwinMouseX;
-	pwinMouseY = p5_instance.pwinMouseY;
-	mouseButton = p5_instance.mouseButton;
-	mouseIsPressed = p5_instance.mouseIsPressed;
-	touches = p5_instance.touches;
-	pixels = p5_instance.pixels;
+};
+export var bind_methods = function (p5_instance) {
+	if (arguments.length) {
+		var __ilastarg0__ = arguments.length - 1;
+		if (arguments [__ilastarg0__] && arguments [__ilastarg0__].hasOwnProperty ("__kwargtrans__")) {
+			var __allkwargs0__ = arguments [__ilastarg0__--];
+			for (var __attrib0__ in __allkwargs0__) {
+				switch (__attrib0__) {
+					case 'p5_instance': var p5_instance = __allkwargs0__ [__attrib0__]; break;
+				}
+			}
+		}
+	}
+	else {
+	}
+	arc = p5_instance.arc.bind (p5_instance);
+	circle = p5_instance.circle.bind (p5_instance);
+	ellipse = p5_instance.ellipse.bind (p5_instance);
+	line = p5_instance.line.bind (p5_instance);
+	point = p5_instance.point.bind (p5_instance);
+	quad = p5_instance.quad.bind (p5_instance);
+	rect = p5_instance.rect.bind (p5_instance);
+	square = p5_instance.square.bind (p5_instance);
+	triangle = p5_instance.triangle.bind (p5_instance);
+	beginShape = p5_instance.beginShape.bind (p5_instance);
+	vertex = p5_instance.vertex.bind (p5_instance);
+	endShape = p5_instance.endShape.bind (p5_instance);
+	image = p5_instance.image.bind (p5_instance);
+	text = p5_instance.text.bind (p5_instance);
+	background = p5_instance.background.bind (p5_instance);
+	fill = p5_instance.fill.bind (p5_instance);
+	noFill = p5_instance.noFill.bind (p5_instance);
+	stroke = p5_instance.stroke.bind (p5_instance);
+	noStroke = p5_instance.noStroke.bind (p5_instance);
+	strokeWeight = p5_instance.strokeWeight.bind (p5_instance);
+	color = p5_instance.color.bind (p5_instance);
+	lerpColor = p5_instance.lerpColor.bind (p5_instance);
+	red = p5_instance.red.bind (p5_instance);
+	green = p5_instance.green.bind (p5_instance);
+	blue = p5_instance.blue.bind (p5_instance);
+	alpha = p5_instance.alpha.bind (p5_instance);
+	push = p5_instance.push.bind (p5_instance);
+	py_pop = getattr (p5_instance, 'pop').bind (p5_instance);
+	translate = p5_instance.translate.bind (p5_instance);
+	rotate = p5_instance.rotate.bind (p5_instance);
+	rotateX = p5_instance.rotateX.bind (p5_instance);
+	rotateY = p5_instance.rotateY.bind (p5_instance);
+	rotateZ = p5_instance.rotateZ.bind (p5_instance);
+	scale = p5_instance.scale.bind (p5_instance);
+	resetMatrix = p5_instance.resetMatrix.bind (p5_instance);
+	abs = p5_instance.abs.bind (p5_instance);
+	int = p5_instance.int.bind (p5_instance);
+	min = p5_instance.min.bind (p5_instance);
+	max = p5_instance.max.bind (p5_instance);
+	round = p5_instance.round.bind (p5_instance);
+	pow = p5_instance.pow.bind (p5_instance);
+	sin = p5_instance.sin.bind (p5_instance);
+	cos = p5_instance.cos.bind (p5_instance);
+	tan = p5_instance.tan.bind (p5_instance);
+	atan2 = p5_instance.atan2.bind (p5_instance);
+	sqrt = p5_instance.sqrt.bind (p5_instance);
+	floor = p5_instance.floor.bind (p5_instance);
+	ceil = p5_instance.ceil.bind (p5_instance);
+	constrain = p5_instance.constrain.bind (p5_instance);
+	lerp = p5_instance.lerp.bind (p5_instance);
+	dist = p5_instance.dist.bind (p5_instance);
+	random = p5_instance.random.bind (p5_instance);
+	noise = p5_instance.noise.bind (p5_instance);
+	createVector = p5_instance.createVector.bind (p5_instance);
+};
+export var select_state = function (state_names) {
+	if (arguments.length) {
+		var __ilastarg0__ = arguments.length - 1;
+		if (arguments [__ilastarg0__] && arguments [__ilastarg0__].hasOwnProperty ("__kwargtrans__")) {
+			var __allkwargs0__ = arguments [__ilastarg0__--];
+			for (var __attrib0__ in __allkwargs0__) {
+				switch (__attrib0__) {
+					case 'state_names': var state_names = __allkwargs0__ [__attrib0__]; break;
+				}
+			}
+		}
+	}
+	else {
+	}
+	_REFRESH_FRAME = _reads_any (state_names, _FRAME_STATE);
+	_REFRESH_SIZE = _reads_any (state_names, _SIZE_STATE);
+	_REFRESH_MOTION = _reads_any (state_names, _MOTION_STATE);
+	_REFRESH_KEYS = _reads_any (state_names, _KEYS_STATE);
+	_REFRESH_MOUSE = _reads_any (state_names, _MOUSE_STATE);
+	_REFRESH_TOUCHES = _reads_any (state_names, _TOUCHES_STATE);
+	_REFRESH_PIXELS = _reads_any (state_names, _PIXELS_STATE);
+};
+export var _reads_any = function (state_names, group) {
+	if (arguments.length) {
+		var __ilastarg0__ = arguments.length - 1;
+		if (arguments [__ilastarg0__] && arguments [__ilastarg0__].hasOwnProperty ("__kwargtrans__")) {
+			var __allkwargs0__ = arguments [__ilastarg0__--];
+			for (var __attrib0__ in __allkwargs0__) {
+				switch (__attrib0__) {
+					case 'state_names': var state_names = __allkwargs0__ [__attrib0__]; break;
+					case 'group': var group = __allkwargs0__ [__attrib0__]; break;
+				}
+			}
+		}
+	}
+	else {
+	}
+	for (var py_name of group) {
+		if (__in__ (py_name, state_names)) {
+			return true;
+		}
+	}
+	return false;
+};
+export var pre_draw = function (p5_instance, draw_func) {
+	if (arguments.length) {
+		var __ilastarg0__ = arguments.length - 1;
+		if (arguments [__ilastarg0__] && arguments [__ilastarg0__].hasOwnProperty ("__kwargtrans__")) {
+			var __allkwargs0__ = arguments [__ilastarg0__--];
+			for (var __attrib0__ in __allkwargs0__) {
+				switch (__attrib0__) {
+					case 'p5_instance': var p5_instance = __allkwargs0__ [__attrib0__]; break;
+					case 'draw_func': var draw_func = __allkwargs0__ [__attrib0__]; break;
+				}
+			}
+		}
+	}
+	else {
+	}
+	if (_REFRESH_FRAME) {
+		frameCount = p5_instance.frameCount;
+		focused = p5_instance.focused;
+		disableFriendlyErrors = p5_instance.disableFriendlyErrors;
+	}
+	if (_REFRESH_SIZE) {
+		displayWidth = p5_instance.displayWidth;
+		displayHeight = p5_instance.displayHeight;
+		windowWidth = p5_instance.windowWidth;
+		windowHeight = p5_instance.windowHeight;
+		width = p5_instance.width;
+		height = p5_instance.height;
+	}
+	if (_REFRESH_MOTION) {
+		deviceOrientation = p5_instance.deviceOrientation;
+		accelerationX = p5_instance.accelerationX;
+		accelerationY = p5_instance.accelerationY;
+		accelerationZ = p5_instance.accelerationZ;
+		pAccelerationX = p5_instance.pAccelerationX;
+		pAccelerationY = p5_instance.pAccelerationY;
+		pAccelerationZ = p5_instance.pAccelerationZ;
+		rotationX = p5_instance.rotationX;
+		rotationY = p5_instance.rotationY;
+		rotationZ = p5_instance.rotationZ;
+		pRotationX = p5_instance.pRotationX;
+		pRotationY = p5_instance.pRotationY;
+		pRotationZ = p5_instance.pRotationZ;
+		turnAxis = p5_instance.turnAxis;
+	}
+	if (_REFRESH_KEYS) {
+		keyIsPressed = p5_instance.keyIsPressed;
+		key = p5_instance.key;
+		keyCode = p5_instance.keyCode;
+	}
+	if (_REFRESH_MOUSE) {
+		mouseX = p5_instance.mouseX;
+		mouseY = p5_instance.mouseY;
+		pmouseX = p5_instance.pmouseX;
+		pmouseY = p5_instance.pmouseY;
+		winMouseX = p5_instance.winMouseX;
+		winMouseY = p5_instance.winMouseY;
+		pwinMouseX = p5_instance.pwinMouseX;
+		pwinMouseY = p5_instance.pwinMouseY;
+		mouseButton = p5_instance.mouseButton;
+		mouseIsPressed = p5_instance.mouseIsPressed;
+	}
+	if (_REFRESH_TOUCHES) {
+		touches = p5_instance.touches;
+	}
+	if (_REFRESH_PIXELS) {
+		pixels = p5_instance.pixels;
+	}
 	return draw_func ();
 };
 export var global_p5_injection = function (p5_sketch) {
@@ -4268,7 +4425,10 @@ export var global_p5_injection = function (p5_sketch) {
 	};
 	return decorator;
 };
-export var start_p5 = function (preload_func, setup_func, draw_func, event_functions) {
+export var start_p5 = function (preload_func, setup_func, draw_func, event_functions, state_names) {
+	if (typeof state_names == 'undefined' || (state_names != null && state_names.hasOwnProperty ("__kwargtrans__"))) {;
+		var state_names = null;
+	};
 	if (arguments.length) {
 		var __ilastarg0__ = arguments.length - 1;
 		if (arguments [__ilastarg0__] && arguments [__ilastarg0__].hasOwnProperty ("__kwargtrans__")) {
@@ -4279,12 +4439,16 @@ export var start_p5 = function (preload_func, setup_func, draw_func, event_funct
 					case 'setup_func': var setup_func = __allkwargs0__ [__attrib0__]; break;
 					case 'draw_func': var draw_func = __allkwargs0__ [__attrib0__]; break;
 					case 'event_functions': var event_functions = __allkwargs0__ [__attrib0__]; break;
+					case 'state_names': var state_names = __allkwargs0__ [__attrib0__]; break;
 				}
 			}
 		}
 	}
 	else {
 	}
+	if (state_names !== null) {
+		select_state (state_names);
+	}
 	var sketch_setup = function (p5_sketch) {
 		if (arguments.length) {
 			var __ilastarg0__ = arguments.length - 1;
@@ -4299,6 +4463,8 @@ export var start_p5 = function (preload_func, setup_func, draw_func, event_funct
 		}
 		else {
 		}
+		bind_constants (p5_sketch);
+		bind_methods (p5_sketch);
 		p5_sketch.preload = global_p5_injection (p5_sketch) (preload_func);
 		p5_sketch.setup = global_p5_injection (p5_sketch) (setup_func);
 		p5_sketch.draw = global_p5_injection (p5_sketch) (draw_func);
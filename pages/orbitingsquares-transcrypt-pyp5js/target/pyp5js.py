@@ -116,6 +116,7 @@ VIDEO = None
 WAIT = None
 WEBGL = None
 P2D = None
+P3D = None
 PI = None
 
 frameCount = None
@@ -991,9 +992,32 @@ setattr(PVector, 'fromAngle', p5.Vector.fromAngle)
 setattr(PVector, 'fromAngles', p5.Vector.fromAngles)
 setattr(PVector, 'equals', p5.Vector.equals)
 
-def pre_draw(p5_instance, draw_func):
+# p5's per-frame state comes in groups, each refreshed by `pre_draw()` only
+# if the sketch reads something in it: see `select_state()`
+_FRAME_STATE = ('frameCount', 'focused', 'disableFriendlyErrors')
+_SIZE_STATE = ('displayWidth', 'displayHeight', 'windowWidth', 'windowHeight', 'width', 'height')
+_MOTION_STATE = ('deviceOrientation', 'accelerationX', 'accelerationY', 'accelerationZ',
+                 'pAccelerationX', 'pAccelerationY', 'pAccelerationZ', 'rotationX', 'rotationY',
+                 'rotationZ', 'pRotationX', 'pRotationY', 'pRotationZ', 'turnAxis')
+_KEYS_STATE = ('keyIsPressed', 'key', 'keyCode')
+_MOUSE_STATE = ('mouseX', 'mouseY', 'pmouseX', 'pmouseY', 'winMouseX', 'winMouseY', 'pwinMouseX',
+                'pwinMouseY', 'mouseButton', 'mouseIsPressed')
+_TOUCHES_STATE = ('touches',)
+_PIXELS_STATE = ('pixels',)
+
+_REFRESH_FRAME = True
+_REFRESH_SIZE = True
+_REFRESH_MOTION = True
+_REFRESH_KEYS = True
+_REFRESH_MOUSE = True
+_REFRESH_TOUCHES = True
+_REFRESH_PIXELS = True
+
+
+def bind_constants(p5_instance):
     """
-    We need to run this before the actual draw to insert and update p5 env variables
+    Binds p5's constants (`PI`, `TRIANGLES`, `WEBGL`...) as globals. They
+    never change, so `start_p5()` does this once, before `preload()`
     """
     global _CTX_MIDDLE, _DEFAULT_FILL, _DEFAULT_LEADMULT, _DEFAULT_STROKE, _DEFAULT_TEXT_FILL
 
@@ -1002,17 +1026,11 @@ def pre_draw(p5_instance, draw_func):
     global DEG_TO_RAD, DEGREES, DELETE, DIFFERENCE, DILATE, DODGE, DOWN_ARROW, ENTER, ERODE, ESCAPE, EXCLUSION
     global FILL, GRAY, GRID, HALF_PI, HAND, HARD_LIGHT, HSB, HSL, IMAGE, IMMEDIATE, INVERT, ITALIC, LANDSCAPE
     global LEFT, LEFT_ARROW, LIGHTEST, LINE_LOOP, LINE_STRIP, LINEAR, LINES, MIRROR, MITER, MOVE, MULTIPLY, NEAREST
-    global NORMAL, OPAQUE, OPEN, OPTION, OVERLAY, P2D, PI, PIE, POINTS, PORTRAIT, POSTERIZE, PROJECT, QUAD_STRIP, QUADRATIC
+    global NORMAL, OPAQUE, OPEN, OPTION, OVERLAY, P2D, P3D, PI, PIE, POINTS, PORTRAIT, POSTERIZE, PROJECT, QUAD_STRIP, QUADRATIC
     global QUADS, QUARTER_PI, RAD_TO_DEG, RADIANS, RADIUS, REPEAT, REPLACE, RETURN, RGB, RIGHT, RIGHT_ARROW
     global ROUND, SCREEN, SHIFT, SOFT_LIGHT, SQUARE, STROKE, SUBTRACT, TAB, TAU, TEXT, TEXTURE, THRESHOLD, TOP
     global TRIANGLE_FAN, TRIANGLE_STRIP, TRIANGLES, TWO_PI, UP_ARROW, VIDEO, WAIT, WEBGL
 
-    global frameCount, focused, displayWidth, displayHeight, windowWidth, windowHeight, width, height
-    global disableFriendlyErrors, deviceOrientation, accelerationX, accelerationY, accelerationZ
-    global pAccelerationX, pAccelerationY, pAccelerationZ, rotationX, rotationY, rotationZ
-    global pRotationX, pRotationY, pRotationZ, turnAxis, keyIsPressed, key, keyCode, mouseX, mouseY, pmouseX, pmouseY
-    global winMouseX, winMouseY, pwinMouseX, pwinMouseY, mouseButton, mouseIsPressed, touches, pixels
-
     _CTX_MIDDLE = p5_instance._CTX_MIDDLE
     _DEFAULT_FILL = p5_instance._DEFAULT_FILL
     _DEFAULT_LEADMULT = p5_instance._DEFAULT_LEADMULT
@@ -1129,44 +1147,158 @@ def pre_draw(p5_instance, draw_func):
     WAIT = p5_instance.WAIT
     WEBGL = p5_instance.WEBGL
 
-    frameCount = p5_instance.frameCount
-    focused = p5_instance.focused
-    displayWidth = p5_instance.displayWidth
-    displayHeight = p5_instance.displayHeight
-    windowWidth = p5_instance.windowWidth
-    windowHeight = p5_instance.windowHeight
-    width = p5_instance.width
-    height = p5_instance.height
-    disableFriendlyErrors = p5_instance.disableFriendlyErrors
-    deviceOrientation = p5_instance.deviceOrientation
-    accelerationX = p5_instance.accelerationX
-    accelerationY = p5_instance.accelerationY
-    accelerationZ = p5_instance.accelerationZ
-    pAccelerationX = p5_instance.pAccelerationX
-    pAccelerationY = p5_instance.pAccelerationY
-    pAccelerationZ = p5_instance.pAccelerationZ
-    rotationX = p5_instance.rotationX
-    rotationY = p5_instance.rotationY
-    rotationZ = p5_instance.rotationZ
-    pRotationX = p5_instance.pRotationX
-    pRotationY = p5_instance.pRotationY
-    pRotationZ = p5_instance.pRotationZ
-    turnAxis = p5_instance.turnAxis
-    keyIsPressed = p5_instance.keyIsPressed
-    key = p5_instance.key
-    keyCode = p5_instance.keyCode
-    mouseX = p5_instance.mouseX
-    mouseY = p5_instance.mouseY
-    pmouseX = p5_instance.pmouseX
-    pmouseY = p5_instance.pmouseY
-    winMouseX = p5_instance.winMouseX
-    winMouseY = p5_instance.winMouseY
-    pwinMouseX = p5_instance.pwinMouseX
-    pwinMouseY = p5_instance.pwinMouseY
-    mouseButton = p5_instance.mouseButton
-    mouseIsPressed = p5_instance.mouseIsPressed
-    touches = p5_instance.touches
-    pixels = p5_instance.pixels
+
+def bind_methods(p5_instance):
+    """
+    Replaces the wrappers of the p5 functions a sketch calls many times a
+    frame (`rect`, `fill`, `translate`, `sin`...) with the instance's own
+    methods, bound to it: calling one is then a plain JS call, without
+    packing `*args` or looking up `_P5_INSTANCE`. `start_p5()` does this
+    once, as soon as the instance exists; functions not bound here keep
+    their wrappers
+    """
+    global arc, circle, ellipse, line, point, quad, rect, square, triangle, beginShape, vertex, endShape, image, text
+    global background, fill, noFill, stroke, noStroke, strokeWeight, color, lerpColor, red, green, blue, alpha
+    global push, pop, translate, rotate, rotateX, rotateY, rotateZ, scale, resetMatrix
+    global abs, int, min, max, round, pow, sin, cos, tan, atan2, sqrt, floor, ceil, constrain, lerp, dist
+    global random, noise, createVector
+
+    arc = p5_instance.arc.bind(p5_instance)
+    circle = p5_instance.circle.bind(p5_instance)
+    ellipse = p5_instance.ellipse.bind(p5_instance)
+    line = p5_instance.line.bind(p5_instance)
+    point = p5_instance.point.bind(p5_instance)
+    quad = p5_instance.quad.bind(p5_instance)
+    rect = p5_instance.rect.bind(p5_instance)
+    square = p5_instance.square.bind(p5_instance)
+    triangle = p5_instance.triangle.bind(p5_instance)
+    beginShape = p5_instance.beginShape.bind(p5_instance)
+    vertex = p5_instance.vertex.bind(p5_instance)
+    endShape = p5_instance.endShape.bind(p5_instance)
+    image = p5_instance.image.bind(p5_instance)
+    text = p5_instance.text.bind(p5_instance)
+    background = p5_instance.background.bind(p5_instance)
+    fill = p5_instance.fill.bind(p5_instance)
+    noFill = p5_instance.noFill.bind(p5_instance)
+    stroke = p5_instance.stroke.bind(p5_instance)
+    noStroke = p5_instance.noStroke.bind(p5_instance)
+    strokeWeight = p5_instance.strokeWeight.bind(p5_instance)
+    color = p5_instance.color.bind(p5_instance)
+    lerpColor = p5_instance.lerpColor.bind(p5_instance)
+    red = p5_instance.red.bind(p5_instance)
+    green = p5_instance.green.bind(p5_instance)
+    blue = p5_instance.blue.bind(p5_instance)
+    alpha = p5_instance.alpha.bind(p5_instance)
+    push = p5_instance.push.bind(p5_instance)
+    # Transcrypt renames `pop` to `py_pop` (see `pop()` above), but not in a string
+    pop = getattr(p5_instance, 'pop').bind(p5_instance)
+    translate = p5_instance.translate.bind(p5_instance)
+    rotate = p5_instance.rotate.bind(p5_instance)
+    rotateX = p5_instance.rotateX.bind(p5_instance)
+    rotateY = p5_instance.rotateY.bind(p5_instance)
+    rotateZ = p5_instance.rotateZ.bind(p5_instance)
+    scale = p5_instance.scale.bind(p5_instance)
+    resetMatrix = p5_instance.resetMatrix.bind(p5_instance)
+    abs = p5_instance.abs.bind(p5_instance)
+    int = p5_instance.int.bind(p5_instance)
+    min = p5_instance.min.bind(p5_instance)
+    max = p5_instance.max.bind(p5_instance)
+    round = p5_instance.round.bind(p5_instance)
+    pow = p5_instance.pow.bind(p5_instance)
+    sin = p5_instance.sin.bind(p5_instance)
+    cos = p5_instance.cos.bind(p5_instance)
+    tan = p5_instance.tan.bind(p5_instance)
+    atan2 = p5_instance.atan2.bind(p5_instance)
+    sqrt = p5_instance.sqrt.bind(p5_instance)
+    floor = p5_instance.floor.bind(p5_instance)
+    ceil = p5_instance.ceil.bind(p5_instance)
+    constrain = p5_instance.constrain.bind(p5_instance)
+    lerp = p5_instance.lerp.bind(p5_instance)
+    dist = p5_instance.dist.bind(p5_instance)
+    random = p5_instance.random.bind(p5_instance)
+    noise = p5_instance.noise.bind(p5_instance)
+    createVector = p5_instance.createVector.bind(p5_instance)
+
+
+def select_state(state_names):
+    """
+    Limits `pre_draw()` to refreshing the groups of per-frame state
+    (`frameCount`, `mouseX`, `width`...) holding one of `state_names`: the
+    ones the sketch actually reads
+    """
+    global _REFRESH_FRAME, _REFRESH_SIZE, _REFRESH_MOTION, _REFRESH_KEYS, _REFRESH_MOUSE, _REFRESH_TOUCHES, _REFRESH_PIXELS
+
+    _REFRESH_FRAME = _reads_any(state_names, _FRAME_STATE)
+    _REFRESH_SIZE = _reads_any(state_names, _SIZE_STATE)
+    _REFRESH_MOTION = _reads_any(state_names, _MOTION_STATE)
+    _REFRESH_KEYS = _reads_any(state_names, _KEYS_STATE)
+    _REFRESH_MOUSE = _reads_any(state_names, _MOUSE_STATE)
+    _REFRESH_TOUCHES = _reads_any(state_names, _TOUCHES_STATE)
+    _REFRESH_PIXELS = _reads_any(state_names, _PIXELS_STATE)
+
+
+def _reads_any(state_names, group):
+    for name in group:
+        if name in state_names:
+            return True
+    return False
+
+
+def pre_draw(p5_instance, draw_func):
+    """
+    We need to run this before the actual draw to update p5's per-frame state
+    """
+    global frameCount, focused, displayWidth, displayHeight, windowWidth, windowHeight, width, height
+    global disableFriendlyErrors, deviceOrientation, accelerationX, accelerationY, accelerationZ
+    global pAccelerationX, pAccelerationY, pAccelerationZ, rotationX, rotationY, rotationZ
+    global pRotationX, pRotationY, pRotationZ, turnAxis, keyIsPressed, key, keyCode, mouseX, mouseY, pmouseX, pmouseY
+    global winMouseX, winMouseY, pwinMouseX, pwinMouseY, mouseButton, mouseIsPressed, touches, pixels
+
+    if _REFRESH_FRAME:
+        frameCount = p5_instance.frameCount
+        focused = p5_instance.focused
+        disableFriendlyErrors = p5_instance.disableFriendlyErrors
+    if _REFRESH_SIZE:
+        displayWidth = p5_instance.displayWidth
+        displayHeight = p5_instance.displayHeight
+        windowWidth = p5_instance.windowWidth
+        windowHeight = p5_instance.windowHeight
+        width = p5_instance.width
+        height = p5_instance.height
+    if _REFRESH_MOTION:
+        deviceOrientation = p5_instance.deviceOrientation
+        accelerationX = p5_instance.accelerationX
+        accelerationY = p5_instance.accelerationY
+        accelerationZ = p5_instance.accelerationZ
+        pAccelerationX = p5_instance.pAccelerationX
+        pAccelerationY = p5_instance.pAccelerationY
+        pAccelerationZ = p5_instance.pAccelerationZ
+        rotationX = p5_instance.rotationX
+        rotationY = p5_instance.rotationY
+        rotationZ = p5_instance.rotationZ
+        pRotationX = p5_instance.pRotationX
+        pRotationY = p5_instance.pRotationY
+        pRotationZ = p5_instance.pRotationZ
+        turnAxis = p5_instance.turnAxis
+    if _REFRESH_KEYS:
+        keyIsPressed = p5_instance.keyIsPressed
+        key = p5_instance.key
+        keyCode = p5_instance.keyCode
+    if _REFRESH_MOUSE:
+        mouseX = p5_instance.mouseX
+        mouseY = p5_instance.mouseY
+        pmouseX = p5_instance.pmouseX
+        pmouseY = p5_instance.pmouseY
+        winMouseX = p5_instance.winMouseX
+        winMouseY = p5_instance.winMouseY
+        pwinMouseX = p5_instance.pwinMouseX
+        pwinMouseY = p5_instance.pwinMouseY
+        mouseButton = p5_instance.mouseButton
+        mouseIsPressed = p5_instance.mouseIsPressed
+    if _REFRESH_TOUCHES:
+        touches = p5_instance.touches
+    if _REFRESH_PIXELS:
+        pixels = p5_instance.pixels
 
     return draw_func()
 
@@ -1189,20 +1321,28 @@ def global_p5_injection(p5_sketch):
     return decorator
 
 
-def start_p5(preload_func, setup_func, draw_func, event_functions):
+def start_p5(preload_func, setup_func, draw_func, event_functions, state_names=None):
     """
-    This is the entrypoint function. It accepts 2 parameters:
+    This is the entrypoint function. It accepts these parameters:
 
     - preload_func: a Python preload callable
     - setup_func: a Python setup callable
     - draw_func: a Python draw callable
     - event_functions: a config dict for the event functions in the format:
                        {"eventFunctionName": python_event_function}
+    - state_names: optional, the names of p5's per-frame variables the
+                   sketch reads (`["frameCount", "mouseX"]`); only those
+                   (and their groups) are refreshed before each callback.
+                   By default they all are
 
     This method gets the p5js's sketch instance and injects them
     """
+    if state_names is not None:
+        select_state(state_names)
 
     def sketch_setup(p5_sketch):
+        bind_constants(p5_sketch)
+        bind_methods(p5_sketch)
         p5_sketch.preload = global_p5_injection(p5_sketch)(preload_func)
         p5_sketch.setup = global_p5_injection(p5_sketch)(setup_func)
         p5_sketch.draw = global_p5_injection(p5_sketch)(draw_func)
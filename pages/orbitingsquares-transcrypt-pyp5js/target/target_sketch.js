@@ -1,6 +1,6 @@
-// Transcrypt'ed from Python, 2022-02-26 21:36:45
+// Transcrypt'ed from Python, 2026-10-17 11:14:14
 import {AssertionError, AttributeError, BaseException, DeprecationWarning, Exception, IndexError, IterableError, KeyError, NotImplementedError, RuntimeWarning, StopIteration, UserWarning, ValueError, Warning, __JsIterator__, __PyIterator__, __Terminal__, __add__, __and__, __call__, __class__, __envir__, __eq__, __floordiv__, __ge__, __get__, __getcm__, __getitem__, __getslice__, __getsm__, __gt__, __i__, __iadd__, __iand__, __idiv__, __ijsmod__, __ilshift__, __imatmul__, __imod__, __imul__, __in__, __init__, __ior__, __ipow__, __irshift__, __isub__, __ixor__, __jsUsePyNext__, __jsmod__, __k__, __kwargtrans__, __le__, __lshift__, __lt__, __matmul__, __mergefields__, __mergekwargtrans__, __mod__, __mul__, __ne__, __neg__, __nest__, __or__, __pow__, __pragma__, __pyUseJsNext__, __rshift__, __setitem__, __setproperty__, __setslice__, __sort__, __specialattrib__, __sub__, __super__, __t__, __terminal__, __truediv__, __withblock__, __xor__, all, any, assert, bool, bytearray, bytes, callable, chr, deepcopy, delattr, dict, dir, divmod, enumerate, getattr, hasattr, isinstance, issubclass, len, list, object, ord, print, property, py_TypeError, py_iter, py_metatype, py_next, py_reversed, py_typeof, range, repr, set, setattr, sorted, sum, tuple, zip} from './org.transcrypt.__runtime__.js';
-import {ADD, ALT, ARROW, AUDIO, AUTO, AXES, BACKSPACE, BASELINE, BEVEL, BEZIER, BLEND, BLUR, BOLD, BOLDITALIC, BOTTOM, BURN, CENTER, CHORD, CLAMP, CLOSE, CONTROL, CORNER, CORNERS, CROSS, CURVE, DARKEST, DEGREES, DEG_TO_RAD, DELETE, DIFFERENCE, DILATE, DODGE, DOWN_ARROW, ENTER, ERODE, ESCAPE, EXCLUSION, FILL, GRAY, GRID, HALF_PI, HAND, HARD_LIGHT, HSB, HSL, IMAGE, IMMEDIATE, INVERT, ITALIC, LANDSCAPE, LEFT, LEFT_ARROW, LIGHTEST, LINEAR, LINES, LINE_LOOP, LINE_STRIP, MIRROR, MITER, MOVE, MULTIPLY, NEAREST, NORMAL, OPAQUE, OPEN, OPTION, OVERLAY, P2D, PI, PIE, POINTS, PORTRAIT, POSTERIZE, PROJECT, PVector, QUADRATIC, QUADS, QUAD_STRIP, QUARTER_PI, RADIANS, RADIUS, RAD_TO_DEG, REPEAT, REPLACE, RETURN, RGB, RIGHT, RIGHT_ARROW, ROUND, SCREEN, SHIFT, SOFT_LIGHT, SQUARE, STROKE, SUBTRACT, TAB, TAU, TEXT, TEXTURE, THRESHOLD, TOP, TRIANGLES, TRIANGLE_FAN, TRIANGLE_STRIP, TWO_PI, UP_ARROW, VIDEO, WAIT, WEBGL, _CTX_MIDDLE, _DEFAULT_FILL, _DEFAULT_LEADMULT, _DEFAULT_STROKE, _DEFAULT_TEXT_FILL, _P5_INSTANCE, abs, accelerationX, accelerationY, accelerationZ, acos, add_library, alpha, ambientLight, ambientMaterial, angleMode, append, applyMatrix, arc, arrayCopy, asin, atan, atan2, background, beginContour, beginShape, bezier, bezierDetail, bezierPoint, bezierTangent, bezierVertex, blend, blendMode, blue, boolean, box, brightness, byte, camera, ceil, changed, char, circle, color, colorMode, concat, cone, constrain, copy, cos, createA, createAudio, createButton, createCamera, createCanvas, createCapture, createCheckbox, createColorPicker, createDiv, createElement, createFileInput, createGraphics, createImage, createImg, createInput, createNumberDict, createP, createRadio, createSelect, createShader, createSlider, createSpan, createStringDict, createVector, createVideo, createWriter, cursor, curve, curveDetail, curvePoint, curveTangent, curveTightness, curveVertex, cylinder, day, debugMode, degrees, deviceOrientation, directionalLight, disableFriendlyErrors, displayDensity, displayHeight, displayWidth, dist, ellipse, ellipseMode, ellipsoid, endContour, endShape, erase, exp, fill, filter, float, floor, focused, frameCount, frameRate, fullscreen, getURL, getURLParams, getURLPath, global_p5_injection, green, height, hex, hour, httpDo, httpGet, httpPost, hue, image, imageMode, image_proxy, input, int, join, key, keyCode, keyIsPressed, lerp, lerpColor, lightness, lights, line, loadBytes, loadFont, loadImage, loadJSON, loadModel, loadPixels, loadShader, loadStrings, loadTable, loadXML, log, logOnloaded, loop, mag, map, match, matchAll, max, millis, min, minute, model, month, mouseButton, mouseIsPressed, mouseX, mouseY, nf, nfc, nfp, nfs, noCanvas, noCursor, noDebugMode, noErase, noFill, noLoop, noSmooth, noStroke, noTint, noise, noiseDetail, noiseSeed, norm, normalMaterial, orbitControl, ortho, pAccelerationX, pAccelerationY, pAccelerationZ, pRotationX, pRotationY, pRotationZ, perspective, pixelDensity, pixels, plane, pmouseX, pmouseY, point, pointLight, popMatrix, popStyle, pow, pre_draw, push, pushMatrix, pushStyle, pwinMouseX, pwinMouseY, py_clear, py_get, py_pop, py_set, py_sort, py_split, quad, quadraticVertex, radians, random, randomGaussian, randomSeed, rect, rectMode, red, redraw, remove, removeElements, resetMatrix, resetShader, resizeCanvas, reverse, rotate, rotateX, rotateY, rotateZ, rotationX, rotationY, rotationZ, round, saturation, save, saveCanvas, saveFrames, saveJSON, saveStrings, saveTable, scale, second, select, selectAll, setAttributes, setCamera, setMoveThreshold, setShakeThreshold, shader, shearX, shearY, shininess, shorten, shuffle, sin, size, smooth, specularMaterial, sphere, splice, splitTokens, sq, sqrt, square, start_p5, str, stroke, strokeCap, strokeJoin, strokeWeight, subset, tan, text, textAlign, textAscent, textDescent, textFont, textLeading, textSize, textStyle, textWidth, texture, textureMode, textureWrap, tint, torus, touches, translate, triangle, trim, turnAxis, unchar, unhex, updatePixels, vertex, width, winMouseX, winMouseY, windowHeight, windowWidth, year} from './pyp5js.js';
+import {ADD, ALT, ARROW, AUDIO, AUTO, AXES, BACKSPACE, BASELINE, BEVEL, BEZIER, BLEND, BLUR, BOLD, BOLDITALIC, BOTTOM, BURN, CENTER, CHORD, CLAMP, CLOSE, CONTROL, CORNER, CORNERS, CROSS, CURVE, DARKEST, DEGREES, DEG_TO_RAD, DELETE, DIFFERENCE, DILATE, DODGE, DOWN_ARROW, ENTER, ERODE, ESCAPE, EXCLUSION, FILL, GRAY, GRID, HALF_PI, HAND, HARD_LIGHT, HSB, HSL, IMAGE, IMMEDIATE, INVERT, ITALIC, LANDSCAPE, LEFT, LEFT_ARROW, LIGHTEST, LINEAR, LINES, LINE_LOOP, LINE_STRIP, MIRROR, MITER, MOVE, MULTIPLY, NEAREST, NORMAL, OPAQUE, OPEN, OPTION, OVERLAY, P2D, P3D, PI, PIE, POINTS, PORTRAIT, POSTERIZE, PROJECT, PVector, QUADRATIC, QUADS, QUAD_STRIP, QUARTER_PI, RADIANS, RADIUS, RAD_TO_DEG, REPEAT, REPLACE, RETURN, RGB, RIGHT, RIGHT_ARROW, ROUND, SCREEN, SHIFT, SOFT_LIGHT, SQUARE, STROKE, SUBTRACT, TAB, TAU, TEXT, TEXTURE, THRESHOLD, TOP, TRIANGLES, TRIANGLE_FAN, TRIANGLE_STRIP, TWO_PI, UP_ARROW, VIDEO, WAIT, WEBGL, _CTX_MIDDLE, _DEFAULT_FILL, _DEFAULT_LEADMULT, _DEFAULT_STROKE, _DEFAULT_TEXT_FILL, _FRAME_STATE, _KEYS_STATE, _MOTION_STATE, _MOUSE_STATE, _P5_INSTANCE, _PIXELS_STATE, _REFRESH_FRAME, _REFRESH_KEYS, _REFRESH_MOTION, _REFRESH_MOUSE, _REFRESH_PIXELS, _REFRESH_SIZE, _REFRESH_TOUCHES, _SIZE_STATE, _TOUCHES_STATE, _reads_any, abs, accelerationX, accelerationY, accelerationZ, acos, add_library, alpha, ambientLight, ambientMaterial, angleMode, append, applyMatrix, arc, arrayCopy, asin, atan, atan2, background, beginContour, beginShape, bezier, bezierDetail, bezierPoint, bezierTangent, bezierVertex, bind_constants, bind_methods, blend, blendMode, blue, boolean, box, brightness, byte, camera, ceil, changed, char, circle, color, colorMode, concat, cone, constrain, copy, cos, createA, createAudio, createButton, createCamera, createCanvas, createCapture, createCheckbox, createColorPicker, createDiv, createElement, createFileInput, createGraphics, createImage, createImg, createInput, createNumberDict, createP, createRadio, createSelect, createShader, createSlider, createSpan, createStringDict, createVector, createVideo, createWriter, cursor, curve, curveDetail, curvePoint, curveTangent, curveTightness, curveVertex, cylinder, day, debugMode, degrees, deviceOrientation, directionalLight, disableFriendlyErrors, displayDensity, displayHeight, displayWidth, dist, ellipse, ellipseMode, ellipsoid, endContour, endShape, erase, exp, fill, filter, float, floor, focused, frameCount, frameRate, fullscreen, getURL, getURLParams, getURLPath, global_p5_injection, green, height, hex, hour, httpDo, httpGet, httpPost, hue, image, imageMode, image_proxy, input, int, join, key, keyCode, keyIsPressed, lerp, lerpColor, lightness, lights, line, loadBytes, loadFont, loadImage, loadJSON, loadModel, loadPixels, loadShader, loadStrings, loadTable, loadXML, log, logOnloaded, loop, mag, map, match, matchAll, max, millis, min, minute, model, month, mouseButton, mouseIsPressed, mouseX, mouseY, nf, nfc, nfp, nfs, noCanvas, noCursor, noDebugMode, noErase, noFill, noLoop, noSmooth, noStroke, noTint, noise, noiseDetail, noiseSeed, norm, normalMaterial, orbitControl, ortho, pAccelerationX, pAccelerationY, pAccelerationZ, pRotationX, pRotationY, pRotationZ, perspective, pixelDensity, pixels, plane, pmouseX, pmouseY, point, pointLight, popMatrix, popStyle, pow, pre_draw, push, pushMatrix, pushStyle, pwinMouseX, pwinMouseY, py_clear, py_get, py_pop, py_set, py_sort, py_split, quad, quadraticVertex, radians, random, randomGaussian, randomSeed, rect, rectMode, red, redraw, remove, removeElements, resetMatrix, resetShader, resizeCanvas, reverse, rotate, rotateX, rotateY, rotateZ, rotationX, rotationY, rotationZ, round, saturation, save, saveCanvas, saveFrames, saveJSON, saveStrings, saveTable, scale, second, select, selectAll, select_state, setAttributes, setCamera, setMoveThreshold, setShakeThreshold, shader, shearX, shearY, shininess, shorten, shuffle, sin, size, smooth, specularMaterial, sphere, splice, splitTokens, sq, sqrt, square, start_p5, str, stroke, strokeCap, strokeJoin, strokeWeight, subset, tan, text, textAlign, textAscent, textDescent, textFont, textLeading, textSize, textStyle, textWidth, texture, textureMode, textureWrap, tint, torus, touches, translate, triangle, trim, turnAxis, unchar, unhex, updatePixels, vertex, width, winMouseX, winMouseY, windowHeight, windowWidth, year} from './pyp5js.js';
 var __name__ = '__main__';
 export var preload = function () {
 	if (arguments.length) {
@@ -65,12 +65,17 @@ export var DK_BLUE = null;
 export var GREEN = null;
 export var DK_GREEN = null;
 export var squares = null;
+export var LUT_STEPS = 256;
+export var FILL_LUT = null;
+export var STROKE_LUT = null;
+export var NOISE = null;
+export var noise_cursor = 0;
 export var Square =  __class__ ('Square', [object], {
 	__module__: __name__,
-	ROTATION_LIMIT: 0.03,
-	ROTATION_TOLERANCE: 0.009,
-	ORBIT_LIMIT: 0.003,
-	ORBIT_TOLERANCE: 0.0001,
+	ROTATION_LIMIT: 1.8,
+	ROTATION_TOLERANCE: 0.54,
+	ORBIT_LIMIT: 0.18,
+	ORBIT_TOLERANCE: 0.006,
 	get __init__ () {return __get__ (this, function (self) {
 		if (arguments.length) {
 			var __ilastarg0__ = arguments.length - 1;
@@ -86,13 +91,16 @@ export var Square =  __class__ ('Square', [object], {
 		else {
 		}
 		self._orbit = self._chooseOrbit () + random (0, int (width / 23));
-		self._orbit_angle = random (TAU);
+		self._orbit_phase = random (TAU);
+		self._orbit_angle = self._orbit_phase;
 		self._position = createVector (cos (self._orbit_angle) * self._orbit, sin (self._orbit_angle) * self._orbit);
 		self._size = random (int (width / 30), int (width / 20));
-		self._rot_angle = random (TAU);
-		self._s_color = color (0);
+		self._reach = self._size * sqrt (0.5);
+		self._rot_phase = random (TAU);
+		self._rot_angle = self._rot_phase;
+		self._s_color = [0, 0, 0];
 		self._s_opac = map (self._size, width / 30, width / 20, 150, 200);
-		self._f_color = null;
+		self._f_color = [0, 0, 0];
 		self._f_opac = map (self._size, width / 30, width / 20, 150, 200);
 		self._recolor ();
 		self._rot_speed = Square.avoidZero (Square.ROTATION_LIMIT, Square.ROTATION_TOLERANCE);
@@ -148,7 +156,7 @@ export var Square =  __class__ ('Square', [object], {
 			return width / 1.7777;
 		}
 	});},
-	get _move () {return __get__ (this, function (self) {
+	get _move () {return __get__ (this, function (self, time) {
 		if (arguments.length) {
 			var __ilastarg0__ = arguments.length - 1;
 			if (arguments [__ilastarg0__] && arguments [__ilastarg0__].hasOwnProperty ("__kwargtrans__")) {
@@ -156,20 +164,20 @@ export var Square =  __class__ ('Square', [object], {
 				for (var __attrib0__ in __allkwargs0__) {
 					switch (__attrib0__) {
 						case 'self': var self = __allkwargs0__ [__attrib0__]; break;
+						case 'time': var time = __allkwargs0__ [__attrib0__]; break;
 					}
 				}
 			}
 		}
 		else {
 		}
-		var x = self._position.x;
-		var y = self._position.y;
-		self._position.x = x * cos (self._orbit_speed) + y * sin (self._orbit_speed);
-		self._position.y = y * cos (self._orbit_speed) - x * sin (self._orbit_speed);
-		var orbit_angle = atan2 (self._position.y, self._position.x);
-		self._orbit_angle = orbit_angle;
+		var angle = self._orbit_phase - self._orbit_speed * time;
+		self._orbit_angle = atan2 (sin (angle), cos (angle));
+		self._position.x = cos (self._orbit_angle) * self._orbit;
+		self._position.y = sin (self._orbit_angle) * self._orbit;
+		self._rot_angle = self._rot_phase + self._rot_speed * time;
 	});},
-	get _recolor () {return __get__ (this, function (self) {
+	get _on_screen () {return __get__ (this, function (self) {
 		if (arguments.length) {
 			var __ilastarg0__ = arguments.length - 1;
 			if (arguments [__ilastarg0__] && arguments [__ilastarg0__].hasOwnProperty ("__kwargtrans__")) {
@@ -183,26 +191,29 @@ export var Square =  __class__ ('Square', [object], {
 		}
 		else {
 		}
-		var angle = abs (self._orbit_angle);
-		var half_pi = PI / 2;
-		if (angle >= half_pi) {
-			var shade = map (angle, PI, half_pi, 0, 0.5);
-			var this_fill_color = GREEN;
-			var other_fill_color = BLUE;
-			var this_stroke_color = DK_GREEN;
-			var other_stroke_color = DK_BLUE;
+		return abs (self._position.x) - self._reach < width / 2 && abs (self._position.y) - self._reach < height / 2;
+	});},
+	get _recolor () {return __get__ (this, function (self) {
+		if (arguments.length) {
+			var __ilastarg0__ = arguments.length - 1;
+			if (arguments [__ilastarg0__] && arguments [__ilastarg0__].hasOwnProperty ("__kwargtrans__")) {
+				var __allkwargs0__ = arguments [__ilastarg0__--];
+				for (var __attrib0__ in __allkwargs0__) {
+					switch (__attrib0__) {
+						case 'self': var self = __allkwargs0__ [__attrib0__]; break;
+					}
+				}
+			}
 		}
 		else {
-			var shade = map (angle, 0, half_pi, 0, 0.5);
-			var this_fill_color = BLUE;
-			var other_fill_color = GREEN;
-			var this_stroke_color = DK_BLUE;
-			var other_stroke_color = DK_GREEN;
 		}
-		self._f_color = lerpColor (this_fill_color, other_fill_color, shade + random (-(0.02), 0.02));
-		self._s_color = lerpColor (this_stroke_color, other_stroke_color, shade + random (-(0.02), 0.02));
+		var index = int ((abs (self._orbit_angle) * (LUT_STEPS - 1)) / PI + 0.5);
+		noise_cursor = __mod__ (noise_cursor + 1, len (NOISE));
+		self._f_color = FILL_LUT [constrain (index + NOISE [noise_cursor], 0, LUT_STEPS - 1)];
+		noise_cursor = __mod__ (noise_cursor + 1, len (NOISE));
+		self._s_color = STROKE_LUT [constrain (index + NOISE [noise_cursor], 0, LUT_STEPS - 1)];
 	});},
-	get draw () {return __get__ (this, function (self) {
+	get draw () {return __get__ (this, function (self, time) {
 		if (arguments.length) {
 			var __ilastarg0__ = arguments.length - 1;
 			if (arguments [__ilastarg0__] && arguments [__ilastarg0__].hasOwnProperty ("__kwargtrans__")) {
@@ -210,21 +221,22 @@ export var Square =  __class__ ('Square', [object], {
 				for (var __attrib0__ in __allkwargs0__) {
 					switch (__attrib0__) {
 						case 'self': var self = __allkwargs0__ [__attrib0__]; break;
+						case 'time': var time = __allkwargs0__ [__attrib0__]; break;
 					}
 				}
 			}
 		}
 		else {
 		}
-		self._move ();
+		self._move (time);
+		if (!(self._on_screen ())) {
+			return ;
+		}
 		self._recolor ();
-		self._s_color.setAlpha (self._s_opac);
-		stroke (self._s_color);
-		self._f_color.setAlpha (self._f_opac);
-		fill (self._f_color);
+		stroke (self._s_color [0], self._s_color [1], self._s_color [2], self._s_opac);
+		fill (self._f_color [0], self._f_color [1], self._f_color [2], self._f_opac);
 		push ();
 		translate (self._position.x, self._position.y);
-		self._rot_angle += self._rot_speed;
 		rotate (self._rot_angle);
 		rect (0, 0, self._size, self._size);
 		py_pop ();
@@ -243,9 +255,31 @@ export var Square =  __class__ ('Square', [object], {
 		}
 		else {
 		}
-		return 'Square:\norbit: {}\norbit_angle: {}\nposition: {}\nrot_angle: {}\ns_color: {}\nf_color: {}\nrot_speed: {}\norbit_speed: {}\n'.format (self._orbit, self._orbit_angle, self._position, self._rot_angle, self._s_color, self._f_color, self._rot_speed, self._orbit_speed);
+		return 'Square:\norbit: {}\norbit_angle: {}\nposition: {}\nsize: {}\nrot_angle: {}\ns_color: {}\nf_color: {}\nrot_speed: {}\norbit_speed: {}\n'.format (self._orbit, self._orbit_angle, self._position, self._size, self._rot_angle, self._s_color, self._f_color, self._rot_speed, self._orbit_speed);
 	});}
 });
+export var build_lut = function (start, end) {
+	if (arguments.length) {
+		var __ilastarg0__ = arguments.length - 1;
+		if (arguments [__ilastarg0__] && arguments [__ilastarg0__].hasOwnProperty ("__kwargtrans__")) {
+			var __allkwargs0__ = arguments [__ilastarg0__--];
+			for (var __attrib0__ in __allkwargs0__) {
+				switch (__attrib0__) {
+					case 'start': var start = __allkwargs0__ [__attrib0__]; break;
+					case 'end': var end = __allkwargs0__ [__attrib0__]; break;
+				}
+			}
+		}
+	}
+	else {
+	}
+	var lut = [];
+	for (var step = 0; step < LUT_STEPS; step++) {
+		var lerped = lerpColor (start, end, step / (LUT_STEPS - 1));
+		lut.append ([red (lerped), green (lerped), blue (lerped)]);
+	}
+	return lut;
+};
 var setup = function () {
 	if (arguments.length) {
 		var __ilastarg0__ = arguments.length - 1;
@@ -267,6 +301,16 @@ var setup = function () {
 	DK_BLUE = color (10, 10, 115);
 	GREEN = color (149, 194, 81);
 	DK_GREEN = color (57, 74, 31);
+	FILL_LUT = build_lut (BLUE, GREEN);
+	STROKE_LUT = build_lut (DK_BLUE, DK_GREEN);
+	var spread = int (0.02 * (LUT_STEPS - 1));
+	NOISE = (function () {
+		var __accu0__ = [];
+		for (var _ = 0; _ < 1021; _++) {
+			__accu0__.append (floor (random (-(spread), spread + 1)));
+		}
+		return __accu0__;
+	}) ();
 	squares = (function () {
 		var __accu0__ = [];
 		for (var _ = 0; _ < NUM_SQUARES; _++) {
@@ -287,11 +331,12 @@ var draw = function () {
 	else {
 	}
 	background (color (70, 71, 76));
+	var time = millis () / 1000;
 	for (var square of squares) {
-		square.draw ();
+		square.draw (time);
 	}
 };
 export var event_functions = dict ({'deviceMoved': deviceMoved, 'deviceTurned': deviceTurned, 'deviceShaken': deviceShaken, 'keyPressed': keyPressed, 'keyReleased': keyReleased, 'keyTyped': keyTyped, 'mouseMoved': mouseMoved, 'mouseDragged': mouseDragged, 'mousePressed': mousePressed, 'mouseReleased': mouseReleased, 'mouseClicked': mouseClicked, 'doubleClicked': doubleClicked, 'mouseWheel': mouseWheel, 'touchStarted': touchStarted, 'touchMoved': touchMoved, 'touchEnded': touchEnded, 'windowResized': windowResized, 'keyIsDown': keyIsDown});
-start_p5 (preload, setup, draw, event_functions);
+start_p5 (preload, setup, draw, event_functions, __kwargtrans__ ({state_names: ['height', 'width']}));
 
 //# sourceMappingURL=target_sketch.map
\ No newline at end of file
@@ -29,6 +29,32 @@ windowResized = None
 keyIsDown = None
 
 
+# 1. One hundred squares
+# 2. Of randomly-selected size
+# 3. Each having semi-tranparent fill and stroke
+# 4. Each colored according to an underlying algorithm
+# 5. Each rotating around its own center with a randomly-selected speed and
+#    direction
+# 6. Randomly distributed around the circumference of
+# 7. One of several concentric circles
+# 8. All squares rotating at a randomly-selected speed and direction around
+#    a common center point
+#
+# Port to transcrypt/pyp5js Ben Alkov 2022
+# Initial Processing.py implementation 2014-08-07 - 12:
+# https://github.com/tildebyte/processing.py-demos/blob/master/OrbitingSquares_HYPE/OrbitingSquares_HYPE.pyde
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
 NUM_SQUARES = 100
 BLUE = None
 DK_BLUE = None
@@ -36,24 +62,40 @@ GREEN = None
 DK_GREEN = None
 squares = None
 
+# Precomputed gradients: one [r, g, b] per quantized |orbit angle|, see
+# `build_lut()`, and a table of jitter offsets (in steps) to avoid obvious
+# color bands
+LUT_STEPS = 256
+FILL_LUT = None
+STROKE_LUT = None
+NOISE = None
+noise_cursor = 0
+
 
 class Square():
-    # p5.js DEFAULT IS RADIANS!!
-    ROTATION_LIMIT = 0.03
-    ROTATION_TOLERANCE = 0.009
-    ORBIT_LIMIT = 0.003
-    ORBIT_TOLERANCE = 0.0001
+    # p5.js DEFAULT IS RADIANS!! Speeds are radians/second (the original
+    # 60 fps radians/frame, times 60).
+    ROTATION_LIMIT = 1.8
+    ROTATION_TOLERANCE = 0.54
+    ORBIT_LIMIT = 0.18
+    ORBIT_TOLERANCE = 0.006
 
     def __init__(self):
         self._orbit = self._chooseOrbit() + random(0, int(width / 23))
-        self._orbit_angle = random(TAU)
+        # Orbit and rotation angles are closed-form functions of time, from
+        # these starting phases
+        self._orbit_phase = random(TAU)
+        self._orbit_angle = self._orbit_phase
         self._position = createVector(cos(self._orbit_angle) * self._orbit,
                                       sin(self._orbit_angle) * self._orbit)
         self._size = random(int(width / 30), int(width / 20))
-        self._rot_angle = random(TAU)
-        self._s_color = color(0)
+        # Half the diagonal; a rotated square never reaches further than this
+        self._reach = self._size * sqrt(0.5)
+        self._rot_phase = random(TAU)
+        self._rot_angle = self._rot_phase
+        self._s_color = [0, 0, 0]
         self._s_opac = map(self._size, width / 30, width / 20, 150, 200)
-        self._f_color = None
+        self._f_color = [0, 0, 0]
         self._f_opac = map(self._size, width / 30, width / 20, 150, 200)
         self._recolor()
         self._rot_speed = Square.avoidZero(Square.ROTATION_LIMIT, Square.ROTATION_TOLERANCE)
@@ -89,52 +131,42 @@ class Square():
         elif chance < 1.0:
             return width / 1.7777
 
-    def _move(self):
+    def _move(self, time):
         '''
-        Generate a random position on the circumference of the orbit chosen for
-        this item.
+        Put this item where it is on its orbit at `time` (in seconds). The
+        angle *decreases* at `_orbit_speed`, as the original incremental
+        rotation did.
         '''
-        x = self._position.x
-        y = self._position.y
-        self._position.x = x * cos(self._orbit_speed) + y * sin(self._orbit_speed)
-        self._position.y = y * cos(self._orbit_speed) - x * sin(self._orbit_speed)
-        orbit_angle = atan2(self._position.y, self._position.x)
-        # if orbit_angle < 0:
-        #     orbit_angle = abs(orbit_angle) + PI
-        self._orbit_angle = orbit_angle
+        angle = self._orbit_phase - self._orbit_speed * time
+        # Back into [-PI, PI]; JS `%` doesn't wrap negative numbers
+        self._orbit_angle = atan2(sin(angle), cos(angle))
+        self._position.x = cos(self._orbit_angle) * self._orbit
+        self._position.y = sin(self._orbit_angle) * self._orbit
+        self._rot_angle = self._rot_phase + self._rot_speed * time
+
+    def _on_screen(self):
+        return (abs(self._position.x) - self._reach < width / 2 and
+                abs(self._position.y) - self._reach < height / 2)
 
     def _recolor(self):
-        angle = abs(self._orbit_angle)
-        half_pi = PI / 2
-        # Left half
-        if angle >= half_pi:
-            shade = map(angle, PI, half_pi, 0, 0.5)
-            this_fill_color = GREEN
-            other_fill_color = BLUE
-            this_stroke_color = DK_GREEN
-            other_stroke_color = DK_BLUE
-        # Right half
-        else:
-            shade = map(angle, 0, half_pi, 0, 0.5)
-            this_fill_color = BLUE
-            other_fill_color = GREEN
-            this_stroke_color = DK_BLUE
-            other_stroke_color = DK_GREEN
-        self._f_color = lerpColor(this_fill_color, other_fill_color,
-                                  shade + random(-0.02, 0.02))
-        self._s_color = lerpColor(this_stroke_color, other_stroke_color,
-                                  shade + random(-0.02, 0.02))
-
-    def draw(self):
-        self._move()
+        global noise_cursor
+        # Straight from the precomputed gradients: no p5 colors, no lerping
+        index = int(abs(self._orbit_angle) * (LUT_STEPS - 1) / PI + 0.5)
+        noise_cursor = (noise_cursor + 1) % len(NOISE)
+        self._f_color = FILL_LUT[constrain(index + NOISE[noise_cursor], 0, LUT_STEPS - 1)]
+        noise_cursor = (noise_cursor + 1) % len(NOISE)
+        self._s_color = STROKE_LUT[constrain(index + NOISE[noise_cursor], 0, LUT_STEPS - 1)]
+
+    def draw(self, time):
+        self._move(time)
+        # Off-screen squares don't need colors or any drawing calls
+        if not self._on_screen():
+            return
         self._recolor()
-        self._s_color.setAlpha(self._s_opac)
-        stroke(self._s_color)
-        self._f_color.setAlpha(self._f_opac)
-        fill(self._f_color)
+        stroke(self._s_color[0], self._s_color[1], self._s_color[2], self._s_opac)
+        fill(self._f_color[0], self._f_color[1], self._f_color[2], self._f_opac)
         push()
         translate(self._position.x, self._position.y)
-        self._rot_angle += self._rot_speed
         rotate(self._rot_angle)
         rect(0, 0, self._size, self._size)
         pop()
@@ -144,7 +176,7 @@ class Square():
                f'orbit: {self._orbit}\n'
                f'orbit_angle: {self._orbit_angle}\n'
                f'position: {self._position}\n'
-               # f'size: {self._size}\n'
+               f'size: {self._size}\n'
                f'rot_angle: {self._rot_angle}\n'
                f's_color: {self._s_color}\n'
                f'f_color: {self._f_color}\n'
@@ -153,8 +185,23 @@ class Square():
                )
 
 
+def build_lut(start, end):
+    '''
+    Colors from `start` (at orbit angle 0) to `end` (at +/-PI), in
+    `LUT_STEPS` steps.
+    '''
+    lut = []
+    for step in range(LUT_STEPS):
+        lerped = lerpColor(start, end, step / (LUT_STEPS - 1))
+        lut.append([red(lerped), green(lerped), blue(lerped)])
+    return lut
+
+
 def setup():
     global squares
+    global FILL_LUT
+    global STROKE_LUT
+    global NOISE
     global BLUE
     global DK_BLUE
     global GREEN
@@ -165,12 +212,16 @@ def setup():
     # strokeCap(SQUARE)  # Not available for WEBGL
     strokeWeight(2)
     rectMode(CENTER)
-    # blendMode(MULTIPLY)
     background(color(70, 71, 76))
     BLUE = color(21, 21, 235)
     DK_BLUE = color(10, 10, 115)
     GREEN = color(149, 194, 81)
     DK_GREEN = color(57, 74, 31)
+    FILL_LUT = build_lut(BLUE, GREEN)
+    STROKE_LUT = build_lut(DK_BLUE, DK_GREEN)
+    # +/-0.02 of the gradient
+    spread = int(0.02 * (LUT_STEPS - 1))
+    NOISE = [floor(random(-spread, spread + 1)) for _ in range(1021)]
     squares = [Square() for _ in range(NUM_SQUARES)]
 
 
@@ -178,10 +229,12 @@ def draw():
     background(color(70, 71, 76))
     # Remove if using 2D renderer!
     # translate(-width / 2, -height / 2, 0)
+    # Time since the sketch started, in seconds; dropped frames are skipped
+    # over instead of slowing the animation down
+    time = millis() / 1000
     for square in squares:
         # print(square.__str__())
-        square.draw()
-
+        square.draw(time)
 
 
 event_functions = {
@@ -205,4 +258,4 @@ event_functions = {
     "keyIsDown": keyIsDown,
 }
 
-start_p5(preload, setup, draw, event_functions)
\ No newline at end of file
+start_p5(preload, setup, draw, event_functions, state_names=['height', 'width'])
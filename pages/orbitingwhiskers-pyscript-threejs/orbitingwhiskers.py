@@ -28,15 +28,16 @@
 
 import math
 
-from typing import Any, Tuple
+from typing import Any
+
+import numpy as np
 
 from pyodide import ffi
 from js import document, Float32Array, window
 from js.three import (
     BufferAttribute,
     BufferGeometry,
-    Color,
-    Euler,
+    DynamicDrawUsage,
     Group,
     LineBasicMaterial,
     LineSegments,
@@ -46,12 +47,18 @@ from js.three import (
     WebGLRenderer,
 )
 
+import bridge
+import orbits
+import palette
+import pool
+import profiler
+import quality
+import sampling
 import utils
 
 BufferAttribute: ffi.JsProxy
 BufferGeometry: ffi.JsProxy
-Color: ffi.JsProxy
-Euler: ffi.JsProxy
+DynamicDrawUsage: ffi.JsProxy
 Group: ffi.JsProxy
 LineBasicMaterial: ffi.JsProxy
 LineSegments: ffi.JsProxy
@@ -66,14 +73,15 @@ class Whisker():
     CUBE_MIN_SIZE = 1.25
     CUBE_MAX_SIZE = 2.0
 
-    # ORBIT_SPEED and SELF_ROT are degrees/frame
-    # [-0.13, 0.13] within 0.01 degree of 0
-    ORBIT_SPEED_LIMIT = 0.13
-    ORBIT_SPEED_TOLERANCE = 0.01
+    # ORBIT_SPEED and SELF_ROT are degrees/second (the original 60 fps
+    # degrees/frame, times 60)
+    # [-7.8, 7.8] within 0.6 degree of 0
+    ORBIT_SPEED_LIMIT = 7.8
+    ORBIT_SPEED_TOLERANCE = 0.6
 
-    # [-1.3, 1.3] within 0.5 degree of 0
-    SELF_ROT_SPEED_LIMIT = 1.3
-    SELF_ROT_TOLERANCE = 0.5
+    # [-78, 78] within 30 degrees of 0
+    SELF_ROT_SPEED_LIMIT = 78.0
+    SELF_ROT_TOLERANCE = 30.0
 
     # Pythagoras in 3D
     CUBE_MAX_EXTENT: float = math.sqrt(3) * CUBE_MAX_SIZE
@@ -82,107 +90,121 @@ class Whisker():
     FIRST_ORBIT: float = CUBE_MAX_EXTENT + (CUBE_MAX_SIZE * 0.5)
     ORBITS: tuple[float, float, float, float] = (FIRST_ORBIT, FIRST_ORBIT * 2,
               FIRST_ORBIT * 3, FIRST_ORBIT * 4)
-
-    def __init__(self) -> None:
-        self._position: Vector3 = None
-        self._radius: float = 0.0
-        self._size: float = utils.rand_float(self.CUBE_MIN_SIZE, self.CUBE_MAX_SIZE)
-        self._position, self._radius = Whisker._position_on_orbit()
-        self._angle: float = self._update_angle()
-        self._rotation: Euler = Euler.new(0.0, 0.0, utils.rand_float(0.0, math.tau))
-        self._orbit_angular_speed: float = utils.avoid_zero(self.ORBIT_SPEED_LIMIT,
-                                                            self.ORBIT_SPEED_TOLERANCE)
-        self._object_angular_speed: float = utils.avoid_zero(self.SELF_ROT_SPEED_LIMIT,
-                                                             self.SELF_ROT_TOLERANCE)
+    # How likely each orbit is. Larger orbits are favored, as they have room
+    # for more whiskers.
+    ORBIT_WEIGHTS: tuple[float, float, float, float] = (0.16, 0.24, 0.32, 0.28)
+
+    # Colors run blue -> green from the right of the circle to the left
+    COLORS = palette.GradientLUT(0x245fff, 0x77b90f)
+
+    # Every whisker shares one unit-length line (scaled per whisker) and
+    # draws its material from one per color bucket
+    POOL = pool.ResourcePool()
+    MATERIALS = pool.BucketedMaterials(POOL, 'whisker', LineBasicMaterial, COLORS)
+
+    def __init__(self, engine: orbits.OrbitEngine, index: int) -> None:
+        # All of the per-frame state lives in `engine`; this object is a view
+        # onto slot `self._index`, filled in by `spawn()`
+        self._engine: orbits.OrbitEngine = engine
+        self._index: int = index
+        size: float = float(engine.size[index])
         self._group: Group = Group.new()
-        self._whisker: BufferGeometry = BufferGeometry.new()
-        verts: Float32Array  = Float32Array.new([
-            0, 0, 0,
-            self._size, 0, 0
-            ])
-        self._whisker.setAttribute('position', BufferAttribute.new(verts, 3))
-        self._whisker_mat: LineBasicMaterial = LineBasicMaterial.new()
-        self._whisker_mesh: LineSegments = LineSegments.new(self._whisker, self._whisker_mat)
+        whisker: BufferGeometry = Whisker.POOL.acquire('whisker', Whisker._unit_whisker)
+        # Attached in engine index order, so its slot is our `_index`
+        self._whisker_mesh: LineSegments = Whisker.MATERIALS.attach(
+            lambda material: LineSegments.new(whisker, material), 1.0, self._angle)
         self._group.add(self._whisker_mesh)
-        self._group.position.copy(self._position)
-        self._group.rotation.copy(self._rotation)
-        self.recolor()
+        self._group.scale.setScalar(size)
+        self.orbit()
+        self.rotate()
 
-    def _update_angle(self) -> float:
-        return math.atan2(self._position.y, self._position.x)
+    @property
+    def _angle(self) -> float:
+        return float(self._engine.angle[self._index])
 
     def get_group_object(self) -> Group:
         return self._group
 
+    # `orbit()` and `rotate()` copy this whisker's slot out of the engine,
+    # after `OrbitEngine.seek()` has advanced all whiskers at once
     def orbit(self) -> None:
-        x_pos: float = self._position.x
-        y_pos: float = self._position.y
-        theta: float = math.radians(self._orbit_angular_speed)
-        self._position.x = x_pos * math.cos(theta) + y_pos * math.sin(theta)
-        self._position.y = y_pos * math.cos(theta) - x_pos * math.sin(theta)
-        self._group.position.copy(self._position)
-        self._angle = self._update_angle()
+        x_pos, y_pos, z_pos = self._engine.position[self._index].tolist()
+        self._group.position.set(x_pos, y_pos, z_pos)
 
     def rotate(self) -> None:
-        self._rotation.x += math.radians(self._object_angular_speed)
-        self._rotation.y += math.radians(self._object_angular_speed)
-        self._rotation.z += math.radians(self._object_angular_speed)
-        self._group.rotation.x = self._rotation.x
-        self._group.rotation.y = self._rotation.y
-        self._group.rotation.z = self._rotation.z
+        x_rot, y_rot, z_rot = self._engine.rotation[self._index].tolist()
+        self._group.rotation.set(x_rot, y_rot, z_rot)
 
     def recolor(self) -> None:
-        blue: Color = Color.new(0x245fff)
-        green: Color = Color.new(0x77b90f)
-        angle: float = abs(self._angle)
-        half_pi: float = math.pi / 2
-        # Left half
-        if angle >= half_pi:
-            shade: float = utils.map_linear(angle, math.pi, half_pi, 0, 0.5)
-            outline_color: Color = green.clone()
-            other_outline_color: Color = blue.clone()
-        # Right half.
-        else:
-            shade = utils.map_linear(angle, 0, half_pi, 0, 0.5)
-            outline_color = blue.clone()
-            other_outline_color = green.clone()
-
-        self._whisker_mat.color = outline_color.clone()
-        self._whisker_mat.color.lerp(
-            other_outline_color.clone(),
-            # avoid obvious color bands
-            shade + utils.rand_float(-0.02, 0.02))
+        # Switch to the shared material for this whisker's current color
+        # bucket; `BucketedMaterials.update()` does this for every whisker
+        Whisker.MATERIALS.recolor(self._index, self._angle)
 
     @staticmethod
-    def _choose_orbit() -> float:
-        # Randomly choose an orbit, based on a set of probabilities.
-        # The probabilities favor larger orbits, as they have room for more whiskers.
-        chance: float = utils.rand_float(0.0, 1.0)
-        if chance < 0.16:
-            return Whisker.ORBITS[0]
-        if chance < 0.40:
-            return Whisker.ORBITS[1]
-        if chance < 0.72:
-            return Whisker.ORBITS[2]
-        if chance < 1.0:
-            return Whisker.ORBITS[3]
-
-        return 0
+    def _unit_whisker() -> BufferGeometry:
+        geometry: BufferGeometry = BufferGeometry.new()
+        verts: Float32Array = Float32Array.new([
+            0, 0, 0,
+            1, 0, 0
+            ])
+        geometry.setAttribute('position', BufferAttribute.new(verts, 3))
+        return geometry
 
     @staticmethod
-    def _position_on_orbit() -> Tuple[Vector3, float]:
-        # Generate a random position on the circumference of the orbit chosen for
-        # this item.
-        angle: float = utils.rand_float(0.0, math.tau)
-        orbit: float = Whisker._choose_orbit()
-
-        # Randomly offset the position on the orbit, so we don't end up with multiple
-        # cubes orbiting on *exactly* the same circles.
-        radius: float = orbit + utils.rand_float(0.0, Whisker.ORBITS[0])
-        creation_x: float = math.cos(angle) * radius
-        creation_y: float = math.sin(angle) * radius
-        position: Vector3 = Vector3.new(creation_x, creation_y, 0)
-        return (position, radius)
+    def spawn(engine: orbits.OrbitEngine, count: int, rng: np.random.Generator) -> np.ndarray:
+        # Add `count` randomly-chosen whiskers to `engine` in one go,
+        # returning their indices. Each is placed at a random angle on one of
+        # `ORBITS`, randomly offset so we don't end up with multiple whiskers
+        # orbiting on *exactly* the same circles.
+        return orbits.scatter(
+            engine, rng, count,
+            Whisker.ORBITS, Whisker.ORBIT_WEIGHTS, Whisker.ORBITS[0],
+            orbit_speed=(Whisker.ORBIT_SPEED_LIMIT, Whisker.ORBIT_SPEED_TOLERANCE),
+            spin_speed=(Whisker.SELF_ROT_SPEED_LIMIT, Whisker.SELF_ROT_TOLERANCE),
+            size=(Whisker.CUBE_MIN_SIZE, Whisker.CUBE_MAX_SIZE))
+
+
+class BatchedWhiskers():
+    # The same whiskers as `Whisker`, all drawn by one `LineSegments`: a
+    # single draw call however many there are. Every frame, both endpoints
+    # and both vertex colors of every whisker are written into one buffer,
+    # which backs the geometry's (preallocated) position and color
+    # attributes - one call to three.js, which flags them for upload.
+    def __init__(self, engine: orbits.OrbitEngine) -> None:
+        # One segment per whisker already in `engine`, see `Whisker.spawn()`
+        self._engine: orbits.OrbitEngine = engine
+        count: int = engine.count
+        # Two vertices per whisker, for each of these
+        self._transforms: bridge.TransformBuffer = bridge.TransformBuffer(
+            count, position=6, color=6)
+        self._geometry: BufferGeometry = BufferGeometry.new()
+        for name in ('position', 'color'):
+            attribute: BufferAttribute = BufferAttribute.new(Float32Array.new(count * 6), 3)
+            attribute.setUsage(DynamicDrawUsage)
+            self._geometry.setAttribute(name, attribute)
+            self._transforms.bind_attribute(name, attribute)
+        self._lines: LineSegments = LineSegments.new(
+            self._geometry, LineBasicMaterial.new(vertexColors=True))
+        # The segments move every frame, so their bounds are never current
+        self._lines.frustumCulled = False
+        self.update()
+
+    def get_group_object(self) -> LineSegments:
+        return self._lines
+
+    def set_active(self, count: int) -> None:
+        # Draw only the first `count` whiskers
+        self._geometry.setDrawRange(0, count * 2)
+
+    def update(self, count: int | None = None) -> None:
+        # Write every whisker's (or the first `count`'s) endpoints and color,
+        # after `OrbitEngine.seek()`, and hand them all to three.js in one call
+        count = self._engine.count if count is None else count
+        self._engine.write_segments(self._transforms.section('position'), count=count)
+        colors: np.ndarray = self._transforms.section('color')[:count]
+        Whisker.COLORS.lookup_into(self._engine.angle[:count], colors[:, 0:3])
+        colors[:, 3:6] = colors[:, 0:3]
+        self._transforms.apply(count)
 
 
 _WIDTH: int = window.innerWidth
@@ -190,17 +212,46 @@ _HEIGHT: int = window.innerHeight
 
 _CAMERA: PerspectiveCamera = None
 _CLICKED: bool = False
-_RENDERER: WebGLRenderer = None
+# Owns the renderer; adapts resolution etc. to hold the frame rate
+_QUALITY: quality.QualityGovernor = None
 _SCENE: Scene = None
 
+# `?batched=1` draws all of the whiskers as one set of line segments,
+# `?whiskers=N` sets how many whiskers there are, `?seed=N` makes the scene
+# reproducible
+_BATCHED: bool = utils.query_param('batched') == '1'
+_NUM_WHISKERS: int = int(utils.query_param('whiskers', '100'))
+
 _WHISKERS: list[Whisker] = []
+# How many of them are shown (`None`: all), see `_handle_quality()`
+_ACTIVE: int | None = None
+_ENGINE: orbits.OrbitEngine = None
+_BATCH: BatchedWhiskers = None
+# Transforms for all of the (non-batched) `_WHISKERS`
+_TRANSFORMS: bridge.TransformBuffer = None
+_START_MS: float = 0.0
+# Off unless the page has `?profile=1`
+_PROFILER: profiler.FrameProfiler = None
+
+
+def _handle_resize(width: int, height: int) -> None:
+    # At most once per frame, after `_QUALITY` has resized the renderer
+    _CAMERA.aspect = width / height
+    _CAMERA.updateProjectionMatrix()
 
 
-def _handle_resize(event: Any) -> None:
-    _CAMERA.aspect = window.innerWidth / window.innerHeight
-    _CAMERA.updateProjectionMatrix()
-    _RENDERER.setSize(window.innerWidth, window.innerHeight)
-    _RENDERER.setPixelRatio(window.devicePixelRatio)
+def _handle_quality(level: quality.QualityLevel) -> None:
+    # Show only this quality level's share of the whiskers. Only the ones
+    # that change are touched.
+    global _ACTIVE
+    active: int = level.active(_ENGINE.count)
+    if _BATCH is not None:
+        _BATCH.set_active(active)
+    else:
+        shown: int = len(_WHISKERS) if _ACTIVE is None else _ACTIVE
+        for index in range(min(active, shown), max(active, shown)):
+            _WHISKERS[index].get_group_object().visible = index < active
+    _ACTIVE = active
 
 
 def _handle_click(event: Any) -> None:
@@ -219,7 +270,7 @@ def _handle_click(event: Any) -> None:
 def _init() -> None:
     global _SCENE
     global _CAMERA
-    global _RENDERER
+    global _QUALITY
 
     _SCENE = Scene.new()
     _CAMERA = PerspectiveCamera.new(
@@ -230,35 +281,72 @@ def _init() -> None:
     )
     _CAMERA.lookAt(Vector3.new(0, 0, 0))
     _CAMERA.updateProjectionMatrix()
-    _RENDERER = utils.renderer_config(WebGLRenderer, _WIDTH, _HEIGHT, 0x3e3e3e)  # Dark-ish grey
+    _QUALITY = quality.QualityGovernor.from_query(
+        WebGLRenderer, _WIDTH, _HEIGHT, 0x3e3e3e,  # Dark-ish grey
+        on_level=_handle_quality, on_resize=_handle_resize)
 
 
 def _setup() -> None:
     global _WHISKERS
+    global _ENGINE
+    global _START_MS
+    global _PROFILER
+    global _TRANSFORMS
+    global _BATCH
 
-    num_whiskers = 100
+    num_whiskers = _NUM_WHISKERS
 
     _CAMERA.setFocalLength = 70
     _CAMERA.position.x = 0
     _CAMERA.position.y = 0
     _CAMERA.position.z = 32
     _CAMERA.updateProjectionMatrix()
-    _WHISKERS = [Whisker() for _ in range(num_whiskers)]
-    for whiskers in _WHISKERS:
-        _SCENE.add(whiskers.get_group_object())
+    _ENGINE = orbits.OrbitEngine(num_whiskers)
+    indices: np.ndarray = Whisker.spawn(_ENGINE, num_whiskers, sampling.generator())
+    if _BATCHED:
+        _BATCH = BatchedWhiskers(_ENGINE)
+        _SCENE.add(_BATCH.get_group_object())
+    else:
+        _WHISKERS = [Whisker(_ENGINE, index) for index in indices.tolist()]
+        for whiskers in _WHISKERS:
+            _SCENE.add(whiskers.get_group_object())
+        _TRANSFORMS = bridge.TransformBuffer(len(_WHISKERS), matrix=16)
+        _TRANSFORMS.bind_objects('matrix', [whiskers.get_group_object() for whiskers in _WHISKERS])
     window.addEventListener('click', ffi.create_proxy(_handle_click))
-    window.addEventListener('resize', ffi.create_proxy(_handle_resize))
-    document.body.appendChild(_RENDERER.domElement)
-    _RENDERER.setAnimationLoop(ffi.create_proxy(_animate))
-    _RENDERER.render(_SCENE, _CAMERA)
+    document.body.appendChild(_QUALITY.renderer.domElement)
+    _PROFILER = profiler.FrameProfiler.from_query()
+    _START_MS = window.performance.now()
+    _QUALITY.start(_animate)
+    _QUALITY.renderer.render(_SCENE, _CAMERA)
+
+
+def _update_whiskers() -> None:
+    # What `Whisker.orbit()` and `rotate()` do, for every whisker shown at
+    # once, handed to three.js in a single call. Only whiskers whose color
+    # bucket changed this frame get a different material.
+    count: int = _ENGINE.count if _ACTIVE is None else _ACTIVE
+    _ENGINE.write_matrices(_TRANSFORMS.section('matrix'), count=count)
+    Whisker.MATERIALS.update(_ENGINE.angle[:count])
+    _TRANSFORMS.apply(count)
 
 
 def _animate(*args: dict[str, Any]) -> None:
-    for whiskers in _WHISKERS:
-        whiskers.rotate()
-        whiskers.orbit()
-        whiskers.recolor()
-    _RENDERER.render(_SCENE, _CAMERA)
+    # Positions are a function of wall-clock time, so a slow frame just
+    # skips ahead rather than slowing everything down
+    if not _QUALITY.frame():
+        return
+    _PROFILER.begin_frame()
+    # Whiskers the quality level hides aren't moved (they catch up when shown)
+    _ENGINE.seek(utils.seconds_since(_START_MS), count=_ACTIVE)
+    _PROFILER.mark('simulate')
+    if _BATCH is not None:
+        _BATCH.update(_ACTIVE)
+    else:
+        _update_whiskers()
+    _PROFILER.mark('update')
+    _QUALITY.renderer.render(_SCENE, _CAMERA)
+    _PROFILER.mark('render')
+    _PROFILER.end_frame(_QUALITY.renderer)
 
 _init()
 _setup()
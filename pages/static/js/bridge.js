@@ -0,0 +1,122 @@
+/*
+JS half of static/py/utils/bridge.py
+
+A sketch writes every transform and color for a frame into one Python-owned
+Float32 buffer (a NumPy array), split into named sections. `TransformApplier`
+looks at that buffer in place - through `PyProxy.getBuffer()`, which is a view
+onto the wasm heap, not a copy - and pushes it into three.js in a single call
+from Python per frame:
+- sections bound with `bindAttribute()` become the backing array of a
+  (usually instanced) `BufferAttribute`, so the only copy is the GPU upload
+- sections bound with `bindObjects()`/`bindColors()` are read into each
+  object's `matrix`, or each material's `color`
+*/
+export class TransformApplier {
+    // `pyArray` is a PyProxy of the NumPy array, `layout` maps section names
+    // to [offset, length], in floats; every section is `rows` long
+    constructor(pyArray, layout, rows) {
+        this.pyArray = pyArray
+        this.layout = layout
+        this.rows = rows
+        this.attributes = []
+        this.objects = []
+        this.colors = []
+        this.buffer = null
+    }
+
+    bindAttribute(section, attribute) {
+        this.attributes.push([section, attribute])
+    }
+
+    bindObjects(section, objects) {
+        for (const object of objects) {
+            object.matrixAutoUpdate = false
+        }
+        this.objects.push([section, objects])
+    }
+
+    bindColors(section, colors) {
+        this.colors.push([section, colors])
+    }
+
+    apply(count = this.rows) {
+        // Only the first `count` rows of each section are pushed: attributes
+        // upload just that range, objects and colors past it are left alone.
+        // Views onto the wasm heap are invalidated whenever it grows, so get
+        // a fresh one every frame; it's cheap
+        this.release()
+        this.buffer = this.pyArray.getBuffer('f32')
+        const data = this.buffer.data
+        for (const [section, attribute] of this.attributes) {
+            const [offset, length] = this.layout[section]
+            attribute.array = data.subarray(offset, offset + length)
+            attribute.updateRange.offset = 0
+            attribute.updateRange.count = count * attribute.itemSize
+            attribute.needsUpdate = true
+        }
+        for (const [section, objects] of this.objects) {
+            const offset = this.layout[section][0]
+            for (let i = 0, end = Math.min(count, objects.length); i < end; i++) {
+                objects[i].matrix.fromArray(data, offset + i * 16)
+                objects[i].matrixWorldNeedsUpdate = true
+            }
+        }
+        for (const [section, colors] of this.colors) {
+            const offset = this.layout[section][0]
+            for (let i = 0, end = Math.min(count, colors.length); i < end; i++) {
+                colors[i].fromArray(data, offset + i * 3)
+            }
+        }
+    }
+
+    release() {
+        if (this.buffer !== null) {
+            this.buffer.release()
+            this.buffer = null
+        }
+    }
+
+    destroy() {
+        this.release()
+        this.pyArray.destroy()
+    }
+}
+
+/*
+A whole frame of p5.js quads - corners and per-vertex fill and stroke colors -
+drawn from one Python-owned Float32 buffer (a NumPy array of shape
+`(capacity, 4, 10)`: x, y, fill r, g, b, a, stroke r, g, b, a per corner) as
+a single `beginShape(QUADS)`/`endShape()`. All of the p5 calls happen here,
+so Python makes one call per frame instead of several per quad.
+*/
+export class QuadBatch {
+    // `pyArray` is a PyProxy of the NumPy array; `p5` is the sketch (or
+    // `globalThis`, in global mode)
+    constructor(pyArray, p5 = globalThis) {
+        this.pyArray = pyArray
+        this.p5 = p5
+    }
+
+    draw(count) {
+        // Draw the first `count` quads. As with `TransformApplier`, the view
+        // onto the wasm heap is fetched fresh each frame.
+        const p5 = this.p5
+        const buffer = this.pyArray.getBuffer('f32')
+        const data = buffer.data
+        try {
+            p5.beginShape(p5.QUADS)
+            for (let i = 0, end = count * 40; i < end; i += 10) {
+                p5.fill(data[i + 2], data[i + 3], data[i + 4], data[i + 5])
+                p5.stroke(data[i + 6], data[i + 7], data[i + 8], data[i + 9])
+                p5.vertex(data[i], data[i + 1])
+            }
+            p5.endShape()
+        } finally {
+            buffer.release()
+        }
+    }
+
+    destroy() {
+        this.pyArray.destroy()
+    }
+}
@@ -0,0 +1,105 @@
+# Python half of static/js/bridge.js: one Python-owned buffer for all of a
+# frame's transforms and colors, handed to three.js without copying.
+#
+# Each proxy call from Python to JS is expensive next to the work it does, and
+# the sketches were making several per object per frame (`position.copy()`,
+# `rotation.x = ...`, material colors). With a `TransformBuffer`, a sketch
+# writes everything into NumPy views of one float32 array, then calls
+# `apply()`: a single call, after which JS reads the array in place.
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any, Iterable
+
+import numpy as np
+
+import js
+from pyodide import ffi
+
+
+class TransformBuffer():
+    # `sections` gives the floats per object for each named section, e.g.
+    # `TransformBuffer(count, matrix=16, color=3)`. Sections are laid out one
+    # after another, each `count` rows long.
+    def __init__(self, count: int, **sections: int) -> None:
+        self.count: int = count
+        layout: dict[str, tuple[int, int]] = {}
+        offset: int = 0
+        for name, width in sections.items():
+            layout[name] = (offset, count * width)
+            offset += count * width
+        self.data: np.ndarray = np.zeros(offset, dtype=np.float32)
+        self._sections: dict[str, np.ndarray] = {
+            name: self.data[start:start + length].reshape(count, sections[name])
+            for name, (start, length) in layout.items()
+        }
+        # The PyProxy is what lets JS see `self.data` in place
+        self._proxy: ffi.JsProxy = ffi.create_proxy(self.data)
+        self._applier: ffi.JsProxy = js.TransformApplier.new(
+            self._proxy,
+            ffi.to_js({name: list(span) for name, span in layout.items()},
+                      dict_converter=js.Object.fromEntries),
+            count)
+
+    def section(self, name: str) -> np.ndarray:
+        # Writable `(count, width)` view of one section
+        return self._sections[name]
+
+    def bind_attribute(self, name: str, attribute: Any) -> None:
+        # `attribute` (e.g. `InstancedMesh.instanceMatrix`) is backed by
+        # section `name` from now on
+        self._applier.bindAttribute(name, attribute)
+
+    def bind_objects(self, name: str, objects: Iterable[Any]) -> None:
+        # Each `Object3D`'s local matrix is row `i` of matrix section `name`;
+        # they stop composing their own from position/rotation/scale
+        self._applier.bindObjects(name, ffi.to_js(list(objects)))
+
+    def bind_colors(self, name: str, colors: Iterable[Any]) -> None:
+        # Each three.js `Color` is row `i` of RGB section `name`
+        self._applier.bindColors(name, ffi.to_js(list(colors)))
+
+    def apply(self, count: int | None = None) -> None:
+        # Push the buffer out; call once per frame, right before render. With
+        # `count`, only the first `count` rows of each section go: the rest
+        # of the objects, and of each attribute's GPU buffer, keep what they
+        # had.
+        if count is None:
+            self._applier.apply()
+        else:
+            self._applier.apply(min(count, self.count))
+
+    def destroy(self) -> None:
+        self._applier.destroy()
+
+
+class QuadBatch():
+    # Up to `capacity` p5.js quads, drawn by `draw()` as one
+    # `beginShape(QUADS)`/`endShape()` from JS. Write each quad's corners
+    # into `positions` (shape `(capacity, 4, 2)`) and its corners' colors
+    # into `fills` and `strokes` (`(capacity, 4, 4)`, RGBA in p5's 0-255).
+    def __init__(self, capacity: int, p5: Any = None) -> None:
+        self.capacity: int = capacity
+        self.data: np.ndarray = np.zeros((capacity, 4, 10), dtype=np.float32)
+        self.positions: np.ndarray = self.data[:, :, 0:2]
+        self.fills: np.ndarray = self.data[:, :, 2:6]
+        self.strokes: np.ndarray = self.data[:, :, 6:10]
+        self._proxy: ffi.JsProxy = ffi.create_proxy(self.data)
+        self._batch: ffi.JsProxy = (js.QuadBatch.new(self._proxy) if p5 is None
+                                    else js.QuadBatch.new(self._proxy, p5))
+
+    def draw(self, count: int) -> None:
+        # Draw the first `count` quads, in a single call
+        self._batch.draw(count)
+
+    def destroy(self) -> None:
+        self._batch.destroy()
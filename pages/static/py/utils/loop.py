@@ -0,0 +1,145 @@
+# A `requestAnimationFrame()` loop that doesn't leak.
+#
+# The p5.js sketches used to end every `draw()` with
+# `requestAnimationFrame(create_proxy(draw))`: a new proxy every frame, never
+# destroyed, so a page left running grows without bound. `AnimationLoop` makes
+# one proxy for its callback up front and reuses it for every frame. It also
+# stops asking for frames while the tab is hidden, or while its element
+# (usually the canvas) is scrolled out of view, and picks up again when
+# they're back. `on_suspend(suspended)` is told whenever that changes, for
+# pausing whatever else runs alongside the frames (e.g. a worker's simulation).
+#
+#     _LOOP = loop.AnimationLoop(draw, canvas)
+#     _LOOP.start()
+#
+# `AnimationLoop.outstanding()` counts the proxies all loops are holding, for
+# checking that nothing is piling up.
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any, Callable
+
+import js
+from pyodide import ffi
+
+import utils
+
+
+class AnimationLoop():
+    # Every loop that hasn't been `destroy()`ed, for `outstanding()`
+    _LIVE: list['AnimationLoop'] = []
+
+    def __init__(self, callback: Callable[..., Any], element: Any = None,
+                 on_suspend: Callable[[bool], Any] | None = None) -> None:
+        # `callback` is called with the frame's timestamp (ms). If `element`
+        # is given, frames pause while it's entirely off-screen.
+        self._callback: Callable[..., Any] = callback
+        self._on_suspend: Callable[[bool], Any] | None = on_suspend
+        self._element: Any = None
+        self._request: Any = utils.platform_request_animation_frame()
+        self._handle: int | None = None
+        self.running: bool = False
+        self._hidden: bool = bool(js.document.hidden)
+        self._off_screen: bool = False
+        # What `on_suspend` was last told
+        self._was_suspended: bool = self.suspended
+        # Made once, destroyed by `destroy()`
+        self._proxies: dict[str, ffi.JsProxy] = {
+            'frame': ffi.create_proxy(self._frame),
+            'visibility': ffi.create_proxy(self._handle_visibility),
+        }
+        js.document.addEventListener('visibilitychange', self._proxies['visibility'])
+        self._observer: Any = None
+        if element is not None:
+            self.observe(element)
+        AnimationLoop._LIVE.append(self)
+
+    @staticmethod
+    def outstanding() -> int:
+        # Proxies held by all live loops; steady however long they've run
+        return sum(len(live._proxies) for live in AnimationLoop._LIVE)
+
+    @property
+    def suspended(self) -> bool:
+        return self._hidden or self._off_screen
+
+    def start(self) -> None:
+        self.running = True
+        self._schedule()
+
+    def stop(self) -> None:
+        self.running = False
+        self._cancel()
+
+    def observe(self, element: Any) -> None:
+        # Pause while `element` is off-screen (instead of any earlier one).
+        # Without `IntersectionObserver`, it's always taken to be on-screen.
+        observer_class: Any = getattr(js, 'IntersectionObserver', None)
+        if observer_class is None:
+            return
+        if self._observer is None:
+            self._proxies['intersection'] = ffi.create_proxy(self._handle_intersection)
+            self._observer = observer_class.new(self._proxies['intersection'])
+        elif self._element is not None:
+            self._observer.unobserve(self._element)
+        self._element = element
+        self._off_screen = False
+        self._observer.observe(element)
+
+    def destroy(self) -> None:
+        self.stop()
+        js.document.removeEventListener('visibilitychange', self._proxies['visibility'])
+        if self._observer is not None:
+            self._observer.disconnect()
+            self._observer = None
+        for proxy in self._proxies.values():
+            proxy.destroy()
+        self._proxies = {}
+        if self in AnimationLoop._LIVE:
+            AnimationLoop._LIVE.remove(self)
+
+    def _frame(self, timestamp: float = 0.0) -> None:
+        self._handle = None
+        if not self.running or self.suspended:
+            return
+        # Ask for the next frame first, so `callback` can `stop()` the loop
+        self._schedule()
+        self._callback(timestamp)
+
+    def _schedule(self) -> None:
+        if self._handle is None and self.running and not self.suspended:
+            self._handle = self._request(self._proxies['frame'])
+
+    def _cancel(self) -> None:
+        if self._handle is not None:
+            js.window.cancelAnimationFrame(self._handle)
+            self._handle = None
+
+    def _handle_visibility(self, *args: Any) -> None:
+        self._hidden = bool(js.document.hidden)
+        self._update()
+
+    def _handle_intersection(self, entries: Any, *args: Any) -> None:
+        # The latest entry is the current state
+        for entry in entries:
+            self._off_screen = not entry.isIntersecting
+        self._update()
+
+    def _update(self) -> None:
+        if self.suspended:
+            self._cancel()
+        else:
+            self._schedule()
+        if self.suspended != self._was_suspended:
+            self._was_suspended = self.suspended
+            if self._on_suspend is not None:
+                self._on_suspend(self.suspended)
@@ -0,0 +1,278 @@
+# Struct-of-arrays orbit state for the Orbiting* sketches.
+#
+# Every orbiter's radius, orbit angle, speeds and Euler angles live in
+# contiguous NumPy arrays (one slot per orbiter), and the whole population is
+# updated with a handful of vectorized operations per frame. The sketch
+# classes (`Cube`, `Whisker`, `Rect`) only hold an index into this state and
+# copy "their" slot out to three.js.
+#
+# Nothing is integrated: orbit angle and self-rotation are closed-form
+# functions of elapsed time (in seconds) and each orbiter's starting phase and
+# speed, so `seek()` can jump straight to any time, frames can be skipped, and
+# there's no numerical drift however long a sketch runs. Motion is the same
+# whatever the display's refresh rate: evaluating at the time each frame is
+# drawn is the exact version of a fixed-timestep simulation's interpolation.
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+
+from typing import Sequence
+
+import numpy as np
+
+import sampling
+
+# Which Euler axes an orbiter spins around
+SPIN_XYZ: tuple[float, float, float] = (1.0, 1.0, 1.0)
+SPIN_Z: tuple[float, float, float] = (0.0, 0.0, 1.0)
+
+
+class OrbitEngine():
+    def __init__(self, capacity: int) -> None:
+        self.capacity: int = capacity
+        self.count: int = 0
+        # Elapsed time, in seconds; `seek()` recomputes everything below from it
+        self.time: float = 0.0
+        # Per-orbiter constants
+        self.radius: np.ndarray = np.zeros(capacity)
+        # Orbit angle and Euler angles at time 0
+        self.phase: np.ndarray = np.zeros(capacity)
+        self.rotation_phase: np.ndarray = np.zeros((capacity, 3))
+        # Both speeds are radians/second
+        self.orbit_speed: np.ndarray = np.zeros(capacity)
+        self.spin_speed: np.ndarray = np.zeros(capacity)
+        self.spin_axes: np.ndarray = np.zeros((capacity, 3))
+        self.size: np.ndarray = np.zeros(capacity)
+        # State at `self.time`
+        # Orbit angle, in radians, kept in [-pi, pi) like `math.atan2`
+        self.angle: np.ndarray = np.zeros(capacity)
+        # Rows are (x, y, z), rotation rows are Euler (x, y, z) in [0, tau)
+        self.position: np.ndarray = np.zeros((capacity, 3))
+        self.rotation: np.ndarray = np.zeros((capacity, 3))
+        # Scratch buffers, so `seek()` doesn't allocate
+        self._scratch: np.ndarray = np.zeros(capacity)
+        self._cos: np.ndarray = np.zeros((capacity, 3))
+        self._sin: np.ndarray = np.zeros((capacity, 3))
+
+    def add(self, radius: float, angle: float,
+            orbit_speed: float, spin_speed: float,
+            size: float = 1.0,
+            rotation_z: float = 0.0,
+            position_z: float = 0.0,
+            spin_axes: tuple[float, float, float] = SPIN_XYZ) -> int:
+        # Register one orbiter and return its index. Speeds are given in
+        # degrees/second, as in the sketches.
+        if self.count >= self.capacity:
+            raise IndexError(f'OrbitEngine is full ({self.capacity} orbiters)')
+        index: int = self.count
+        self.count += 1
+        self.radius[index] = radius
+        self.phase[index] = angle
+        self.rotation_phase[index] = (0.0, 0.0, rotation_z)
+        self.orbit_speed[index] = math.radians(orbit_speed)
+        self.spin_speed[index] = math.radians(spin_speed)
+        self.spin_axes[index] = spin_axes
+        self.size[index] = size
+        self.position[index, 2] = position_z
+        self._seek_subset(self.time, np.array([index]))
+        return index
+
+    def add_many(self, radius: np.ndarray, angle: np.ndarray,
+                 orbit_speed: np.ndarray, spin_speed: np.ndarray,
+                 size: np.ndarray | float = 1.0,
+                 rotation_z: np.ndarray | float = 0.0,
+                 position_z: np.ndarray | float = 0.0,
+                 spin_axes: tuple[float, float, float] = SPIN_XYZ) -> np.ndarray:
+        # `add()` for a whole batch of orbiters at once; returns their indices
+        count: int = len(radius)
+        if self.count + count > self.capacity:
+            raise IndexError(f'OrbitEngine is full ({self.capacity} orbiters)')
+        batch: slice = slice(self.count, self.count + count)
+        self.count += count
+        self.radius[batch] = radius
+        self.phase[batch] = angle
+        self.rotation_phase[batch] = 0.0
+        self.rotation_phase[batch, 2] = rotation_z
+        self.orbit_speed[batch] = np.radians(orbit_speed)
+        self.spin_speed[batch] = np.radians(spin_speed)
+        self.spin_axes[batch] = spin_axes
+        self.size[batch] = size
+        self.position[batch, 2] = position_z
+        indices: np.ndarray = np.arange(batch.start, batch.stop)
+        self._seek_subset(self.time, indices)
+        return indices
+
+    def seek(self, time: float, count: int | None = None) -> None:
+        # Jump to `time` (in seconds since the start). With `count`, only the
+        # first `count` orbiters are recomputed - e.g. the ones a quality
+        # level shows. The others keep their state from the last `seek()`
+        # that included them.
+        self.time = time
+        count = self._limit(count)
+        angle: np.ndarray = self.angle[:count]
+        scratch: np.ndarray = self._scratch[:count]
+        # The old per-object rotation matrix turned each position by -speed
+        # every frame, so the angle *decreases* at `orbit_speed`
+        np.multiply(self.orbit_speed[:count], -time, out=angle)
+        angle += self.phase[:count]
+        _wrap_angles(angle)
+        radius: np.ndarray = self.radius[:count]
+        np.cos(angle, out=scratch)
+        np.multiply(scratch, radius, out=self.position[:count, 0])
+        np.sin(angle, out=scratch)
+        np.multiply(scratch, radius, out=self.position[:count, 1])
+        rotation: np.ndarray = self.rotation[:count]
+        np.multiply(self.spin_axes[:count], self.spin_speed[:count, np.newaxis], out=rotation)
+        rotation *= time
+        rotation += self.rotation_phase[:count]
+        np.remainder(rotation, math.tau, out=rotation)
+
+    def angle_at(self, index: int, time: float) -> float:
+        # Closed-form orbit angle of one orbiter, without touching any state
+        return _wrap_angle(self.phase[index] - self.orbit_speed[index] * time)
+
+    def _limit(self, count: int | None) -> int:
+        return self.count if count is None else min(count, self.count)
+
+    def _seek_subset(self, time: float, subset: np.ndarray) -> None:
+        # `seek()` for just the orbiters in `subset` (an array of indices),
+        # as they're added
+        angle: np.ndarray = self.phase[subset] - self.orbit_speed[subset] * time
+        _wrap_angles(angle)
+        self.angle[subset] = angle
+        self.position[subset, 0] = np.cos(angle) * self.radius[subset]
+        self.position[subset, 1] = np.sin(angle) * self.radius[subset]
+        rotation: np.ndarray = (self.spin_axes[subset] * self.spin_speed[subset, np.newaxis] * time
+                                + self.rotation_phase[subset])
+        self.rotation[subset] = np.remainder(rotation, math.tau)
+
+    def write_matrices(self, out: np.ndarray, scaled: bool = True,
+                       count: int | None = None) -> None:
+        # Compose a three.js `Matrix4` for every orbiter (or the first
+        # `count`) into the rows of `out` (shape `(capacity, 16)`):
+        # column-major, Euler order 'XYZ', uniform scale by `size` unless
+        # `scaled` is False (geometry that's already built at size). Same
+        # math as `Matrix4.compose()`.
+        count = self._limit(count)
+        cos: np.ndarray = self._cos[:count]
+        sin: np.ndarray = self._sin[:count]
+        np.cos(self.rotation[:count], out=cos)
+        np.sin(self.rotation[:count], out=sin)
+        a, c, e = cos[:, 0], cos[:, 1], cos[:, 2]
+        b, d, f = sin[:, 0], sin[:, 1], sin[:, 2]
+        size: np.ndarray = self.size[:count]
+        scratch: np.ndarray = self._scratch[:count]
+        rows: np.ndarray = out[:count]
+        # First column
+        np.multiply(c, e, out=rows[:, 0])
+        np.multiply(a, f, out=rows[:, 1])
+        np.multiply(b, e, out=scratch)
+        scratch *= d
+        rows[:, 1] += scratch
+        np.multiply(b, f, out=rows[:, 2])
+        np.multiply(a, e, out=scratch)
+        scratch *= d
+        rows[:, 2] -= scratch
+        # Second column
+        np.multiply(c, f, out=rows[:, 4])
+        np.negative(rows[:, 4], out=rows[:, 4])
+        np.multiply(a, e, out=rows[:, 5])
+        np.multiply(b, f, out=scratch)
+        scratch *= d
+        rows[:, 5] -= scratch
+        np.multiply(b, e, out=rows[:, 6])
+        np.multiply(a, f, out=scratch)
+        scratch *= d
+        rows[:, 6] += scratch
+        # Third column
+        rows[:, 8] = d
+        np.multiply(b, c, out=rows[:, 9])
+        np.negative(rows[:, 9], out=rows[:, 9])
+        np.multiply(a, c, out=rows[:, 10])
+        # Scale, then translation
+        if scaled:
+            rows[:, 0:3] *= size[:, np.newaxis]
+            rows[:, 4:7] *= size[:, np.newaxis]
+            rows[:, 8:11] *= size[:, np.newaxis]
+        rows[:, 3] = 0.0
+        rows[:, 7] = 0.0
+        rows[:, 11] = 0.0
+        rows[:, 12:15] = self.position[:count]
+        rows[:, 15] = 1.0
+
+    def write_segments(self, out: np.ndarray, count: int | None = None) -> None:
+        # Write each orbiter's (or the first `count`'s) local +x axis, `size`
+        # long, as a line segment in world space into the rows of `out`
+        # (shape `(capacity, 6)`): (start x, y, z, end x, y, z). That's where
+        # a unit-length line along x ends up after `write_matrices()`'
+        # transform, without the rest of the matrix.
+        count = self._limit(count)
+        cos: np.ndarray = self._cos[:count]
+        sin: np.ndarray = self._sin[:count]
+        np.cos(self.rotation[:count], out=cos)
+        np.sin(self.rotation[:count], out=sin)
+        a, c, e = cos[:, 0], cos[:, 1], cos[:, 2]
+        b, d, f = sin[:, 0], sin[:, 1], sin[:, 2]
+        size: np.ndarray = self.size[:count]
+        scratch: np.ndarray = self._scratch[:count]
+        rows: np.ndarray = out[:count]
+        position: np.ndarray = self.position[:count]
+        rows[:, 0:3] = position
+        # First column of the rotation, as in `write_matrices()`
+        np.multiply(c, e, out=rows[:, 3])
+        np.multiply(a, f, out=rows[:, 4])
+        np.multiply(b, e, out=scratch)
+        scratch *= d
+        rows[:, 4] += scratch
+        np.multiply(b, f, out=rows[:, 5])
+        np.multiply(a, e, out=scratch)
+        scratch *= d
+        rows[:, 5] -= scratch
+        rows[:, 3:6] *= size[:, np.newaxis]
+        rows[:, 3:6] += position
+
+
+def scatter(engine: OrbitEngine, rng: np.random.Generator, count: int,
+            orbits: Sequence[float], weights: Sequence[float], radius_jitter: float,
+            orbit_speed: tuple[float, float], spin_speed: tuple[float, float],
+            size: tuple[float, float],
+            position_z: tuple[float, float] = (0.0, 0.0),
+            spin_axes: tuple[float, float, float] = SPIN_XYZ) -> np.ndarray:
+    # Add `count` randomly-placed orbiters to `engine` in one vectorized pass,
+    # returning their indices. Each goes on one of `orbits` (chosen according
+    # to `weights`) plus up to `radius_jitter`, at a random angle. Speeds are
+    # (limit, tolerance) pairs for `sampling.avoid_zero()`, in degrees/second;
+    # `size` and `position_z` are [low, high) ranges. The draws are always
+    # made in the same order, so the same `rng` seed gives the same scene.
+    angle: np.ndarray = sampling.uniform(rng, 0.0, math.tau, count)
+    radius: np.ndarray = sampling.choose(rng, orbits, weights, count)
+    radius += sampling.uniform(rng, 0.0, radius_jitter, count)
+    return engine.add_many(
+        radius, angle,
+        sampling.avoid_zero(rng, *orbit_speed, count),
+        sampling.avoid_zero(rng, *spin_speed, count),
+        size=sampling.uniform(rng, *size, count),
+        rotation_z=sampling.uniform(rng, 0.0, math.tau, count),
+        position_z=sampling.uniform(rng, *position_z, count),
+        spin_axes=spin_axes)
+
+
+def _wrap_angle(angle: float) -> float:
+    return (angle + math.pi) % math.tau - math.pi
+
+
+def _wrap_angles(angles: np.ndarray) -> None:
+    # In-place, vectorized `_wrap_angle()`
+    angles += math.pi
+    np.remainder(angles, math.tau, out=angles)
+    angles -= math.pi
@@ -0,0 +1,110 @@
+# Precomputed two-color gradients for the Orbiting* sketches' recoloring.
+#
+# Every sketch colors its items by lerping between two colors according to
+# how far round the circle (|orbit angle| / pi) they are, plus a little random
+# jitter to avoid obvious bands. `GradientLUT` does all of that once, up
+# front: a packed RGB table with one row per quantized angle, and a table of
+# precomputed jitter offsets. Recoloring is then an index calculation and a
+# row lookup - no color objects, no FFI lerps.
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+
+import numpy as np
+
+
+class GradientLUT():
+    # `start` and `end` are 0xRRGGBB. `linear=True` builds the table in the
+    # linear color space three.js works in (as `Color.new(hex)` would), for
+    # p5.js use `linear=False, scale=255`. `jitter` is the +/- range of the
+    # random offset added to each lookup, as a fraction of the whole gradient.
+    def __init__(self, start: int, end: int,
+                 steps: int = 256,
+                 jitter: float = 0.02,
+                 linear: bool = True,
+                 scale: float = 1.0,
+                 noise_size: int = 1021,
+                 seed: int | None = None) -> None:
+        self.steps: int = steps
+        self._last: int = steps - 1
+        start_rgb: np.ndarray = _rgb(start, linear)
+        end_rgb: np.ndarray = _rgb(end, linear)
+        shade: np.ndarray = np.linspace(0.0, 1.0, steps)[:, np.newaxis]
+        # Packed rows of (r, g, b)
+        self.table: np.ndarray = ((start_rgb + (end_rgb - start_rgb) * shade) * scale
+                                  ).astype(np.float32)
+        # The same rows as Python tuples, for per-object (scalar) lookups
+        self._rows: list[tuple[float, float, float]] = [
+            (r, g, b) for r, g, b in self.table.tolist()]
+        spread: int = round(jitter * self._last)
+        self._noise_size: int = noise_size
+        self._noise: np.ndarray = np.random.default_rng(seed).integers(
+            -spread, spread + 1, noise_size, dtype=np.intp)
+        self._noise_list: list[int] = self._noise.tolist()
+        self._cursor: int = 0
+        # Buffers for `lookup_into()`, sized on first use
+        self._index: np.ndarray = np.zeros(0, dtype=np.intp)
+        self._shade: np.ndarray = np.zeros(0)
+
+    def lookup(self, angle: float) -> tuple[float, float, float]:
+        # (r, g, b) for one item at orbit angle `angle` (radians, +/-pi)
+        cursor: int = self._cursor + 1
+        if cursor == self._noise_size:
+            cursor = 0
+        self._cursor = cursor
+        index: int = int(abs(angle) * self._last / math.pi + 0.5) + self._noise_list[cursor]
+        return self._rows[min(max(index, 0), self._last)]
+
+    def lookup_into(self, angles: np.ndarray, out: np.ndarray) -> None:
+        # Vectorized `lookup()`: write the rows for every angle in `angles`
+        # into `out`, a float32 array of shape `(len(angles), 3)`
+        count: int = len(angles)
+        if len(self._index) < count:
+            self._grow(count)
+        index: np.ndarray = self._index[:count]
+        shade: np.ndarray = self._shade[:count]
+        np.abs(angles, out=shade)
+        shade *= self._last / math.pi
+        shade += 0.5
+        np.copyto(index, shade, casting='unsafe')
+        # Each item gets a different jitter offset each frame, as the
+        # cursor slides along the (repeated) noise table
+        self._cursor = (self._cursor + 1) % self._noise_size
+        index += self._noise[self._cursor:self._cursor + count]
+        np.take(self.table, index, axis=0, out=out, mode='clip')
+
+    def offsets(self, count: int) -> np.ndarray:
+        # A fixed jitter offset, in table rows, for each of `count` items:
+        # the noise table, repeated. For dithering colors that can't take a
+        # fresh offset every frame, see `pool.BucketedMaterials`.
+        return np.resize(self._noise[:self._noise_size], count)
+
+    def _grow(self, count: int) -> None:
+        self._index = np.zeros(count, dtype=np.intp)
+        self._shade = np.zeros(count)
+        # Long enough that any window of `count` starting within the first
+        # `noise_size` entries fits
+        repeats: int = -(-(count + self._noise_size) // self._noise_size)
+        self._noise = np.tile(self._noise[:self._noise_size], repeats)
+
+
+def _rgb(hex_color: int, linear: bool) -> np.ndarray:
+    rgb: np.ndarray = np.array([(hex_color >> 16) & 0xff,
+                                (hex_color >> 8) & 0xff,
+                                hex_color & 0xff]) / 255
+    if not linear:
+        return rgb
+    # sRGB -> linear, as three.js' `SRGBToLinear()`
+    return np.where(rgb < 0.04045,
+                    rgb * 0.0773993808,
+                    (rgb * 0.9478672986 + 0.0521327014) ** 2.4)
@@ -0,0 +1,209 @@
+# Shared, reference-counted three.js geometries and materials.
+#
+# The Orbiting* sketches used to give every object its own geometry and
+# material(s), although the geometries only differ by a scale factor and the
+# materials only by opacity (a function of orbit radius) and color (a
+# function of orbit angle). With a `ResourcePool`, objects share one unit
+# geometry per shape, scaled per mesh, and `BucketedMaterials` hands out one
+# material per (opacity bucket, color bucket): GPU buffers and material
+# state stay bounded however many objects there are.
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+
+from typing import Any, Callable, Hashable
+
+import numpy as np
+
+import palette
+
+
+class ResourcePool():
+    # Keyed three.js resources (anything with `dispose()`), created on first
+    # `acquire()` and disposed when the last user `release()`s them
+    def __init__(self) -> None:
+        self._items: dict[Hashable, Any] = {}
+        self._refs: dict[Hashable, int] = {}
+
+    def acquire(self, key: Hashable, create: Callable[[], Any]) -> Any:
+        item: Any = self._items.get(key)
+        if item is None:
+            item = self._items[key] = create()
+            self._refs[key] = 0
+        self._refs[key] += 1
+        return item
+
+    def release(self, key: Hashable) -> None:
+        self._refs[key] -= 1
+        if self._refs[key] == 0:
+            self._items.pop(key).dispose()
+            del self._refs[key]
+
+    def refs(self, key: Hashable) -> int:
+        return self._refs.get(key, 0)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+
+class BucketedMaterials():
+    # Materials of one kind (`material_class` with `parameters`), shared by
+    # every mesh whose opacity and color fall in the same bucket. Opacity is
+    # fixed per mesh, quantized to `opacity_buckets` steps across
+    # `opacity_range`; color follows the mesh's orbit angle through `lut`,
+    # quantized to `color_buckets` steps. As a mesh moves round its orbit,
+    # `update()` moves it to the next bucket's material - a handful of FFI
+    # calls per frame, not one per mesh.
+    #
+    # So that meshes at about the same angle don't all band into one
+    # bucket, each mesh's angle is dithered by a fixed offset from `lut`'s
+    # jitter (`GradientLUT.offsets()`), over the same range as its lookups.
+    # Unlike theirs, the offset doesn't change from frame to frame: that
+    # would move most meshes to another material every frame.
+    def __init__(self, pool: ResourcePool, name: str, material_class: Any,
+                 lut: palette.GradientLUT,
+                 color_buckets: int = 32,
+                 opacity_buckets: int = 8,
+                 opacity_range: tuple[float, float] = (1.0, 1.0),
+                 **parameters: Any) -> None:
+        self._pool: ResourcePool = pool
+        self._name: str = name
+        self._material_class: Any = material_class
+        self._parameters: dict[str, Any] = parameters
+        self._color_buckets: int = color_buckets
+        self._lut: palette.GradientLUT = lut
+        # Gradient rows per radian, and color buckets per row
+        self._rows_per_radian: float = (lut.steps - 1) / math.pi
+        self._last_row: int = lut.steps - 1
+        self._buckets_per_row: float = color_buckets / lut.steps
+        self._opacity_buckets: int = opacity_buckets
+        self._opacity_low, self._opacity_high = opacity_range
+        # One gradient row per color bucket, from the middle of its span
+        rows: np.ndarray = ((np.arange(color_buckets) + 0.5) / color_buckets
+                            * (lut.steps - 1) + 0.5).astype(np.intp)
+        self._colors: list[tuple[float, float, float]] = [
+            (r, g, b) for r, g, b in lut.table[rows].tolist()]
+        self._meshes: list[Any] = []
+        self._opacity: list[int] = []
+        # Each slot's color bucket and dither offset (in gradient rows), and
+        # scratch space for `update()`; grown by doubling as meshes are
+        # attached
+        self._current: np.ndarray = np.zeros(0, dtype=np.intp)
+        self._offset: np.ndarray = np.zeros(0)
+        self._next: np.ndarray = np.zeros(0, dtype=np.intp)
+        self._shade: np.ndarray = np.zeros(0)
+
+    def attach(self, create: Callable[[Any], Any], opacity: float, angle: float) -> Any:
+        # Make a mesh with `create(material)`, where `material` is the one for
+        # `opacity` and orbit angle `angle`, and return it. Meshes take slots
+        # in the order they're attached, which is the order of `update()`'s
+        # angles - attach them in `OrbitEngine` index order.
+        slot: int = len(self._meshes)
+        if slot == len(self._current):
+            self._grow(max(2 * slot, 16))
+        opacity_bucket: int = self._opacity_bucket(opacity)
+        bucket: int = self.color_bucket(slot, angle)
+        mesh: Any = create(self._acquire(opacity_bucket, bucket))
+        self._meshes.append(mesh)
+        self._opacity.append(opacity_bucket)
+        self._current[slot] = bucket
+        return mesh
+
+    def update(self, angles: np.ndarray) -> int:
+        # Move every attached mesh whose color bucket has changed to its new
+        # material. `angles` are in slot order, and may stop short (e.g. at
+        # the meshes shown): the rest are left as they are. Returns how many
+        # moved.
+        count: int = min(len(self._meshes), len(angles))
+        buckets: np.ndarray = self._next[:count]
+        shade: np.ndarray = self._shade[:count]
+        # `color_bucket()`, for every slot
+        np.abs(angles[:count], out=shade)
+        shade *= self._rows_per_radian
+        shade += self._offset[:count]
+        shade += 0.5
+        np.clip(shade, 0, self._last_row, out=shade)
+        np.floor(shade, out=shade)
+        shade *= self._buckets_per_row
+        np.copyto(buckets, shade, casting='unsafe')
+        changed: np.ndarray = np.flatnonzero(buckets != self._current[:count])
+        for slot in changed.tolist():
+            self._move(slot, int(buckets[slot]))
+        return len(changed)
+
+    def recolor(self, slot: int, angle: float) -> None:
+        # Move one mesh to the color bucket for `angle`, if it isn't there
+        self._move(slot, self.color_bucket(slot, angle))
+
+    def _move(self, slot: int, bucket: int) -> None:
+        opacity: int = self._opacity[slot]
+        old: int = int(self._current[slot])
+        if bucket == old:
+            return
+        self._meshes[slot].material = self._acquire(opacity, bucket)
+        self._pool.release(self._key(opacity, old))
+        self._current[slot] = bucket
+
+    def color_bucket(self, slot: int, angle: float) -> int:
+        # The bucket of the gradient row `lut` would give `angle`, with
+        # `slot`'s dither offset in place of its per-lookup jitter
+        row: int = int(abs(angle) * self._rows_per_radian + self._offset[slot] + 0.5)
+        return int(min(max(row, 0), self._last_row) * self._buckets_per_row)
+
+    def detach_all(self) -> None:
+        # Give up every attached mesh's material (the meshes keep them)
+        for slot, bucket in enumerate(self._current[:len(self._meshes)].tolist()):
+            self._pool.release(self._key(self._opacity[slot], bucket))
+        self._meshes = []
+        self._opacity = []
+
+    def _grow(self, capacity: int) -> None:
+        current: np.ndarray = np.zeros(capacity, dtype=np.intp)
+        current[:len(self._current)] = self._current
+        self._current = current
+        # The same offsets for the slots already there, as they depend only
+        # on the slot
+        self._offset = self._lut.offsets(capacity).astype(float)
+        self._next = np.zeros(capacity, dtype=np.intp)
+        self._shade = np.zeros(capacity)
+
+    def _opacity_bucket(self, opacity: float) -> int:
+        if self._opacity_high == self._opacity_low:
+            return 0
+        fraction: float = (opacity - self._opacity_low) / (self._opacity_high - self._opacity_low)
+        return min(max(round(fraction * (self._opacity_buckets - 1)), 0), self._opacity_buckets - 1)
+
+    def _opacity_value(self, bucket: int) -> float:
+        if self._opacity_buckets == 1 or self._opacity_high == self._opacity_low:
+            return self._opacity_high
+        return (self._opacity_low + (self._opacity_high - self._opacity_low)
+                * bucket / (self._opacity_buckets - 1))
+
+    def _key(self, opacity: int, color: int) -> tuple[str, int, int]:
+        return (self._name, opacity, color)
+
+    def _acquire(self, opacity: int, color: int) -> Any:
+        return self._pool.acquire(self._key(opacity, color),
+                                  lambda: self._create(opacity, color))
+
+    def _create(self, opacity: int, color: int) -> Any:
+        parameters: dict[str, Any] = dict(self._parameters)
+        if 'opacity' not in parameters:
+            parameters['opacity'] = self._opacity_value(opacity)
+        material: Any = self._material_class.new(**parameters)
+        red, green, blue = self._colors[color]
+        material.color.setRGB(red, green, blue)
+        return material
@@ -0,0 +1,194 @@
+# Opt-in per-phase frame profiler for the sketches.
+#
+# A sketch's `_animate()` brackets its phases with marks:
+#
+#     _PROFILER.begin_frame()
+#     _ENGINE.seek(...)
+#     _PROFILER.mark('simulate')
+#     ...
+#     _RENDERER.render(_SCENE, _CAMERA)
+#     _PROFILER.mark('render')
+#     _PROFILER.end_frame(_RENDERER)
+#
+# Each mark times the phase since the previous one. The profiler keeps the
+# last `window` frames of every phase, of the whole frame and of the
+# renderer's draw calls and triangles, plus a rolling histogram of each
+# timing. A small overlay shows the figures on the page, and `to_json()`
+# (also `window.frameProfile()` in the dev console) exports them for
+# regression tracking.
+#
+# Turned on with `?profile=1` (see `from_query()`); when off, every method
+# returns straight away, so the marks can stay in.
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import time
+
+from typing import Any
+
+import numpy as np
+
+import js
+from pyodide import ffi
+
+import utils
+
+
+class RollingStat():
+    # The last `window` samples of one quantity, and (for timings) a
+    # histogram of them, kept up to date as samples come and go
+    def __init__(self, window: int, bin_width: float = 0.0, bins: int = 0) -> None:
+        self.window: int = window
+        self.samples: np.ndarray = np.zeros(window)
+        self.count: int = 0
+        self._next: int = 0
+        self.bin_width: float = bin_width
+        # The last bin also counts everything above the histogram's range
+        self.histogram: np.ndarray = np.zeros(bins, dtype=np.int64)
+        self._bins: np.ndarray = np.zeros(window, dtype=np.intp)
+
+    def add(self, value: float) -> None:
+        slot: int = self._next
+        self._next = (slot + 1) % self.window
+        if self.count == self.window:
+            self.histogram[self._bins[slot]] -= 1
+        else:
+            self.count += 1
+        self.samples[slot] = value
+        if len(self.histogram):
+            bin_: int = min(int(value / self.bin_width), len(self.histogram) - 1)
+            self._bins[slot] = bin_
+            self.histogram[bin_] += 1
+
+    def summary(self) -> dict[str, float]:
+        if self.count == 0:
+            return {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+        samples: np.ndarray = self.samples[:self.count]
+        p50, p95 = np.percentile(samples, (50, 95))
+        return {'mean': float(samples.mean()), 'p50': float(p50),
+                'p95': float(p95), 'max': float(samples.max())}
+
+
+class FrameProfiler():
+    # Timings are in ms; histogram bins are `BIN_MS` wide, up to `BINS * BIN_MS`
+    BIN_MS = 0.5
+    BINS = 100
+    # How often the overlay is redrawn
+    OVERLAY_MS = 500.0
+
+    def __init__(self, enabled: bool = True, window: int = 240, overlay: bool = True) -> None:
+        self.enabled: bool = enabled
+        self.window: int = window
+        self.frames: int = 0
+        self.phases: dict[str, RollingStat] = {}
+        self.total: RollingStat = RollingStat(window, self.BIN_MS, self.BINS)
+        self.draw_calls: RollingStat = RollingStat(window)
+        self.triangles: RollingStat = RollingStat(window)
+        self._frame_start: float = 0.0
+        self._mark: float = 0.0
+        self._overlay: Any = None
+        self._overlay_at: float = 0.0
+        self._export_proxy: Any = None
+        if enabled:
+            # `window.frameProfile()` in the console gives the JSON
+            self._export_proxy = ffi.create_proxy(self.to_json)
+            js.window.frameProfile = self._export_proxy
+            if overlay:
+                self._overlay = _create_overlay()
+
+    @staticmethod
+    def from_query(**kwargs: Any) -> 'FrameProfiler':
+        # Enabled by `?profile=1`; `?profile=2` profiles without the overlay
+        setting: str = utils.query_param('profile', '0')
+        return FrameProfiler(enabled=setting in ('1', '2'), overlay=setting == '1', **kwargs)
+
+    def begin_frame(self) -> None:
+        if not self.enabled:
+            return
+        self._frame_start = self._mark = time.perf_counter()
+
+    def mark(self, phase: str) -> None:
+        # End `phase`, which ran from the previous mark (or `begin_frame()`)
+        if not self.enabled:
+            return
+        now: float = time.perf_counter()
+        stat: RollingStat | None = self.phases.get(phase)
+        if stat is None:
+            stat = self.phases[phase] = RollingStat(self.window, self.BIN_MS, self.BINS)
+        stat.add((now - self._mark) * 1000)
+        self._mark = now
+
+    def end_frame(self, renderer: Any = None) -> None:
+        # `renderer` is a `WebGLRenderer`, for its `info.render` counts
+        if not self.enabled:
+            return
+        now: float = time.perf_counter()
+        self.total.add((now - self._frame_start) * 1000)
+        self.frames += 1
+        if renderer is not None:
+            info: Any = renderer.info.render
+            self.draw_calls.add(info.calls)
+            self.triangles.add(info.triangles)
+        if self._overlay is not None and (now - self._overlay_at) * 1000 >= self.OVERLAY_MS:
+            self._overlay_at = now
+            self._overlay.textContent = self.text()
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            'frames': self.frames,
+            'window': self.window,
+            'bin_ms': self.BIN_MS,
+            'total': _timing(self.total),
+            'phases': {name: _timing(stat) for name, stat in self.phases.items()},
+            'draw_calls': self.draw_calls.summary(),
+            'triangles': self.triangles.summary(),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot())
+
+    def text(self) -> str:
+        # What the overlay shows
+        lines: list[str] = [f'{"ms":<10}{"mean":>7}{"p95":>7}{"max":>7}']
+        for name, stat in [*self.phases.items(), ('frame', self.total)]:
+            summary: dict[str, float] = stat.summary()
+            lines.append(f'{name:<10}{summary["mean"]:>7.2f}{summary["p95"]:>7.2f}'
+                         f'{summary["max"]:>7.2f}')
+        if self.draw_calls.count:
+            lines.append(f'draws {self.draw_calls.summary()["mean"]:.0f}  '
+                         f'tris {self.triangles.summary()["mean"]:.0f}')
+        return '\n'.join(lines)
+
+    def destroy(self) -> None:
+        if self._overlay is not None:
+            self._overlay.remove()
+            self._overlay = None
+        if self._export_proxy is not None:
+            js.window.frameProfile = None
+            self._export_proxy.destroy()
+            self._export_proxy = None
+        self.enabled = False
+
+
+def _timing(stat: RollingStat) -> dict[str, Any]:
+    return {**stat.summary(), 'histogram': stat.histogram.tolist()}
+
+
+def _create_overlay() -> Any:
+    overlay: Any = js.document.createElement('pre')
+    overlay.style.cssText = ('position: fixed; top: 0; left: 0; margin: 0; padding: 4px 6px;'
+                             'font: 11px/1.3 monospace; color: #e0e0e0;'
+                             'background: rgba(0, 0, 0, 0.6); pointer-events: none;'
+                             'z-index: 10;')
+    js.document.body.appendChild(overlay)
+    return overlay
@@ -0,0 +1,244 @@
+# Adaptive quality for the three.js sketches.
+#
+# `QualityGovernor` owns a sketch's `WebGLRenderer` (made with
+# `utils.renderer_config()`) and watches how long frames take. When they run
+# over budget it steps down through `LEVELS` - lower pixel ratio, no
+# antialiasing, fewer active objects, updating every other frame - and when
+# they've been comfortably on time for a while it tries a step back up. The
+# step down is quick and the step up is slow (and slower each time an upgrade
+# doesn't stick), so it settles instead of flip-flopping.
+#
+# It also takes over window resizes: any number of resize events between two
+# frames become one `setSize()`, applied at the start of the next frame.
+#
+#     _QUALITY = quality.QualityGovernor.from_query(WebGLRenderer, width, height,
+#                                                   clear_color, on_resize=_handle_resize)
+#     _QUALITY.start(_animate)
+#
+#     def _animate(*args):
+#         if not _QUALITY.frame():
+#             return
+#         ...
+#         _QUALITY.renderer.render(_SCENE, _CAMERA)
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+from typing import Any, Callable
+
+import js
+from pyodide import ffi
+
+import loop
+import utils
+
+
+class QualityLevel():
+    def __init__(self, max_pixel_ratio: float, antialias: bool,
+                 objects: float, update_every: int) -> None:
+        # The renderer's pixel ratio is the device's, capped at this
+        self.max_pixel_ratio: float = max_pixel_ratio
+        # Changing this means a new renderer (and WebGL context)
+        self.antialias: bool = antialias
+        # Fraction of the sketch's objects to animate and draw
+        self.objects: float = objects
+        # Update and render only every Nth animation frame
+        self.update_every: int = update_every
+
+    def active(self, count: int) -> int:
+        # How many of `count` objects are active at this level
+        return max(1, round(count * self.objects)) if count else 0
+
+
+class QualityGovernor():
+    # Best first. The cheapest, most effective step (pixel ratio) comes first.
+    LEVELS: tuple[QualityLevel, ...] = (
+        QualityLevel(3.0, True, 1.0, 1),
+        QualityLevel(2.0, True, 1.0, 1),
+        QualityLevel(1.5, False, 1.0, 1),
+        QualityLevel(1.0, False, 1.0, 1),
+        QualityLevel(1.0, False, 0.5, 1),
+        QualityLevel(0.75, False, 0.5, 2),
+        QualityLevel(0.5, False, 0.25, 2),
+    )
+    # Weight of the newest frame in the smoothed frame time
+    SMOOTHING = 0.1
+    # Smoothed frame time over `budget * SLOW` is a slow frame, under
+    # `budget * ON_TIME` an on-time one
+    SLOW = 1.2
+    ON_TIME = 1.05
+    # Consecutive slow frames before stepping down
+    DOWNGRADE_FRAMES = 45
+    # Consecutive on-time frames before trying a step up; doubles each time
+    # an upgrade is followed straight away by a downgrade
+    UPGRADE_FRAMES = 300
+    MAX_UPGRADE_FRAMES = 4800
+    # Frames to ignore after a change (and at start-up) while things settle
+    COOLDOWN_FRAMES = 60
+    # A gap this long (ms) is a hidden tab or a breakpoint, not a slow frame
+    MAX_FRAME_MS = 250.0
+
+    def __init__(self, renderer_class: Any, width: int, height: int,
+                 clear_color: int = 0x000000,
+                 target_fps: float = 60.0,
+                 level: int = 0,
+                 adaptive: bool = True,
+                 on_level: Callable[[QualityLevel], None] | None = None,
+                 on_resize: Callable[[int, int], None] | None = None) -> None:
+        self.budget_ms: float = 1000 / target_fps
+        self.adaptive: bool = adaptive
+        self.index: int = level
+        self._renderer_class: Any = renderer_class
+        self._clear_color: int = clear_color
+        self._width: int = width
+        self._height: int = height
+        self._on_level: Callable[[QualityLevel], None] | None = on_level
+        self._on_resize: Callable[[int, int], None] | None = on_resize
+        self._device_ratio: float = js.window.devicePixelRatio
+        self.renderer: Any = utils.renderer_config(
+            renderer_class, width, height, clear_color,
+            antialias=self.level.antialias, pixel_ratio=self._pixel_ratio())
+        self.frame_ms: float = self.budget_ms
+        self._last: float | None = None
+        self._frame: int = 0
+        self._slow: int = 0
+        self._on_time: int = 0
+        self._cooldown: int = self.COOLDOWN_FRAMES
+        self._upgrade_frames: int = self.UPGRADE_FRAMES
+        self._upgraded_at: int | None = None
+        self._resize_pending: bool = False
+        self._loop: loop.AnimationLoop | None = None
+        self._resize_proxy: Any = None
+
+    @staticmethod
+    def from_query(renderer_class: Any, width: int, height: int,
+                   clear_color: int = 0x000000, **kwargs: Any) -> 'QualityGovernor':
+        # `?quality=N` pins level N, `?quality=off` pins the best level (the
+        # sketches' old behavior), `?fps=N` sets the target frame rate
+        setting: str = utils.query_param('quality', 'auto')
+        fps: str = utils.query_param('fps')
+        if fps:
+            kwargs['target_fps'] = float(fps)
+        if setting == 'off':
+            kwargs.update(level=0, adaptive=False)
+        elif setting.isdigit():
+            kwargs.update(level=min(int(setting), len(QualityGovernor.LEVELS) - 1),
+                          adaptive=False)
+        return QualityGovernor(renderer_class, width, height, clear_color, **kwargs)
+
+    @property
+    def level(self) -> QualityLevel:
+        return self.LEVELS[self.index]
+
+    def start(self, animate: Callable[..., Any]) -> None:
+        # Run `animate` every animation frame (paused while the tab's hidden
+        # or the canvas is off-screen), and start handling resizes
+        self._loop = loop.AnimationLoop(animate, self.renderer.domElement)
+        self._loop.start()
+        self._resize_proxy = ffi.create_proxy(self.request_resize)
+        js.window.addEventListener('resize', self._resize_proxy)
+        if self._on_level is not None:
+            self._on_level(self.level)
+
+    def request_resize(self, *args: Any) -> None:
+        # Just note it: `frame()` applies it once, whatever the event rate
+        self._resize_pending = True
+
+    def frame(self) -> bool:
+        # Call first thing in the animation loop. Applies any pending resize,
+        # times the frame, adapts the quality level, and returns whether the
+        # sketch should update and render this frame.
+        now: float = time.perf_counter() * 1000
+        if self._resize_pending:
+            self._apply_resize()
+        if self._last is not None:
+            self._measure(now - self._last)
+        self._last = now
+        self._frame += 1
+        return self._frame % self.level.update_every == 0
+
+    def set_level(self, index: int) -> None:
+        index = min(max(index, 0), len(self.LEVELS) - 1)
+        if index == self.index:
+            return
+        previous: QualityLevel = self.level
+        self.index = index
+        level: QualityLevel = self.level
+        if level.antialias != previous.antialias:
+            self._replace_renderer()
+        else:
+            self.renderer.setPixelRatio(self._pixel_ratio())
+        self._cooldown = self.COOLDOWN_FRAMES
+        self._slow = self._on_time = 0
+        if self._on_level is not None:
+            self._on_level(level)
+
+    def destroy(self) -> None:
+        if self._resize_proxy is not None:
+            js.window.removeEventListener('resize', self._resize_proxy)
+            self._resize_proxy.destroy()
+        if self._loop is not None:
+            self._loop.destroy()
+            self._loop = None
+
+    def _measure(self, frame_ms: float) -> None:
+        if frame_ms > self.MAX_FRAME_MS:
+            self._slow = self._on_time = 0
+            return
+        self.frame_ms += (frame_ms - self.frame_ms) * self.SMOOTHING
+        if not self.adaptive:
+            return
+        if self._cooldown > 0:
+            self._cooldown -= 1
+            return
+        if self.frame_ms > self.budget_ms * self.SLOW:
+            self._slow += 1
+            self._on_time = 0
+        elif self.frame_ms < self.budget_ms * self.ON_TIME:
+            self._on_time += 1
+            self._slow = 0
+        if self._slow >= self.DOWNGRADE_FRAMES and self.index < len(self.LEVELS) - 1:
+            # An upgrade that didn't hold: wait longer before the next one
+            if (self._upgraded_at is not None
+                    and self._frame - self._upgraded_at < self.COOLDOWN_FRAMES + self.DOWNGRADE_FRAMES * 2):
+                self._upgrade_frames = min(self._upgrade_frames * 2, self.MAX_UPGRADE_FRAMES)
+            self._upgraded_at = None
+            self.set_level(self.index + 1)
+        elif self._on_time >= self._upgrade_frames and self.index > 0:
+            self._upgraded_at = self._frame
+            self.set_level(self.index - 1)
+
+    def _pixel_ratio(self) -> float:
+        return min(self._device_ratio, self.level.max_pixel_ratio)
+
+    def _apply_resize(self) -> None:
+        self._resize_pending = False
+        self._width = js.window.innerWidth
+        self._height = js.window.innerHeight
+        self._device_ratio = js.window.devicePixelRatio
+        self.renderer.setPixelRatio(self._pixel_ratio())
+        self.renderer.setSize(self._width, self._height)
+        if self._on_resize is not None:
+            self._on_resize(self._width, self._height)
+
+    def _replace_renderer(self) -> None:
+        # Antialiasing is fixed when the WebGL context is made, so swap in a
+        # new renderer (three.js re-uploads geometry etc. on first render)
+        old: Any = self.renderer
+        self.renderer = utils.renderer_config(
+            self._renderer_class, self._width, self._height, self._clear_color,
+            antialias=self.level.antialias, pixel_ratio=self._pixel_ratio())
+        old.domElement.replaceWith(self.renderer.domElement)
+        old.dispose()
+        if self._loop is not None:
+            self._loop.observe(self.renderer.domElement)
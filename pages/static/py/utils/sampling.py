@@ -0,0 +1,56 @@
+# Vectorized, seedable random sampling for building scenes in bulk.
+#
+# These are the batch counterparts of `utils.rand_float()`, `utils.avoid_zero()`
+# and the sketches' weighted orbit choice: each call draws the values for a
+# whole population at once from an explicit `numpy.random.Generator`, instead
+# of one at a time from Python's global `random` state. The same seed always
+# gives the same scene.
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Sequence
+
+import numpy as np
+
+import utils
+
+
+def generator(seed: int | None = None) -> np.random.Generator:
+    # With no `seed`, the page's `?seed=N` if there is one, else a fresh one
+    if seed is None:
+        param: str = utils.query_param('seed')
+        seed = int(param) if param else None
+    return np.random.default_rng(seed)
+
+
+def uniform(rng: np.random.Generator, low: float, high: float, count: int) -> np.ndarray:
+    # `count` floats from [low, high)
+    return rng.uniform(low, high, count)
+
+
+def avoid_zero(rng: np.random.Generator, limit: float, tolerance: float,
+               count: int) -> np.ndarray:
+    # `count` values from [-limit, limit), excluding (-tolerance, tolerance).
+    # That's a magnitude from [tolerance, limit) with a random sign: the same
+    # distribution `utils.avoid_zero()` gets by rejection, in one pass.
+    magnitude: np.ndarray = rng.uniform(tolerance, limit, count)
+    return np.where(rng.random(count) < 0.5, -magnitude, magnitude)
+
+
+def choose(rng: np.random.Generator, values: Sequence[float], weights: Sequence[float],
+           count: int) -> np.ndarray:
+    # `count` picks from `values`, each with probability proportional to its
+    # weight: one search of the cumulative weights per pick, no if-chains
+    cumulative: np.ndarray = np.cumsum(weights, dtype=float)
+    picks: np.ndarray = np.searchsorted(cumulative, rng.random(count) * cumulative[-1],
+                                        side='right')
+    return np.asarray(values, dtype=float)[np.minimum(picks, len(values) - 1)]
@@ -0,0 +1,117 @@
+# Uniform-grid broad phase for circle collisions.
+#
+# Checking every circle against every other is O(n^2). `SpatialHash` files
+# each circle under the grid cell its center is in; with cells at least as
+# wide as the largest diameter, two circles can only overlap if their cells
+# are the same or adjacent, so `pairs()` only has to look at those. Each
+# neighboring pair of cells is visited from one side only (the "forward" half
+# of the neighborhood), so every candidate pair comes out exactly once.
+#
+# The grid is kept between frames: `update()` only touches the cells of
+# circles that have moved into a different one. `grid_pairs()` is the same
+# search for circles held in NumPy arrays, vectorized and rebuilt each call.
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+
+import numpy as np
+
+
+class SpatialHash():
+    # Half of the 8 neighbors: the other half see us as *their* forward
+    # neighbor, so each pair of adjacent cells is visited once
+    FORWARD: tuple[tuple[int, int], ...] = ((1, 0), (-1, 1), (0, 1), (1, 1))
+
+    def __init__(self, cell_size: float) -> None:
+        # `cell_size` should be at least the largest diameter
+        self.cell_size: float = cell_size
+        self._cells: dict[tuple[int, int], list[int]] = {}
+        # Each item's current cell, by index
+        self._keys: list[tuple[int, int]] = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def update(self, index: int, x: float, y: float) -> bool:
+        # File item `index` (new items must come in order: 0, 1, 2...) under
+        # the cell for (x, y). Returns whether it changed cells.
+        key: tuple[int, int] = (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+        if index == len(self._keys):
+            self._keys.append(key)
+            self._cells.setdefault(key, []).append(index)
+            return True
+        old: tuple[int, int] = self._keys[index]
+        if key == old:
+            return False
+        members: list[int] = self._cells[old]
+        members.remove(index)
+        if not members:
+            del self._cells[old]
+        self._cells.setdefault(key, []).append(index)
+        self._keys[index] = key
+        return True
+
+    def pairs(self) -> list[tuple[int, int]]:
+        # Every pair of items in the same or adjacent cells, once each
+        found: list[tuple[int, int]] = []
+        cells: dict[tuple[int, int], list[int]] = self._cells
+        for (cell_x, cell_y), members in cells.items():
+            count: int = len(members)
+            for i in range(count):
+                first: int = members[i]
+                for j in range(i + 1, count):
+                    found.append((first, members[j]))
+            for offset_x, offset_y in self.FORWARD:
+                others: list[int] | None = cells.get((cell_x + offset_x, cell_y + offset_y))
+                if others is None:
+                    continue
+                for first in members:
+                    for second in others:
+                        found.append((first, second))
+        return found
+
+    def clear(self) -> None:
+        self._cells = {}
+        self._keys = []
+
+
+def grid_pairs(x: np.ndarray, y: np.ndarray, cell_size: float) -> tuple[np.ndarray, np.ndarray]:
+    # `SpatialHash.pairs()` in one vectorized pass, for points in arrays:
+    # index arrays `(first, second)` of every pair in the same or adjacent
+    # cells, once each. Nothing is kept between calls.
+    count: int = len(x)
+    cell_x: np.ndarray = np.floor(x / cell_size).astype(np.int64)
+    cell_y: np.ndarray = np.floor(y / cell_size).astype(np.int64)
+    cell_y -= cell_y.min(initial=0) - 1
+    # Room for a row either side, so neighbors never wrap into another column
+    rows: int = int(cell_y.max(initial=0)) + 2
+    keys: np.ndarray = cell_x * rows + cell_y
+    order: np.ndarray = np.argsort(keys, kind='stable')
+    sorted_keys: np.ndarray = keys[order]
+    firsts: list[np.ndarray] = []
+    seconds: list[np.ndarray] = []
+    for offset_x, offset_y in ((0, 0),) + SpatialHash.FORWARD:
+        target: np.ndarray = keys + (offset_x * rows + offset_y)
+        start: np.ndarray = np.searchsorted(sorted_keys, target, side='left')
+        counts: np.ndarray = np.searchsorted(sorted_keys, target, side='right') - start
+        total: int = int(counts.sum())
+        first: np.ndarray = np.repeat(np.arange(count), counts)
+        # Position of each match within its cell's run of `order`
+        within: np.ndarray = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        second: np.ndarray = order[np.repeat(start, counts) + within]
+        if offset_x == 0 and offset_y == 0:
+            keep: np.ndarray = first < second
+            first, second = first[keep], second[keep]
+        firsts.append(first)
+        seconds.append(second)
+    return np.concatenate(firsts), np.concatenate(seconds)
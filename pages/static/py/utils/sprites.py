@@ -0,0 +1,86 @@
+# Pre-rendered circle sprites for the p5.js sketches.
+#
+# `p5.ellipse()` builds and fills a fresh path every call, however many
+# times the same circle has been drawn before. `SpriteCache` draws each
+# circle once, into an offscreen `p5.Graphics`, and after that drawing it is
+# one `image()` blit. Diameters are rounded up to the nearest `bucket` px, so
+# one sprite serves every circle in its bucket, scaled down by a pixel or
+# two at most; the cache keeps at most `max_sprites`, dropping (and freeing)
+# the least recently used when a new one is needed.
+#
+#     _SPRITES = sprites.SpriteCache(p5js, fill=(255, 204))
+#
+#     def draw(*args):
+#         for ball in balls:
+#             _SPRITES.draw(ball.x, ball.y, ball.diameter)
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import math
+
+from typing import Any
+
+
+class SpriteCache():
+    MAX_SPRITES = 64
+
+    def __init__(self, p5: Any, fill: tuple[float, ...] = (255,), bucket: float = 2.0,
+                 max_sprites: int = MAX_SPRITES) -> None:
+        # `fill` is the circles' `p5.fill()` arguments; they're drawn without
+        # a stroke
+        self._p5: Any = p5
+        self._fill: tuple[float, ...] = fill
+        self.bucket: float = bucket
+        self.max_sprites: int = max_sprites
+        # Bucket -> (sprite, the diameter of its circle, its width), least
+        # recently used first
+        self._sprites: collections.OrderedDict[int, tuple[Any, float, int]] = (
+            collections.OrderedDict())
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    def __len__(self) -> int:
+        return len(self._sprites)
+
+    def draw(self, x: float, y: float, diameter: float) -> None:
+        # `p5.ellipse(x, y, diameter, diameter)`, as a blit
+        sprite, size, side = self._sprite(diameter)
+        scaled: float = side * diameter / size
+        self._p5.image(sprite, x - scaled / 2, y - scaled / 2, scaled, scaled)
+
+    def clear(self) -> None:
+        for sprite, _, _ in self._sprites.values():
+            sprite.remove()
+        self._sprites.clear()
+
+    def _sprite(self, diameter: float) -> tuple[Any, float, int]:
+        key: int = max(1, math.ceil(diameter / self.bucket))
+        found: tuple[Any, float, int] | None = self._sprites.get(key)
+        if found is not None:
+            self.hits += 1
+            self._sprites.move_to_end(key)
+            return found
+        self.misses += 1
+        if len(self._sprites) >= self.max_sprites:
+            self._sprites.popitem(last=False)[1][0].remove()
+            self.evictions += 1
+        size: float = key * self.bucket
+        # A pixel of margin all round, for the antialiased edge
+        side: int = math.ceil(size) + 2
+        sprite: Any = self._p5.createGraphics(side, side)
+        sprite.noStroke()
+        sprite.fill(*self._fill)
+        sprite.ellipse(side / 2, side / 2, size, size)
+        self._sprites[key] = (sprite, size, side)
+        return sprite, size, side
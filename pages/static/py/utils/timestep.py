@@ -0,0 +1,98 @@
+# Fixed-timestep simulation, decoupled from the display's refresh rate.
+#
+# A sketch that integrates (`x += vx`) once per animation frame runs twice as
+# fast, and does twice the work, on a 120 Hz display as on a 60 Hz one.
+# `FixedTimestep` turns wall-clock time into whole simulation steps of `dt`
+# seconds at `sim_hz`, whatever the frame rate, and says how far the current
+# time is between the last two steps (`alpha`) so drawing can interpolate
+# instead of stuttering. Rendering can be capped separately with `render_hz`.
+#
+#     _TIMESTEP = timestep.FixedTimestep.from_query()
+#
+#     def draw(*args):
+#         if not _TIMESTEP.frame(js.performance.now()):
+#             return
+#         for _ in range(_TIMESTEP.steps):
+#             simulate(_TIMESTEP.dt)
+#         render(_TIMESTEP.alpha)
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any
+
+import utils
+
+
+class FixedTimestep():
+    # After a long stall (hidden tab, breakpoint) don't try to catch up more
+    # than this many steps in one frame; the rest of the gap is dropped
+    MAX_STEPS = 8
+
+    def __init__(self, sim_hz: float = 60.0, render_hz: float | None = None,
+                 max_steps: int = MAX_STEPS) -> None:
+        self.sim_hz: float = sim_hz
+        # Seconds per simulation step
+        self.dt: float = 1 / sim_hz
+        self.render_hz: float | None = render_hz
+        self.max_steps: int = max_steps
+        # Simulation steps to run this frame
+        self.steps: int = 0
+        # Where this frame falls between the previous step and the latest, in
+        # [0, 1): draw `previous + (latest - previous) * alpha`
+        self.alpha: float = 0.0
+        # Simulated seconds so far, up to the latest step
+        self.time: float = 0.0
+        self._accumulator: float = 0.0
+        self._last_ms: float | None = None
+        self._last_render_ms: float | None = None
+
+    @staticmethod
+    def from_query(sim_hz: float = 60.0, **kwargs: Any) -> 'FixedTimestep':
+        # `?sim_hz=N` sets the simulation rate, `?render_hz=N` caps the frame rate
+        sim: str = utils.query_param('sim_hz')
+        render: str = utils.query_param('render_hz')
+        if render:
+            kwargs['render_hz'] = float(render)
+        return FixedTimestep(float(sim) if sim else sim_hz, **kwargs)
+
+    def frame(self, now_ms: float) -> bool:
+        # Call once per animation frame with the current time. Returns whether
+        # to simulate and render this frame (`False` when capped by
+        # `render_hz`), after setting `steps` and `alpha`.
+        self.steps = 0
+        if self._last_ms is None:
+            self._last_ms = self._last_render_ms = now_ms
+            return True
+        if self.render_hz is not None and self._last_render_ms is not None:
+            # A few ms of slack, so a 60 Hz cap on a 60 Hz display
+            # doesn't drop every other frame to timer jitter
+            if now_ms - self._last_render_ms < 1000 / self.render_hz - 4.0:
+                return False
+        self._last_render_ms = now_ms
+        self._accumulator += (now_ms - self._last_ms) / 1000
+        self._last_ms = now_ms
+        steps: int = int(self._accumulator / self.dt)
+        if steps > self.max_steps:
+            self._accumulator -= (steps - self.max_steps) * self.dt
+            steps = self.max_steps
+        self._accumulator -= steps * self.dt
+        self.steps = steps
+        self.time += steps * self.dt
+        self.alpha = self._accumulator / self.dt
+        return True
+
+    def skip(self, now_ms: float) -> None:
+        # Drop the time since the last frame, as if none had passed: after a
+        # pause, so the next `frame()` doesn't try to catch up
+        self.steps = 0
+        if self._last_ms is not None:
+            self._last_ms = self._last_render_ms = now_ms
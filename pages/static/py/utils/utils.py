@@ -15,6 +15,13 @@ def avoid_zero(range_: float, tolerance: float) -> float:
     return attempt
 
 
+def seconds_since(start_ms: float) -> float:
+    # Time since `start_ms` (a `performance.now()` timestamp), in seconds.
+    # The sketches' speeds are per second, so they move at the same rate
+    # whatever the display's refresh rate, and skip ahead when frames drop.
+    return (js.performance.now() - start_ms) / 1000
+
+
 # Linear mapping from range [from_start, from_end] to range [to_start, to_end]
 def map_linear(to_map: float,
                from_start: float, from_end: float,
@@ -31,6 +38,12 @@ def platform_request_animation_frame() -> Any:
             js.window.webkitRequestAnimationFrame)
 
 
+def query_param(name: str, default: str = '') -> str:
+    # Value of `name` in the page's query string (`?name=value`), or `default`
+    value: str | None = js.URLSearchParams.new(js.window.location.search).get(name)
+    return default if value is None else value
+
+
 # Random float from [low, high] interval
 def rand_float(start: float, end: float) -> float:
     """Implementation as found in three.js
@@ -40,14 +53,17 @@ def rand_float(start: float, end: float) -> float:
 
 
 def renderer_config(renderer: Any, width: int,
-                    height: int, clear_color: int=0x000000) -> Any:
+                    height: int, clear_color: int=0x000000,
+                    antialias: bool = True,
+                    pixel_ratio: float | None = None) -> Any:
+    # `pixel_ratio` defaults to the device's; see also `quality.QualityGovernor`
     renderer = renderer.new(
         powerPreference='high-performance',
-        antialias=True,
+        antialias=antialias,
         stencil=False,
         depth=True
     )
-    renderer.setPixelRatio(js.window.devicePixelRatio)
+    renderer.setPixelRatio(js.window.devicePixelRatio if pixel_ratio is None else pixel_ratio)
     renderer.setSize(width, height)
     renderer.setClearColor(clear_color, 1.0)
     return renderer
@@ -0,0 +1,248 @@
+# Running a simulation in a Web Worker, and drawing it on the page.
+#
+# The worker (its own pyodide, see e.g. bouncy-bubbles' physics_worker.js)
+# runs a `SimulationHost`, which steps the simulation on a fixed timestep and
+# publishes snapshots of it; the page's `SimulationClient` keeps only the
+# newest one, and the sketch draws that. The two sides only talk in messages:
+#
+#   page -> worker  {type: 'start', state: Float32Array, ...}  the initial state, and
+#                                                              whatever else `create` needs
+#                   {type: 'return', values: Float32Array}     a snapshot buffer, back
+#                   {type: 'pause'}, {type: 'resume'}          stop and restart stepping,
+#                                                              e.g. while the tab is hidden
+#                   {type: 'stop'}
+#   worker -> page  {type: 'snapshot', step, time, awake, values: Float32Array}
+#
+# Snapshots are double-buffered: the host owns two typed arrays and
+# *transfers* (rather than copies) one to the page with each snapshot. The
+# client hands each one back once a newer one has arrived, or once it's been
+# read. With neither free, the host keeps simulating but skips publishing,
+# so a slow page never queues up stale snapshots. While paused, the host
+# neither steps nor keeps a timer; on resuming it carries on from where it
+# stopped, rather than catching up on the time in between.
+#
+# A simulation is any object with `step(dt)`, `snapshot_length`,
+# `write_snapshot(out)` (into a float32 array of that length) and
+# `awake_count`, how many of its bodies it's still stepping.
+#
+# Headless, `js.Worker` runs the worker's Python in a thread (see
+# tools/headless/js), so the protocol can be exercised without a browser.
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any, Callable
+
+import numpy as np
+
+import js
+from pyodide import ffi
+
+import timestep
+
+START = 'start'
+RETURN = 'return'
+PAUSE = 'pause'
+RESUME = 'resume'
+STOP = 'stop'
+SNAPSHOT = 'snapshot'
+
+
+def post(target: Any, message: dict[str, Any], transfer: list[Any] | None = None) -> None:
+    # `target.postMessage()` with `message` as a plain JS object, moving the
+    # typed arrays in `transfer` instead of copying them
+    target.postMessage(ffi.to_js(message, dict_converter=js.Object.fromEntries),
+                       ffi.to_js([array.buffer for array in transfer or []]))
+
+
+def typed_array(values: np.ndarray) -> Any:
+    # A JS Float32Array holding a copy of `values`
+    array: Any = js.Float32Array.new(len(values))
+    array.assign(values.astype(np.float32, copy=False))
+    return array
+
+
+class SimulationHost():
+    # The worker's end. `create` builds the simulation from the 'start'
+    # message's data (`data.state`, plus anything else the page sent);
+    # `data.sim_hz` sets the rate it's stepped at.
+    BUFFERS = 2
+
+    def __init__(self, scope: Any, create: Callable[[Any], Any]) -> None:
+        # `scope` is the worker's global scope (`js`, in the worker)
+        self._scope: Any = scope
+        self._create: Callable[[Any], Any] = create
+        self.simulation: Any = None
+        self._timestep: timestep.FixedTimestep | None = None
+        # Buffers the page doesn't hold
+        self._free: list[Any] = []
+        # `write_snapshot()`'s output, copied into a free buffer to publish
+        self._values: np.ndarray = np.zeros(0, dtype=np.float32)
+        self._handle: Any = None
+        self.paused: bool = False
+        # Steps simulated, snapshots published, and ones skipped for want
+        # of a free buffer
+        self.steps: int = 0
+        self.published: int = 0
+        self.skipped: int = 0
+        self._proxies: dict[str, ffi.JsProxy] = {
+            'message': ffi.create_proxy(self._handle_message),
+            'tick': ffi.create_proxy(self._tick),
+        }
+        scope.addEventListener('message', self._proxies['message'])
+
+    def _handle_message(self, event: Any) -> None:
+        data: Any = event.data
+        if data.type == START:
+            self._start(data)
+        elif data.type == RETURN:
+            self._free.append(data.values)
+        elif data.type == PAUSE:
+            self._pause()
+        elif data.type == RESUME:
+            self._resume()
+        elif data.type == STOP:
+            self._stop()
+
+    def _start(self, data: Any) -> None:
+        self.simulation = self._create(data)
+        self._timestep = timestep.FixedTimestep(data.sim_hz)
+        length: int = self.simulation.snapshot_length
+        self._values = np.zeros(length, dtype=np.float32)
+        self._free = [js.Float32Array.new(length) for _ in range(self.BUFFERS)]
+        self._timestep.frame(self._scope.performance.now())
+        self._publish()
+        if not self.paused:
+            self._schedule()
+
+    def _tick(self, *args: Any) -> None:
+        self._handle = None
+        if self._timestep is None or self.paused:
+            return
+        self._timestep.frame(self._scope.performance.now())
+        for _ in range(self._timestep.steps):
+            self.simulation.step(self._timestep.dt)
+        self.steps += self._timestep.steps
+        if self._timestep.steps:
+            self._publish()
+        self._schedule()
+
+    def _publish(self) -> None:
+        if not self._free:
+            self.skipped += 1
+            return
+        values: Any = self._free.pop()
+        self.simulation.write_snapshot(self._values)
+        values.assign(self._values)
+        post(self._scope, {'type': SNAPSHOT, 'step': self.steps, 'time': self._timestep.time,
+                           'awake': self.simulation.awake_count, 'values': values}, [values])
+        self.published += 1
+
+    def _schedule(self) -> None:
+        self._handle = self._scope.setTimeout(self._proxies['tick'], 1000 * self._timestep.dt)
+
+    def _pause(self) -> None:
+        self.paused = True
+        self._cancel()
+
+    def _resume(self) -> None:
+        if not self.paused:
+            return
+        self.paused = False
+        if self._timestep is not None:
+            self._timestep.skip(self._scope.performance.now())
+            self._schedule()
+
+    def _cancel(self) -> None:
+        if self._handle is not None:
+            self._scope.clearTimeout(self._handle)
+            self._handle = None
+
+    def _stop(self) -> None:
+        self._cancel()
+        self._timestep = None
+        self._scope.removeEventListener('message', self._proxies['message'])
+        for proxy in self._proxies.values():
+            proxy.destroy()
+        self._proxies = {}
+        self._scope.close()
+
+
+class SimulationClient():
+    # The page's end. `values` holds the newest snapshot read so far: until
+    # the first arrives, whatever it was created with, whose length every
+    # snapshot must have.
+    def __init__(self, worker: Any, values: np.ndarray) -> None:
+        self.worker: Any = worker
+        self.values: np.ndarray = values.astype(np.float32)
+        # The simulation step and time `values` is as of, and the
+        # simulation's `awake_count` then (0 until the first snapshot)
+        self.step: int = -1
+        self.time: float = 0.0
+        self.awake_count: int = 0
+        # Snapshots received, and ones superseded before they were read
+        self.received: int = 0
+        self.dropped: int = 0
+        # The newest snapshot, not yet read into `values`
+        self._pending: Any = None
+        self._pending_step: int = -1
+        self._pending_time: float = 0.0
+        self._pending_awake: int = 0
+        self._proxy: ffi.JsProxy = ffi.create_proxy(self._handle_message)
+        worker.addEventListener('message', self._proxy)
+
+    def start(self, state: np.ndarray, **params: Any) -> None:
+        # Send the initial state (moved, not copied) and `params` to the
+        # worker's `create`
+        array: Any = typed_array(state)
+        post(self.worker, {'type': START, 'state': array, **params}, [array])
+
+    def latest(self) -> bool:
+        # Copy the newest snapshot into `values` and give its buffer back to
+        # the worker; returns whether there was one since the last call.
+        if self._pending is None:
+            return False
+        self._pending.assign_to(self.values)
+        self.step = self._pending_step
+        self.time = self._pending_time
+        self.awake_count = self._pending_awake
+        self._give_back(self._pending)
+        self._pending = None
+        return True
+
+    def pause(self) -> None:
+        # Stop the worker stepping, until `resume()`
+        post(self.worker, {'type': PAUSE})
+
+    def resume(self) -> None:
+        post(self.worker, {'type': RESUME})
+
+    def destroy(self) -> None:
+        post(self.worker, {'type': STOP})
+        self.worker.removeEventListener('message', self._proxy)
+        self._proxy.destroy()
+        self.worker.terminate()
+
+    def _handle_message(self, event: Any) -> None:
+        data: Any = event.data
+        if data.type != SNAPSHOT:
+            return
+        self.received += 1
+        if self._pending is not None:
+            self.dropped += 1
+            self._give_back(self._pending)
+        self._pending = data.values
+        self._pending_step = data.step
+        self._pending_time = data.time
+        self._pending_awake = data.awake
+
+    def _give_back(self, values: Any) -> None:
+        post(self.worker, {'type': RETURN, 'values': values}, [values])
@@ -0,0 +1,284 @@
+# Incremental thumbnail builder for the Stable-Diffusion gallery.
+#
+# Reads the gallery's gallery.json, and brings its images_data.json and
+# thumbnails up to date with its photos:
+# - a photo whose mtime is the one recorded, and whose thumbnail exists at
+#   the gallery's `thumbnail_height`, is left alone, unread
+# - a photo with a new mtime but the content hash recorded is only
+#   re-stamped with its mtime (a fresh checkout touches every file). So is
+#   one with no hash recorded yet, if its thumbnail is the size its
+#   recorded size gives: its hash is recorded then, and checked from the
+#   next run on
+# - anything else (a new photo, new content, a missing thumbnail) gets its
+#   thumbnail rebuilt, in a pool of processes, and its entry rewritten
+# - entries for photos that are gone are dropped
+# images_data.json is rewritten atomically, and only if something changed;
+# its paths stay as they are stored, with Windows' backslashes.
+#
+#   python tools/gallery_thumbnails.py
+#   python tools/gallery_thumbnails.py --dry-run
+#   python tools/gallery_thumbnails.py --force --jobs 8
+#
+# Rebuilding thumbnails needs Pillow (`pip install Pillow`); checking them
+# doesn't.
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import concurrent.futures
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import pathlib
+import tempfile
+import time
+
+from typing import Any
+
+ROOT: pathlib.Path = pathlib.Path(__file__).resolve().parent.parent
+GALLERY: pathlib.Path = ROOT / 'pages' / 'stable-diffusion-gallery'
+
+PHOTO_SUFFIXES: frozenset[str] = frozenset({'.png', '.jpg', '.jpeg', '.gif', '.webp'})
+# The entry's record of its photo's content, next to its `mtime`
+HASH_KEY = 'sha256'
+# Thumbnails are drawn at `thumbnail_height` but stored at twice that, for
+# high-density displays; `thumbnail_size` is the size they're drawn at
+THUMBNAIL_SCALE = 2
+
+
+def native(stored: str) -> pathlib.Path:
+    # A path as gallery.json and images_data.json store them, '.\\public\\images',
+    # as one for this OS
+    return pathlib.Path(*pathlib.PureWindowsPath(stored).parts)
+
+
+def stored(path: pathlib.PurePath) -> str:
+    return str(pathlib.PureWindowsPath(path))
+
+
+def digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def jpeg_size(path: pathlib.Path) -> list[int] | None:
+    # A JPEG's [width, height], from its frame header, without Pillow; None
+    # if it isn't a readable JPEG
+    data: bytes = path.read_bytes()
+    if data[:2] != b'\xff\xd8':
+        return None
+    at: int = 2
+    while at + 9 <= len(data):
+        if data[at] != 0xFF:
+            return None
+        marker: int = data[at + 1]
+        length: int = int.from_bytes(data[at + 2:at + 4], 'big')
+        # SOF0-SOF15, less DHT, JPG and DAC, which share the range
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            return [int.from_bytes(data[at + 7:at + 9], 'big'),
+                    int.from_bytes(data[at + 5:at + 7], 'big')]
+        at += 2 + length
+    return None
+
+
+def thumbnail_sizes(size: list[int], height: int) -> tuple[list[int], list[int]]:
+    # The [width, height] a photo of `size` is drawn at, and its thumbnail's
+    drawn: list[int] = [max(1, int(size[0] * height / size[1])), height]
+    stored_height: int = height * THUMBNAIL_SCALE
+    return drawn, [max(1, round(size[0] * stored_height / size[1])), stored_height]
+
+
+def make_thumbnail(source: str, target: str, height: int) -> tuple[list[int], list[int], str]:
+    # In a pool process: writes `source`'s thumbnail, for `height` px high,
+    # to `target`, and returns the photo's size, the size the thumbnail's
+    # drawn at, and the photo's hash
+    from PIL import Image
+
+    data: bytes = pathlib.Path(source).read_bytes()
+    with Image.open(io.BytesIO(data)) as image:
+        size: list[int] = list(image.size)
+        drawn, stored_size = thumbnail_sizes(size, height)
+        thumbnail: Any = image.convert('RGB').resize(tuple(stored_size), Image.LANCZOS)
+    # Never a half-written thumbnail, even if this is interrupted
+    partial: pathlib.Path = pathlib.Path(target + '.partial')
+    thumbnail.save(partial, 'JPEG')
+    os.replace(partial, target)
+    return size, drawn, digest(data)
+
+
+class Gallery():
+    def __init__(self, directory: pathlib.Path) -> None:
+        self.directory: pathlib.Path = directory
+        config: dict[str, Any] = json.loads((directory / 'gallery.json').read_text())
+        self.data_file: pathlib.Path = directory / native(config['images_data_file'])
+        self.public: pathlib.Path = directory / native(config['public_path'])
+        self.photos: pathlib.Path = directory / native(config['images_path'])
+        self.thumbnails: pathlib.Path = directory / native(config['thumbnails_path'])
+        self.height: int = config['thumbnail_height']
+        self.text: str = self.data_file.read_text() if self.data_file.exists() else '{}'
+        self.data: dict[str, dict[str, Any]] = json.loads(self.text)
+        # Photo name -> content hash, for the ones `plan()` re-stamps
+        self._hashes: dict[str, str] = {}
+
+    def photo_names(self) -> list[str]:
+        return sorted(path.name for path in self.photos.iterdir()
+                      if path.is_file() and path.suffix.lower() in PHOTO_SUFFIXES)
+
+    def thumbnail_of(self, name: str) -> pathlib.Path:
+        return self.thumbnails / (pathlib.Path(name).stem + '.jpg')
+
+    def entry(self, name: str) -> dict[str, Any]:
+        # A new photo's entry, as the gallery's others, to be filled in
+        return {
+            'src': stored((self.photos / name).relative_to(self.public)),
+            'mtime': 0.0,
+            'date': '',
+            'size': [0, 0],
+            'type': 'image',
+            'description': '',
+            'thumbnail': stored(self.thumbnail_of(name).relative_to(self.public)),
+            'thumbnail_size': [0, 0],
+        }
+
+    def plan(self, force: bool = False) -> dict[str, list[str]]:
+        # Photo names by what they need: nothing, a new mtime, a new
+        # thumbnail; and the names of entries whose photos are gone
+        plan: dict[str, list[str]] = {'current': [], 'touched': [], 'rebuild': [],
+                                      'removed': []}
+        names: list[str] = self.photo_names()
+        for name in names:
+            entry: dict[str, Any] | None = self.data.get(name)
+            thumbnail: pathlib.Path = self.thumbnail_of(name)
+            if (force or entry is None or not thumbnail.exists()
+                    or entry.get('thumbnail_size', [0, 0])[1] != self.height):
+                plan['rebuild'].append(name)
+                continue
+            if entry.get('mtime') == (self.photos / name).stat().st_mtime:
+                plan['current'].append(name)
+                continue
+            photo_hash: str = digest((self.photos / name).read_bytes())
+            recorded: str | None = entry.get(HASH_KEY)
+            if recorded == photo_hash or (recorded is None and self._fits(entry, thumbnail)):
+                plan['touched'].append(name)
+                self._hashes[name] = photo_hash
+            else:
+                plan['rebuild'].append(name)
+        present: set[str] = set(names)
+        plan['removed'] = [name for name in self.data if name not in present]
+        return plan
+
+    def _fits(self, entry: dict[str, Any], thumbnail: pathlib.Path) -> bool:
+        # Whether `thumbnail` is the one `entry`'s photo would get
+        drawn, stored_size = thumbnail_sizes(entry['size'], self.height)
+        return entry.get('thumbnail_size') == drawn and jpeg_size(thumbnail) == stored_size
+
+    def build(self, plan: dict[str, list[str]], jobs: int | None = None) -> None:
+        for name in plan['touched']:
+            self.data[name]['mtime'] = (self.photos / name).stat().st_mtime
+            self.data[name][HASH_KEY] = self._hashes[name]
+        for name in plan['removed']:
+            del self.data[name]
+        if plan['rebuild']:
+            if importlib.util.find_spec('PIL') is None:
+                raise SystemExit(f"rebuilding {len(plan['rebuild'])} thumbnails needs Pillow: "
+                                 'pip install Pillow')
+            known: set[str] = set(self.data)
+            self.thumbnails.mkdir(parents=True, exist_ok=True)
+            with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+                futures: dict[concurrent.futures.Future, str] = {
+                    pool.submit(make_thumbnail, str(self.photos / name),
+                                str(self.thumbnail_of(name)), self.height): name
+                    for name in plan['rebuild']}
+                for future in concurrent.futures.as_completed(futures):
+                    name: str = futures[future]
+                    size, thumbnail_size, photo_hash = future.result()
+                    entry: dict[str, Any] = self.data.setdefault(name, self.entry(name))
+                    entry['mtime'] = (self.photos / name).stat().st_mtime
+                    entry['size'] = size
+                    entry['thumbnail_size'] = thumbnail_size
+                    entry[HASH_KEY] = photo_hash
+            # New photos after the others, in name order, whatever order
+            # they finished in
+            added: list[str] = sorted(name for name in plan['rebuild'] if name not in known)
+            for name in added:
+                self.data[name] = self.data.pop(name)
+
+    def save(self) -> bool:
+        # Rewrites images_data.json if it changed: a new file next to it,
+        # then moved over it, so readers see the old one or the new one
+        text: str = json.dumps(self.data, indent=4)
+        if text == self.text:
+            return False
+        with tempfile.NamedTemporaryFile('w', dir=self.data_file.parent, prefix='.images_data.',
+                                         suffix='.tmp', delete=False) as out:
+            out.write(text)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(out.name, self.data_file)
+        self.text = text
+        return True
+
+
+def run(directory: pathlib.Path, jobs: int | None = None, force: bool = False,
+        dry_run: bool = False) -> dict[str, Any]:
+    start: float = time.perf_counter()
+    gallery: Gallery = Gallery(directory)
+    plan: dict[str, list[str]] = gallery.plan(force)
+    saved: bool = False
+    if not dry_run:
+        gallery.build(plan, jobs)
+        saved = gallery.save()
+    return {
+        'gallery': str(directory.relative_to(ROOT)) if directory.is_relative_to(ROOT)
+        else str(directory),
+        **{key: len(names) for key, names in plan.items()},
+        'rebuilt': plan['rebuild'] if dry_run else [],
+        'saved': saved,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def report(result: dict[str, Any], dry_run: bool) -> str:
+    verb: str = 'to rebuild' if dry_run else 'rebuilt'
+    rows: list[str] = [
+        f"{result['gallery']}: {result['current']} up to date, {result['touched']} re-stamped, "
+        f"{result['rebuild']} {verb}, {result['removed']} removed "
+        f"({result['seconds']:.2f} s)",
+    ]
+    rows.extend(f'  {name}' for name in result['rebuilt'])
+    if result['saved']:
+        rows.append('wrote images_data.json')
+    return '\n'.join(rows)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Rebuild the gallery's out-of-date thumbnails and images_data.json.")
+    parser.add_argument('--gallery', type=pathlib.Path, default=GALLERY,
+                        help='the gallery, with gallery.json (default: the Stable-Diffusion one)')
+    parser.add_argument('--jobs', type=int, help='processes to use (default: one per CPU)')
+    parser.add_argument('--force', action='store_true', help='rebuild every thumbnail')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='only report what would be done')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args: argparse.Namespace = parser.parse_args(argv)
+
+    result: dict[str, Any] = run(args.gallery.resolve(), args.jobs, args.force, args.dry_run)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(report(result, args.dry_run))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+# Headless benchmark for the pyscript sketches.
+#
+# Runs each sketch under plain CPython against the stand-in `js`, `js.three`
+# and `pyodide.ffi` modules next to this file, ticks its animation loop for a
+# number of (virtual, 60 fps) frames, and reports what a frame costs on the
+# Python side: time, FFI crossings, JS allocations and draw calls, in total
+# and per object. Python time excludes the time spent in the stand-ins.
+#
+#   python tools/headless/bench.py
+#   python tools/headless/bench.py --sketch orbitingcubes --param instanced=1 --frames 600
+#   python tools/headless/bench.py --json > before.json
+#
+# Timings are CPython's, not pyodide's (expect pyodide to be a few times
+# slower), and the stand-ins only approximate the browser: compare runs
+# against each other, not against the browser.
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import importlib.util
+import json
+import pathlib
+import random
+import statistics
+import sys
+import time
+import urllib.parse
+
+from types import ModuleType
+from typing import Any, Callable
+
+HERE: pathlib.Path = pathlib.Path(__file__).resolve().parent
+PAGES: pathlib.Path = HERE.parent.parent / 'pages'
+UTILS: pathlib.Path = PAGES / 'static' / 'py' / 'utils'
+
+# The stand-ins shadow nothing real (there's no `js` module outside pyodide),
+# and the sketches import static/py/utils modules as top-level modules
+sys.path[:0] = [str(HERE), str(UTILS)]
+
+import js  # noqa: E402
+from js._base import STATS  # noqa: E402
+
+FRAME_MS: float = 1000 / 60
+
+
+class Sketch():
+    def __init__(self, name: str, path: str, objects: Callable[[ModuleType], int]) -> None:
+        self.name: str = name
+        self.path: pathlib.Path = PAGES / path
+        # How many things the sketch animates, for the per-object figures
+        self.objects: Callable[[ModuleType], int] = objects
+
+
+SKETCHES: dict[str, Sketch] = {sketch.name: sketch for sketch in (
+    Sketch('orbitingcubes', 'orbitingcubes-pyscript-threejs/orbitingcubes.py',
+           lambda module: module._ENGINE.count),
+    Sketch('orbitingwhiskers', 'orbitingwhiskers-pyscript-threejs/orbitingwhiskers.py',
+           lambda module: module._ENGINE.count),
+    Sketch('orbitingsquares-threejs', 'orbitingsquares-pyscript-threejs/orbitingsquares.py',
+           lambda module: module._ENGINE.count),
+    Sketch('orbitingsquares-p5js', 'orbitingsquares-pyscript-p5js/orbitingsquares.py',
+           lambda module: len(module.SQUARES)),
+    Sketch('boxclock', 'boxclock-pyscript-threejs/boxclock.py',
+           lambda module: len(module._DATA)),
+    Sketch('bouncy_bubbles', 'bouncy-bubbles-pyscript-p5js/bouncy_bubbles.py',
+           lambda module: len(module.BALLS)),
+)}
+
+
+def load(sketch: Sketch, search: str, seed: int) -> ModuleType:
+    # Import `sketch` into a fresh browser; importing runs its setup. Its
+    # directory is importable too, for modules it shares with a worker.
+    directory: pathlib.Path = sketch.path.parent
+    for name in [name for name, module in sys.modules.items()
+                 if name == sketch.name or _is_util(module) or _is_in(module, directory)]:
+        del sys.modules[name]
+    js.reset(search=search, seed=seed)
+    js.Worker._root = directory
+    if str(directory) not in sys.path:
+        sys.path.insert(0, str(directory))
+    random.seed(seed)
+    spec: Any = importlib.util.spec_from_file_location(sketch.name, sketch.path)
+    module: ModuleType = importlib.util.module_from_spec(spec)
+    sys.modules[sketch.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _is_util(module: ModuleType | None) -> bool:
+    return _is_in(module, UTILS)
+
+
+def _is_in(module: ModuleType | None, directory: pathlib.Path) -> bool:
+    path: str | None = getattr(module, '__file__', None)
+    return path is not None and pathlib.Path(path).parent == directory
+
+
+def run(sketch: Sketch, frames: int, search: str = '', seed: int = 0) -> dict[str, Any]:
+    start: float = time.perf_counter()
+    module: ModuleType = load(sketch, search, seed)
+    setup: dict[str, Any] = STATS.snapshot()
+    setup_ms: float = (time.perf_counter() - start - setup['js_seconds']) * 1000
+
+    STATS.reset()
+    frame_ms: list[float] = []
+    for _ in range(frames):
+        js_before: float = STATS.js_seconds
+        start = time.perf_counter()
+        if js.tick(FRAME_MS) == 0:
+            raise RuntimeError(f'{sketch.name} stopped scheduling frames')
+        frame_ms.append((time.perf_counter() - start - (STATS.js_seconds - js_before)) * 1000)
+    totals: dict[str, Any] = STATS.snapshot()
+    objects: int = sketch.objects(module)
+    per_frame: dict[str, float] = {
+        key: value / frames for key, value in totals.items() if key != 'js_seconds'}
+    return {
+        'sketch': sketch.name,
+        'params': search,
+        'frames': frames,
+        'objects': objects,
+        'setup_ms': setup_ms,
+        'setup': setup,
+        'frame_ms_mean': statistics.fmean(frame_ms),
+        'frame_ms_p95': _percentile(frame_ms, 0.95),
+        'per_frame': per_frame,
+        'per_object': {key: per_frame[key] / max(objects, 1)
+                       for key in ('ffi_calls', 'allocations')},
+        # Proxies that were created and never destroyed: each one leaks
+        'live_proxies': totals['proxies_created'] - totals['proxies_destroyed'],
+    }
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered: list[float] = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def report(results: list[dict[str, Any]]) -> str:
+    header: tuple[str, ...] = ('sketch', 'objs', 'setup ms', 'ms/frame', 'p95',
+                               'FFI/frame', 'FFI/obj', 'alloc/frame', 'alloc/obj',
+                               'proxies/frame', 'draws/frame')
+    rows: list[tuple[str, ...]] = [header]
+    for result in results:
+        name: str = result['sketch'] + result['params']
+        per_frame: dict[str, float] = result['per_frame']
+        rows.append((
+            name,
+            str(result['objects']),
+            f"{result['setup_ms']:.1f}",
+            f"{result['frame_ms_mean']:.3f}",
+            f"{result['frame_ms_p95']:.3f}",
+            f"{per_frame['ffi_calls']:.0f}",
+            f"{result['per_object']['ffi_calls']:.2f}",
+            f"{per_frame['allocations']:.1f}",
+            f"{result['per_object']['allocations']:.2f}",
+            f"{per_frame['proxies_created']:.1f}",
+            f"{per_frame['draw_calls']:.0f}",
+        ))
+    widths: list[int] = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    return '\n'.join(
+        '  '.join(cell.ljust(width) if i == 0 else cell.rjust(width)
+                  for i, (cell, width) in enumerate(zip(row, widths)))
+        for row in rows)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description='Benchmark the pyscript sketches headlessly, under CPython.')
+    parser.add_argument('--sketch', action='append', choices=sorted(SKETCHES),
+                        help='sketch to run (repeatable; default: all of them)')
+    parser.add_argument('--frames', type=int, default=300, help='frames to run (default: 300)')
+    parser.add_argument('--param', action='append', default=[], metavar='KEY=VALUE',
+                        help="query-string parameter for the page, e.g. 'instanced=1'")
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args: argparse.Namespace = parser.parse_args(argv)
+
+    search: str = urllib.parse.urlencode([tuple(param.split('=', 1)) for param in args.param])
+    results: list[dict[str, Any]] = [
+        run(SKETCHES[name], args.frames, f'?{search}' if search else '', args.seed)
+        for name in (args.sketch or SKETCHES)]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(report(results))
+
+
+if __name__ == '__main__':
+    main()
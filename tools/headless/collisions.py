@@ -0,0 +1,128 @@
+# Collision broad-phase benchmark for Bouncy Bubbles.
+#
+# Runs the sketch headlessly (see bench.py) with n bubbles on a canvas grown
+# to keep the demo's density (13 bubbles on 720x400), and reports, per
+# simulation step: the pair tests the old all-against-all loop made (n^2,
+# every pair twice plus every ball against itself), the candidate pairs the
+# spatial hash hands to the narrow phase, how many of those actually
+# overlapped, and the Python time of a step.
+#
+#   python tools/headless/collisions.py
+#   python tools/headless/collisions.py --balls 13 --balls 1000 --balls 10000 --frames 30
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import json
+import math
+import statistics
+import time
+
+from types import ModuleType
+from typing import Any, Callable
+
+import bench
+import js
+
+# The demo's canvas and bubble count, whose density is kept at every n
+BASE_BALLS = 13
+BASE_WIDTH = 720
+BASE_HEIGHT = 400
+
+
+def run(balls: int, frames: int, seed: int = 0) -> dict[str, Any]:
+    scale: float = math.sqrt(balls / BASE_BALLS)
+    search: str = (f'?balls={balls}&width={round(BASE_WIDTH * scale)}'
+                   f'&height={round(BASE_HEIGHT * scale)}')
+    module: ModuleType = bench.load(bench.SKETCHES['bouncy_bubbles'], search, seed)
+    candidates: list[int] = []
+    overlaps: list[int] = []
+    step_ms: list[float] = []
+    # Time spent counting, which is the benchmark's own work, not the step's
+    counting: list[float] = [0.0]
+    pairs: Callable[[], list[tuple[int, int]]] = module.GRID.pairs
+
+    def counted_pairs() -> list[tuple[int, int]]:
+        found: list[tuple[int, int]] = pairs()
+        start: float = time.perf_counter()
+        candidates.append(len(found))
+        overlaps.append(sum(1 for first, second in found
+                            if _overlap(module.BALLS[first], module.BALLS[second])))
+        counting[0] += time.perf_counter() - start
+        return found
+
+    module.GRID.pairs = counted_pairs
+    step: Callable[[float], None] = module.step
+
+    def timed_step(dt: float) -> None:
+        counting[0] = 0.0
+        start: float = time.perf_counter()
+        step(dt)
+        step_ms.append((time.perf_counter() - start - counting[0]) * 1000)
+
+    module.step = timed_step
+    for _ in range(frames):
+        js.tick(bench.FRAME_MS)
+    module.step = step
+    module.GRID.pairs = pairs
+    return {
+        'balls': balls,
+        'steps': len(step_ms),
+        'all_pairs_tests': balls * balls,
+        'candidate_pairs': statistics.fmean(candidates),
+        'overlapping_pairs': statistics.fmean(overlaps),
+        'step_ms': statistics.fmean(step_ms),
+    }
+
+
+def _overlap(first: Any, second: Any) -> bool:
+    return (math.hypot(second.x - first.x, second.y - first.y)
+            < (first.diameter + second.diameter) / 2)
+
+
+def report(results: list[dict[str, Any]]) -> str:
+    header: tuple[str, ...] = ('balls', 'all-pairs tests/step', 'candidates/step',
+                               'overlaps/step', 'ms/step')
+    rows: list[tuple[str, ...]] = [header]
+    for result in results:
+        rows.append((
+            str(result['balls']),
+            f"{result['all_pairs_tests']:,}",
+            f"{result['candidate_pairs']:,.0f}",
+            f"{result['overlapping_pairs']:,.0f}",
+            f"{result['step_ms']:.2f}",
+        ))
+    widths: list[int] = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    return '\n'.join('  '.join(cell.rjust(width) for cell, width in zip(row, widths))
+                     for row in rows)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Benchmark Bouncy Bubbles' collision broad phase headlessly.")
+    parser.add_argument('--balls', action='append', type=int,
+                        help='bubble count (repeatable; default: 13, 1000 and 10000)')
+    parser.add_argument('--frames', type=int, default=60, help='frames to run (default: 60)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args: argparse.Namespace = parser.parse_args(argv)
+
+    results: list[dict[str, Any]] = [run(balls, args.frames, args.seed)
+                                     for balls in (args.balls or [13, 1000, 10000])]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(report(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,639 @@
+# Stand-in for pyodide's `js` module, so the sketches can run under plain
+# CPython: `window` (including the p5.js globals the p5 sketches use), a
+# `document`, `performance`, typed arrays and the few other globals the
+# sketches and static/py/utils touch. See `_base` for what's counted.
+#
+# The browser is just big enough for the sketches in pages/; anything not
+# modelled is `undefined`, and calling it is a counted no-op.
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import heapq
+import importlib.util
+import pathlib
+import queue
+import random as _random
+import threading
+import time
+import urllib.parse
+
+from typing import Any, Callable, Iterable
+
+import numpy as np
+
+from js._base import (
+    CLOCK,
+    FRAMES,
+    STATS,
+    UNDEFINED,
+    JsObject,
+    allocate,
+)
+
+
+class Float32Array(JsObject):
+    # A NumPy float32 array standing in for the JS one. `subarray()` is a
+    # view, as in JS.
+    def __init__(self, source: Any = 0) -> None:
+        super().__init__()
+        if isinstance(source, np.ndarray) and source.dtype == np.float32:
+            self._array: np.ndarray = source
+        elif isinstance(source, Float32Array):
+            self._array = source._array.copy()
+        elif isinstance(source, int):
+            self._array = np.zeros(source, dtype=np.float32)
+        else:
+            self._array = np.array(list(source), dtype=np.float32)
+
+    @property
+    def length(self) -> int:
+        return len(self._array)
+
+    def assign(self, source: Any) -> None:
+        # pyodide's `JsProxy.assign()`: copy from a Python buffer
+        self._array[:] = source
+
+    def subarray(self, start: int, end: int | None = None) -> 'Float32Array':
+        return Float32Array(self._array[start:end])
+
+    def fill(self, value: float) -> 'Float32Array':
+        self._array[:] = value
+        return self
+
+    def assign_to(self, target: Any) -> None:
+        # pyodide's `JsProxy.assign_to()`: copy into a Python buffer
+        target[:] = self._array
+
+    @property
+    def buffer(self) -> 'Float32Array':
+        # Stands in for its `ArrayBuffer`, in transfer lists
+        return self
+
+    def to_py(self) -> np.ndarray:
+        # A copy, as in pyodide
+        return self._array.copy()
+
+    def __len__(self) -> int:
+        return len(self._array)
+
+    def __getitem__(self, index: int) -> float:
+        return float(self._array[index])
+
+
+class Element(JsObject):
+    def __init__(self, tag: str = 'div', **props: Any) -> None:
+        super().__init__(tagName=tag.upper(), style=JsObject(), textContent='', **props)
+        self._children: list[Element] = []
+        self._listeners: dict[str, list[Callable[..., Any]]] = {}
+
+    def appendChild(self, child: 'Element') -> 'Element':
+        self._children.append(child)
+        return child
+
+    def remove(self) -> None:
+        pass
+
+    def replaceWith(self, other: 'Element') -> None:
+        pass
+
+    def setAttribute(self, name: str, value: Any) -> None:
+        self._props[name] = value
+
+    def addEventListener(self, event: str, listener: Callable[..., Any], *args: Any) -> None:
+        self._listeners.setdefault(event, []).append(listener)
+
+    def removeEventListener(self, event: str, listener: Callable[..., Any], *args: Any) -> None:
+        listeners: list[Callable[..., Any]] = self._listeners.get(event, [])
+        if listener in listeners:
+            listeners.remove(listener)
+
+    def getBoundingClientRect(self) -> JsObject:
+        return JsObject(top=0, left=0, bottom=window._get('innerHeight'),
+                        right=window._get('innerWidth'),
+                        width=window._get('innerWidth'), height=window._get('innerHeight'))
+
+    def _dispatch(self, event: str, payload: Any = None) -> None:
+        # Fire `event` as the browser would (JS -> Python, so not counted)
+        for listener in list(self._listeners.get(event, [])):
+            listener(payload if payload is not None else JsObject(type=event))
+
+
+class P5Element(JsObject):
+    # `p5.Element` (what `createCanvas()` returns): wraps a DOM element
+    def __init__(self, element: Element) -> None:
+        super().__init__(elt=element, width=element._get('width'),
+                         height=element._get('height'))
+
+    def style(self, name: str, value: Any = None) -> None:
+        self._get('elt')._get('style')._props[name] = value
+
+    def parent(self, parent: Any) -> None:
+        pass
+
+
+class Graphics(JsObject):
+    # `p5.Graphics` (what `createGraphics()` returns): an offscreen canvas.
+    # Drawing into one costs what drawing on the main canvas does.
+    def __init__(self, width: int, height: int) -> None:
+        super().__init__(width=width, height=height)
+
+    def noStroke(self) -> None:
+        pass
+
+    def fill(self, *args: Any) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    def ellipse(self, *args: float) -> None:
+        STATS.draw_calls += 1
+        STATS.triangles += 25
+
+    def remove(self) -> None:
+        pass
+
+
+class Document(Element):
+    def __init__(self) -> None:
+        super().__init__('#document', body=Element('body'), hidden=False,
+                         visibilityState='visible')
+
+    def createElement(self, tag: str) -> Element:
+        allocate()
+        return Element(tag)
+
+    def getElementById(self, element_id: str) -> Any:
+        return None
+
+
+class IntersectionObserver(JsObject):
+    # Everything's on-screen until a test says otherwise with `_dispatch()`
+    def __init__(self, callback: Callable[..., Any], *args: Any) -> None:
+        super().__init__()
+        self._callback: Callable[..., Any] = callback
+        self._targets: list[Any] = []
+
+    def observe(self, target: Any) -> None:
+        self._targets.append(target)
+
+    def unobserve(self, target: Any) -> None:
+        if target in self._targets:
+            self._targets.remove(target)
+
+    def disconnect(self) -> None:
+        self._targets = []
+
+    def _dispatch(self, is_intersecting: bool) -> None:
+        self._callback([JsObject(target=target, isIntersecting=is_intersecting)
+                        for target in self._targets], self)
+
+
+class Performance(JsObject):
+    def now(self) -> float:
+        return CLOCK.now
+
+
+class _WorkerScope(JsObject):
+    # A `Worker`'s global scope, as its Python sees it. Timers run on the
+    # shared virtual clock.
+    def __init__(self, worker: 'Worker') -> None:
+        super().__init__(performance=performance)
+        self._worker: Worker = worker
+        self._listeners: list[Callable[..., Any]] = []
+        # (due ms, handle, callback), a heap
+        self._timers: list[tuple[float, int, Callable[..., Any]]] = []
+        self._next_handle: int = 1
+
+    def postMessage(self, message: Any, transfer: Any = None) -> None:
+        self._worker._outbox.put(_clone(message, transfer))
+
+    def addEventListener(self, kind: str, listener: Callable[..., Any]) -> None:
+        if kind == 'message':
+            self._listeners.append(listener)
+
+    def removeEventListener(self, kind: str, listener: Callable[..., Any]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def setTimeout(self, callback: Callable[..., Any], ms: float = 0) -> int:
+        handle: int = self._next_handle
+        self._next_handle += 1
+        heapq.heappush(self._timers, (CLOCK.now + ms, handle, callback))
+        return handle
+
+    def clearTimeout(self, handle: int) -> None:
+        self._timers = [timer for timer in self._timers if timer[1] != handle]
+        heapq.heapify(self._timers)
+
+    def close(self) -> None:
+        self._worker._closed = True
+
+    def _run_timers(self) -> None:
+        while self._timers and self._timers[0][0] <= CLOCK.now and not self._worker._closed:
+            heapq.heappop(self._timers)[2]()
+
+
+class Worker(JsObject):
+    # A Web Worker whose script is Python: `Worker.new('name.js')` runs
+    # `main(scope)` from name.py, in `Worker._root` (`bench.load()` points it
+    # at the sketch's directory), on a thread of its own. Messages are
+    # structured-cloned, except that typed arrays in the transfer list move:
+    # the sender's copy is left empty, as a detached one would be. `tick()`
+    # lets every worker catch up with the clock, then delivers what they've
+    # posted, so runs repeat exactly.
+    _root: pathlib.Path | None = None
+    _LIVE: list['Worker'] = []
+
+    def __init__(self, url: str) -> None:
+        super().__init__()
+        path: pathlib.Path = Worker._root / (pathlib.PurePosixPath(url).stem + '.py')
+        # Page -> worker: messages, and `threading.Event`s for `_sync()`
+        self._inbox: queue.Queue[Any] = queue.Queue()
+        # Worker -> page
+        self._outbox: queue.Queue[Any] = queue.Queue()
+        self._listeners: list[Callable[..., Any]] = []
+        self._closed: bool = False
+        self._error: BaseException | None = None
+        self._scope: _WorkerScope = _WorkerScope(self)
+        self._thread: threading.Thread = threading.Thread(
+            target=self._run, args=(path,), name=f'Worker({url})', daemon=True)
+        self._thread.start()
+        Worker._LIVE.append(self)
+
+    def postMessage(self, message: Any, transfer: Any = None) -> None:
+        self._inbox.put(_clone(message, transfer))
+
+    def addEventListener(self, kind: str, listener: Callable[..., Any]) -> None:
+        if kind == 'message':
+            self._listeners.append(listener)
+
+    def removeEventListener(self, kind: str, listener: Callable[..., Any]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def terminate(self) -> None:
+        self._closed = True
+        self._inbox.put(None)
+        self._thread.join()
+        if self in Worker._LIVE:
+            Worker._LIVE.remove(self)
+
+    def _run(self, path: pathlib.Path) -> None:
+        try:
+            spec: Any = importlib.util.spec_from_file_location(path.stem, path)
+            module: Any = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            module.main(self._scope)
+            while not self._closed:
+                try:
+                    item: Any = self._inbox.get(timeout=0.001)
+                except queue.Empty:
+                    item = None
+                if isinstance(item, threading.Event):
+                    self._scope._run_timers()
+                    item.set()
+                elif item is not None:
+                    for listener in list(self._scope._listeners):
+                        listener(JsObject(data=item))
+                self._scope._run_timers()
+        except BaseException as error:
+            self._error = error
+        finally:
+            self._closed = True
+
+    def _sync(self) -> None:
+        # Wait until the worker has handled everything posted to it, and
+        # every timer due by now
+        start: float = time.perf_counter()
+        done: threading.Event = threading.Event()
+        self._inbox.put(done)
+        while not done.wait(0.05):
+            if not self._thread.is_alive():
+                break
+        # The worker's time isn't the page's
+        STATS.js_seconds += time.perf_counter() - start
+        if self._error is not None:
+            raise RuntimeError(f'{self._thread.name} failed') from self._error
+
+    def _deliver(self) -> int:
+        # Catch up, then hand the page what the worker has posted; returns
+        # how many messages that was
+        self._sync()
+        count: int = 0
+        while not self._outbox.empty():
+            event: JsObject = JsObject(data=self._outbox.get())
+            for listener in list(self._listeners):
+                listener(event)
+            count += 1
+        return count
+
+
+def _clone(message: Any, transfer: Any) -> Any:
+    # `postMessage()`'s structured clone, with `transfer`'s typed arrays moved
+    moved: list[Any] = list(transfer or [])
+
+    def clone(value: Any) -> Any:
+        if isinstance(value, Float32Array):
+            if any(value is item for item in moved):
+                array: Float32Array = Float32Array(value._array)
+                value._array = np.zeros(0, dtype=np.float32)
+                return array
+            return Float32Array(value._array.copy())
+        if isinstance(value, dict):
+            return JsObject(**{key: clone(item) for key, item in value.items()})
+        if isinstance(value, list):
+            return [clone(item) for item in value]
+        return value
+    return clone(message)
+
+
+class URLSearchParams(JsObject):
+    def __init__(self, search: str = '') -> None:
+        super().__init__()
+        self._values: dict[str, list[str]] = urllib.parse.parse_qs(search.lstrip('?'))
+
+    def get(self, name: str) -> str | None:
+        # JS `null` comes through as `None`
+        values: list[str] | None = self._values.get(name)
+        return values[0] if values else None
+
+    def has(self, name: str) -> bool:
+        return name in self._values
+
+
+class _Object(JsObject):
+    def fromEntries(self, entries: Iterable[tuple[str, Any]]) -> dict[str, Any]:
+        return dict(entries)
+
+
+class TransformApplier(JsObject):
+    # static/js/bridge.js, in Python
+    def __init__(self, py_array: Any, layout: dict[str, list[int]], rows: int) -> None:
+        super().__init__()
+        self._py_array: Any = py_array
+        self._layout: dict[str, list[int]] = layout
+        self._rows: int = rows
+        self._attributes: list[tuple[str, Any]] = []
+        self._objects: list[tuple[str, list[Any]]] = []
+        self._colors: list[tuple[str, list[Any]]] = []
+
+    def bindAttribute(self, section: str, attribute: Any) -> None:
+        self._attributes.append((section, attribute))
+
+    def bindObjects(self, section: str, objects: list[Any]) -> None:
+        for obj in objects:
+            obj.matrixAutoUpdate = False
+        self._objects.append((section, objects))
+
+    def bindColors(self, section: str, colors: list[Any]) -> None:
+        self._colors.append((section, colors))
+
+    def apply(self, count: int | None = None) -> None:
+        if count is None:
+            count = self._rows
+        data: Float32Array = self._py_array.getBuffer('f32').data
+        array: np.ndarray = data._array
+        for section, attribute in self._attributes:
+            offset, length = self._layout[section]
+            attribute.array = Float32Array(array[offset:offset + length])
+            attribute.updateRange.offset = 0
+            attribute.updateRange.count = count * attribute.itemSize
+            attribute.needsUpdate = True
+        for section, objects in self._objects:
+            offset = self._layout[section][0]
+            for i, obj in enumerate(objects[:count]):
+                obj.matrix.fromArray(data, offset + i * 16)
+        for section, colors in self._colors:
+            offset = self._layout[section][0]
+            for i, color in enumerate(colors[:count]):
+                color.fromArray(data, offset + i * 3)
+
+    def release(self) -> None:
+        pass
+
+    def destroy(self) -> None:
+        self._py_array.destroy()
+
+
+class QuadBatch(JsObject):
+    # static/js/bridge.js, in Python
+    def __init__(self, py_array: Any, p5: Any = None) -> None:
+        super().__init__()
+        self._py_array: Any = py_array
+        self._p5: Any = p5
+
+    def draw(self, count: int) -> None:
+        p5: Any = self._p5 if self._p5 is not None else window
+        data: np.ndarray = self._py_array.getBuffer('f32').data._array
+        p5.beginShape(p5.QUADS)
+        for i in range(0, count * 40, 10):
+            p5.fill(*data[i + 2:i + 6])
+            p5.stroke(*data[i + 6:i + 10])
+            p5.vertex(data[i], data[i + 1])
+        p5.endShape()
+
+    def destroy(self) -> None:
+        self._py_array.destroy()
+
+
+class _Vector(JsObject):
+    # `p5.Vector`, as far as the sketches use it
+    def __init__(self, x: float = 0.0, y: float = 0.0, z: float = 0.0) -> None:
+        super().__init__(x=x, y=y, z=z)
+
+
+class Window(JsObject):
+    # Browser globals, plus p5.js' global-mode functions and constants
+    WEBGL = 'webgl'
+    P2D = 'p2d'
+    CENTER = 'center'
+    CORNER = 'corner'
+    SQUARE = 'butt'
+    CLOSE = 'close'
+    QUADS = 'quads'
+    TRIANGLES = 'triangles'
+
+    def __init__(self, width: int, height: int, search: str, seed: int | None) -> None:
+        super().__init__(
+            innerWidth=width, innerHeight=height,
+            windowWidth=width, windowHeight=height,
+            width=width, height=height,
+            devicePixelRatio=1.0,
+            location=JsObject(search=search, href=f'http://localhost/{search}'),
+            performance=performance,
+            frameCount=0)
+        self._rng: _random.Random = _random.Random(seed)
+        self._listeners: dict[str, list[Callable[..., Any]]] = {}
+        self._start_ms: float = CLOCK.now
+
+    # Browser
+    def requestAnimationFrame(self, callback: Callable[..., Any]) -> int:
+        FRAMES.pending.append(callback)
+        return len(FRAMES.pending)
+
+    def cancelAnimationFrame(self, handle: int) -> None:
+        if 0 < handle <= len(FRAMES.pending):
+            FRAMES.pending[handle - 1] = lambda *args: None
+
+    def addEventListener(self, event: str, listener: Callable[..., Any], *args: Any) -> None:
+        self._listeners.setdefault(event, []).append(listener)
+
+    def removeEventListener(self, event: str, listener: Callable[..., Any], *args: Any) -> None:
+        listeners: list[Callable[..., Any]] = self._listeners.get(event, [])
+        if listener in listeners:
+            listeners.remove(listener)
+
+    def _dispatch(self, event: str, payload: Any = None) -> None:
+        for listener in list(self._listeners.get(event, [])):
+            listener(payload if payload is not None else JsObject(type=event))
+
+    # p5.js: environment
+    def createCanvas(self, width: int, height: int, renderer: str = 'p2d') -> P5Element:
+        self._props.update(width=width, height=height)
+        allocate()
+        return P5Element(Element('canvas', width=width, height=height))
+
+    def frameRate(self, rate: float | None = None) -> float:
+        return 60.0
+
+    def millis(self) -> float:
+        return CLOCK.now - self._start_ms
+
+    def createGraphics(self, width: int, height: int, renderer: str = 'p2d') -> Graphics:
+        allocate()
+        return Graphics(width, height)
+
+    def setAttributes(self, *args: Any) -> None:
+        pass
+
+    # p5.js: math
+    def random(self, low: Any = None, high: Any = None) -> Any:
+        if low is None:
+            return self._rng.random()
+        if isinstance(low, (list, tuple)):
+            return self._rng.choice(low)
+        if high is None:
+            low, high = 0.0, low
+        return low + self._rng.random() * (high - low)
+
+    def randomSeed(self, seed: int) -> None:
+        self._rng.seed(seed)
+
+    def createVector(self, x: float = 0.0, y: float = 0.0, z: float = 0.0) -> _Vector:
+        allocate()
+        return _Vector(x, y, z)
+
+    # p5.js: color
+    def color(self, *args: Any) -> JsObject:
+        allocate()
+        return JsObject(levels=list(args))
+
+    def lerpColor(self, start: Any, end: Any, amount: float) -> JsObject:
+        allocate()
+        return JsObject(levels=[])
+
+    # p5.js: drawing state
+    def background(self, *args: Any) -> None:
+        STATS.draw_calls += 1
+
+    def push(self) -> None:
+        pass
+
+    def pop(self) -> None:
+        pass
+
+    def fill(self, *args: Any) -> None:
+        pass
+
+    def noFill(self) -> None:
+        pass
+
+    def stroke(self, *args: Any) -> None:
+        pass
+
+    def noStroke(self) -> None:
+        pass
+
+    def strokeWeight(self, weight: float) -> None:
+        pass
+
+    def rectMode(self, mode: str) -> None:
+        pass
+
+    def translate(self, *args: float) -> None:
+        pass
+
+    def rotate(self, angle: float, *args: Any) -> None:
+        pass
+
+    def image(self, *args: Any) -> None:
+        # A textured quad
+        STATS.draw_calls += 1
+        STATS.triangles += 2
+
+    # p5.js: shapes. Each is a draw call in immediate mode
+    def rect(self, *args: float) -> None:
+        STATS.draw_calls += 1
+        STATS.triangles += 2
+
+    def ellipse(self, *args: float) -> None:
+        STATS.draw_calls += 1
+        STATS.triangles += 25
+
+    def circle(self, *args: float) -> None:
+        STATS.draw_calls += 1
+        STATS.triangles += 25
+
+    def beginShape(self, kind: Any = None) -> None:
+        self._shape_vertices: int = 0
+        self._shape_kind: Any = kind
+
+    def vertex(self, *args: float) -> None:
+        self._shape_vertices += 1
+
+    def endShape(self, *args: Any) -> None:
+        STATS.draw_calls += 1
+        per: int = 4 if self._shape_kind == self.QUADS else 3
+        STATS.triangles += self._shape_vertices // per * (2 if per == 4 else 1)
+
+
+def tick(ms: float) -> int:
+    # Advance the clock by `ms` and run a frame's worth of callbacks; returns
+    # how many were called
+    CLOCK.advance(ms)
+    window._props['frameCount'] = window._get('frameCount') + 1
+    for worker in list(Worker._LIVE):
+        worker._deliver()
+    return FRAMES.run(CLOCK.now)
+
+
+def reset(search: str = '', width: int = 1280, height: int = 720,
+          seed: int | None = None) -> None:
+    # A fresh browser: call before (re)importing a sketch
+    global document
+    global window
+
+    for worker in list(Worker._LIVE):
+        worker.terminate()
+    CLOCK.now = 0.0
+    FRAMES.reset()
+    document = Document()
+    window = Window(width, height, search, seed)
+    STATS.reset()
+
+
+performance: Performance = Performance()
+Object: _Object = _Object()
+console: JsObject = JsObject(log=lambda *args: None)
+document: Document = Document()
+window: Window = Window(1280, 720, '', None)
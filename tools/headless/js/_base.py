@@ -0,0 +1,212 @@
+# Plumbing shared by the `js`, `js.three` and `pyodide.ffi` stand-ins: a
+# generic fake JS object that counts every FFI crossing made through it, the
+# counters themselves, a virtual clock, and the queue of frame callbacks.
+#
+# Only crossings *from Python* count. Once a stand-in method is running it
+# plays the part of JS, so whatever it does to other stand-ins (a renderer
+# walking the scene, say) is free, as it would be in the browser.
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import functools
+import threading
+import time
+
+from typing import Any, Callable
+
+
+class Stats():
+    # What a sketch did to "JS" since the last `reset()`. In pyodide each
+    # get, set and call on a JsProxy is a trip across the FFI.
+    def __init__(self) -> None:
+        # Per thread: a stand-in `Worker` runs on its own
+        self._local: threading.local = threading.local()
+        self.reset()
+
+    def reset(self) -> None:
+        self.gets: int = 0
+        self.sets: int = 0
+        self.calls: int = 0
+        # JS objects created from Python: `X.new()`, `p5.color()`, ...
+        self.allocations: int = 0
+        self.proxies_created: int = 0
+        self.proxies_destroyed: int = 0
+        # Filled in by the fake renderers
+        self.draw_calls: int = 0
+        self.triangles: int = 0
+        # Time spent inside the stand-ins, which isn't the sketch's
+        self.js_seconds: float = 0.0
+
+    @property
+    def depth(self) -> int:
+        # > 0 while a stand-in (i.e. "JS") is running
+        return getattr(self._local, 'depth', 0)
+
+    @depth.setter
+    def depth(self, value: int) -> None:
+        self._local.depth = value
+
+    @property
+    def counting(self) -> bool:
+        # Only the page's crossings: a worker's are its own thread's business
+        return self.depth == 0 and threading.current_thread() is threading.main_thread()
+
+    @property
+    def ffi_calls(self) -> int:
+        return self.gets + self.sets + self.calls
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            'ffi_calls': self.ffi_calls,
+            'gets': self.gets,
+            'sets': self.sets,
+            'calls': self.calls,
+            'allocations': self.allocations,
+            'proxies_created': self.proxies_created,
+            'proxies_destroyed': self.proxies_destroyed,
+            'draw_calls': self.draw_calls,
+            'triangles': self.triangles,
+            'js_seconds': self.js_seconds,
+        }
+
+
+STATS = Stats()
+
+
+class Clock():
+    # Virtual `performance.now()`, in ms; the bench runner advances it
+    def __init__(self) -> None:
+        self.now: float = 0.0
+
+    def advance(self, ms: float) -> None:
+        self.now += ms
+
+
+CLOCK = Clock()
+
+
+class Frames():
+    # Everything the browser would call on the next frame
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        # `renderer.setAnimationLoop()` callbacks, called every frame
+        self.loops: list[Callable[..., Any]] = []
+        # One-shot `requestAnimationFrame()` callbacks
+        self.pending: list[Callable[..., Any]] = []
+
+    def run(self, timestamp: float) -> int:
+        # Call this frame's callbacks; ones queued meanwhile wait for the next
+        pending, self.pending = self.pending, []
+        for callback in self.loops + pending:
+            callback(timestamp)
+        return len(self.loops) + len(pending)
+
+
+FRAMES = Frames()
+
+
+def js_side(function: Callable[..., Any]) -> Callable[..., Any]:
+    # Run `function` as JS: called from Python it's one FFI call, and nothing
+    # it does counts
+    @functools.wraps(function)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if not STATS.counting:
+            return function(*args, **kwargs)
+        STATS.calls += 1
+        STATS.depth += 1
+        start: float = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            STATS.js_seconds += time.perf_counter() - start
+            STATS.depth -= 1
+    return wrapper
+
+
+def allocate(count: int = 1) -> None:
+    if STATS.counting:
+        STATS.allocations += count
+
+
+class _Undefined():
+    # What reading a property nobody set gives you: falsy like `undefined`,
+    # but callable as a no-op, so unmodelled JS methods don't need a stand-in
+    def __bool__(self) -> bool:
+        return False
+
+    def __call__(self, *args: Any, **kwargs: Any) -> None:
+        if STATS.counting:
+            STATS.calls += 1
+        return None
+
+    def __repr__(self) -> str:
+        return 'undefined'
+
+
+UNDEFINED = _Undefined()
+
+
+class JsObject():
+    # Generic fake JS object. Public methods defined on subclasses are JS
+    # methods: calling one from Python is a get plus a call. Every other
+    # public attribute is a JS property, stored in `_props`; reading one
+    # nobody set gives `UNDEFINED`.
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        for name, value in list(vars(cls).items()):
+            if (not name.startswith('_') and callable(value)
+                    and not isinstance(value, (type, classmethod, staticmethod))):
+                setattr(cls, name, js_side(value))
+
+    def __init__(self, **props: Any) -> None:
+        object.__setattr__(self, '_props', dict(props))
+
+    @classmethod
+    def new(cls, *args: Any, **kwargs: Any) -> Any:
+        # `Foo.new(...)`, as pyodide spells JS `new Foo(...)`
+        allocate()
+        if not STATS.counting:
+            return cls(*args, **kwargs)
+        STATS.depth += 1
+        try:
+            return cls(*args, **kwargs)
+        finally:
+            STATS.depth -= 1
+
+    def __getattribute__(self, name: str) -> Any:
+        if name.startswith('_'):
+            return object.__getattribute__(self, name)
+        if STATS.counting:
+            STATS.gets += 1
+        props: dict[str, Any] = object.__getattribute__(self, '_props')
+        if name in props:
+            return props[name]
+        try:
+            return object.__getattribute__(self, name)
+        except AttributeError:
+            return UNDEFINED
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name.startswith('_'):
+            object.__setattr__(self, name, value)
+            return
+        if STATS.counting:
+            STATS.sets += 1
+        self._props[name] = value
+
+    def _get(self, name: str, default: Any = None) -> Any:
+        return self._props.get(name, default)
+
+    def __repr__(self) -> str:
+        return f'<{type(self).__name__}>'
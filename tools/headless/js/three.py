@@ -0,0 +1,443 @@
+# Stand-in for `js.three` (three.js r154, as the sketches load it): the
+# scene graph, the geometries and materials they use, and a renderer whose
+# `render()` counts draw calls and triangles the way `renderer.info` does.
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any, Callable, Iterator
+
+import numpy as np
+
+from js import Element, Float32Array
+from js._base import FRAMES, STATS, JsObject
+
+FrontSide = 0
+BackSide = 1
+DoubleSide = 2
+StaticDrawUsage = 35044
+DynamicDrawUsage = 35048
+
+
+class Vector3(JsObject):
+    def __init__(self, x: float = 0.0, y: float = 0.0, z: float = 0.0) -> None:
+        super().__init__(x=x, y=y, z=z)
+
+    def set(self, x: float, y: float, z: float) -> 'Vector3':
+        self._props.update(x=x, y=y, z=z)
+        return self
+
+    def copy(self, other: 'Vector3') -> 'Vector3':
+        self._props.update(x=other._get('x'), y=other._get('y'), z=other._get('z'))
+        return self
+
+    def setScalar(self, value: float) -> 'Vector3':
+        self._props.update(x=value, y=value, z=value)
+        return self
+
+
+class Euler(Vector3):
+    pass
+
+
+class Color(JsObject):
+    def __init__(self, *args: Any) -> None:
+        super().__init__(r=1.0, g=1.0, b=1.0)
+        if len(args) == 1 and isinstance(args[0], int):
+            self._set_hex(args[0])
+        elif len(args) == 3:
+            self._props.update(r=args[0], g=args[1], b=args[2])
+
+    def _set_hex(self, value: int) -> None:
+        # sRGB hex -> linear, as `ColorManagement` does
+        srgb: np.ndarray = np.array([(value >> 16) & 0xff, (value >> 8) & 0xff, value & 0xff]) / 255
+        linear: np.ndarray = np.where(srgb < 0.04045, srgb * 0.0773993808,
+                                      (srgb * 0.9478672986 + 0.0521327014) ** 2.4)
+        self._props.update(r=float(linear[0]), g=float(linear[1]), b=float(linear[2]))
+
+    def set(self, value: Any) -> 'Color':
+        if isinstance(value, Color):
+            self._props.update(r=value._get('r'), g=value._get('g'), b=value._get('b'))
+        else:
+            self._set_hex(int(value))
+        return self
+
+    def setHex(self, value: int) -> 'Color':
+        self._set_hex(value)
+        return self
+
+    def setRGB(self, r: float, g: float, b: float) -> 'Color':
+        self._props.update(r=r, g=g, b=b)
+        return self
+
+    def fromArray(self, array: Any, offset: int = 0) -> 'Color':
+        values: Any = array._array if isinstance(array, Float32Array) else array
+        self._props.update(r=float(values[offset]), g=float(values[offset + 1]),
+                           b=float(values[offset + 2]))
+        return self
+
+    def lerpColors(self, start: 'Color', end: 'Color', alpha: float) -> 'Color':
+        for channel in 'rgb':
+            self._props[channel] = start._get(channel) + (end._get(channel) - start._get(channel)) * alpha
+        return self
+
+
+class Matrix4(JsObject):
+    def __init__(self) -> None:
+        super().__init__()
+        self._elements: np.ndarray = np.eye(4, dtype=np.float64).reshape(16)
+
+    @property
+    def elements(self) -> np.ndarray:
+        return self._elements
+
+    def fromArray(self, array: Any, offset: int = 0) -> 'Matrix4':
+        values: Any = array._array if isinstance(array, Float32Array) else np.asarray(array)
+        self._elements[:] = values[offset:offset + 16]
+        return self
+
+    def identity(self) -> 'Matrix4':
+        self._elements[:] = np.eye(4).reshape(16)
+        return self
+
+
+class BufferAttribute(JsObject):
+    def __init__(self, array: Any, item_size: int, normalized: bool = False) -> None:
+        if not isinstance(array, Float32Array):
+            array = Float32Array(array)
+        super().__init__(array=array, itemSize=item_size, normalized=normalized,
+                         needsUpdate=False, usage=StaticDrawUsage,
+                         updateRange=JsObject(offset=0, count=-1))
+
+    @property
+    def count(self) -> int:
+        return len(self._get('array')) // self._get('itemSize')
+
+    def setUsage(self, usage: int) -> 'BufferAttribute':
+        self._props['usage'] = usage
+        return self
+
+    def setXYZ(self, index: int, x: float, y: float, z: float) -> 'BufferAttribute':
+        array: np.ndarray = self._get('array')._array
+        size: int = self._get('itemSize')
+        array[index * size:index * size + 3] = (x, y, z)
+        return self
+
+
+class InstancedBufferAttribute(BufferAttribute):
+    pass
+
+
+class BufferGeometry(JsObject):
+    def __init__(self) -> None:
+        super().__init__(index=None, drawRange=JsObject(start=0, count=float('inf')))
+        self._attributes: dict[str, BufferAttribute] = {}
+
+    @property
+    def attributes(self) -> dict[str, BufferAttribute]:
+        return self._attributes
+
+    def setAttribute(self, name: str, attribute: BufferAttribute) -> 'BufferGeometry':
+        self._attributes[name] = attribute
+        return self
+
+    def getAttribute(self, name: str) -> Any:
+        return self._attributes.get(name)
+
+    def setIndex(self, index: Any) -> 'BufferGeometry':
+        if isinstance(index, list):
+            index = BufferAttribute(index, 1)
+        self._props['index'] = index
+        return self
+
+    def setDrawRange(self, start: int, count: int) -> None:
+        self._props['drawRange'] = JsObject(start=start, count=count)
+
+    def computeBoundingSphere(self) -> None:
+        pass
+
+    def dispose(self) -> None:
+        pass
+
+    def _vertex_count(self) -> int:
+        # What a draw call would draw
+        index: Any = self._get('index')
+        count: int = index.count if index is not None else (
+            self._attributes['position'].count if 'position' in self._attributes else 0)
+        draw_range: JsObject = self._get('drawRange')
+        return int(min(count, draw_range._get('count')))
+
+
+class InstancedBufferGeometry(BufferGeometry):
+    def __init__(self) -> None:
+        super().__init__()
+        self._props['instanceCount'] = float('inf')
+
+
+class BoxGeometry(BufferGeometry):
+    # 6 faces x 2 triangles; 24 vertices, as in three
+    def __init__(self, width: float = 1.0, height: float = 1.0, depth: float = 1.0, *args: Any) -> None:
+        super().__init__()
+        self._attributes['position'] = BufferAttribute([0.0] * 72, 3)
+        self._props['index'] = BufferAttribute([0] * 36, 1)
+        self._edges: int = 12
+
+
+class PlaneGeometry(BufferGeometry):
+    def __init__(self, width: float = 1.0, height: float = 1.0, *args: Any) -> None:
+        super().__init__()
+        self._attributes['position'] = BufferAttribute([0.0] * 12, 3)
+        self._props['index'] = BufferAttribute([0] * 6, 1)
+        self._edges: int = 4
+
+
+class EdgesGeometry(BufferGeometry):
+    def __init__(self, geometry: BufferGeometry, *args: Any) -> None:
+        super().__init__()
+        edges: int = getattr(geometry, '_edges', 0)
+        self._attributes['position'] = BufferAttribute([0.0] * edges * 6, 3)
+
+
+class Material(JsObject):
+    def __init__(self, **parameters: Any) -> None:
+        super().__init__(transparent=False, opacity=1.0, visible=True, needsUpdate=False)
+        color: Any = parameters.pop('color', 0xffffff)
+        self._props['color'] = color if isinstance(color, Color) else Color(color)
+        self._props.update(parameters)
+
+    def setValues(self, **parameters: Any) -> None:
+        self._props.update(parameters)
+
+    def dispose(self) -> None:
+        pass
+
+
+class MeshBasicMaterial(Material):
+    pass
+
+
+class MeshLambertMaterial(Material):
+    pass
+
+
+class LineBasicMaterial(Material):
+    pass
+
+
+class PointsMaterial(Material):
+    pass
+
+
+class ShaderMaterial(Material):
+    pass
+
+
+class Object3D(JsObject):
+    DEFAULT_UP: Vector3 = Vector3(0, 1, 0)
+
+    def __init__(self) -> None:
+        super().__init__(position=Vector3(), rotation=Euler(), scale=Vector3(1, 1, 1),
+                         matrix=Matrix4(), matrixAutoUpdate=True,
+                         matrixWorldNeedsUpdate=False, visible=True,
+                         frustumCulled=True, renderOrder=0, parent=None, userData=JsObject())
+        self._children: list[Object3D] = []
+
+    @property
+    def children(self) -> list['Object3D']:
+        return self._children
+
+    def add(self, *objects: 'Object3D') -> 'Object3D':
+        for obj in objects:
+            old_parent: Object3D | None = obj._get('parent')
+            if old_parent is not None:
+                old_parent._children.remove(obj)
+            obj._props['parent'] = self
+            self._children.append(obj)
+        return self
+
+    def remove(self, *objects: 'Object3D') -> 'Object3D':
+        for obj in objects:
+            if obj in self._children:
+                self._children.remove(obj)
+                obj._props['parent'] = None
+        return self
+
+    def clear(self) -> 'Object3D':
+        for obj in self._children:
+            obj._props['parent'] = None
+        self._children = []
+        return self
+
+    def lookAt(self, *args: Any) -> None:
+        pass
+
+    def updateMatrix(self) -> None:
+        pass
+
+    def updateMatrixWorld(self, *args: Any) -> None:
+        pass
+
+    def traverse(self, callback: Callable[..., Any]) -> None:
+        for obj in self._walk(False):
+            callback(obj)
+
+    def _walk(self, visible_only: bool = True) -> Iterator['Object3D']:
+        if visible_only and not self._get('visible'):
+            return
+        yield self
+        for child in self._children:
+            yield from child._walk(visible_only)
+
+
+class Group(Object3D):
+    pass
+
+
+class Scene(Object3D):
+    pass
+
+
+class _Drawable(Object3D):
+    # Anything the renderer makes a draw call for
+    TRIANGLES = True
+
+    def __init__(self, geometry: BufferGeometry | None = None, material: Material | None = None) -> None:
+        super().__init__()
+        self._props['geometry'] = geometry if geometry is not None else BufferGeometry()
+        self._props['material'] = material if material is not None else MeshBasicMaterial()
+
+    def _draw(self) -> tuple[int, int]:
+        # (draw calls, triangles)
+        geometry: BufferGeometry = self._get('geometry')
+        vertices: int = geometry._vertex_count()
+        instances: float = geometry._get('instanceCount', 1)
+        if instances == float('inf'):
+            instances = 1
+        triangles: int = vertices // 3 * int(instances) if self.TRIANGLES else 0
+        return (1, triangles)
+
+
+class Mesh(_Drawable):
+    pass
+
+
+class InstancedMesh(Mesh):
+    def __init__(self, geometry: BufferGeometry, material: Material, count: int) -> None:
+        super().__init__(geometry, material)
+        self._props['count'] = count
+        self._props['instanceMatrix'] = InstancedBufferAttribute(Float32Array(count * 16), 16)
+        self._props['instanceColor'] = None
+
+    def setMatrixAt(self, index: int, matrix: Matrix4) -> None:
+        self._get('instanceMatrix')._get('array')._array[index * 16:index * 16 + 16] = matrix._elements
+
+    def setColorAt(self, index: int, color: Color) -> None:
+        if self._get('instanceColor') is None:
+            self._props['instanceColor'] = InstancedBufferAttribute(
+                Float32Array(self._get('count') * 3), 3)
+        array: np.ndarray = self._get('instanceColor')._get('array')._array
+        array[index * 3:index * 3 + 3] = (color._get('r'), color._get('g'), color._get('b'))
+
+    def _draw(self) -> tuple[int, int]:
+        return (1, self._get('geometry')._vertex_count() // 3 * self._get('count'))
+
+
+class Line(_Drawable):
+    TRIANGLES = False
+
+
+class LineSegments(Line):
+    pass
+
+
+class Points(_Drawable):
+    TRIANGLES = False
+
+
+class Light(Object3D):
+    def __init__(self, color: Any = 0xffffff, intensity: float = 1.0) -> None:
+        super().__init__()
+        self._props.update(color=Color(color), intensity=intensity)
+
+
+class AmbientLight(Light):
+    pass
+
+
+class DirectionalLight(Light):
+    pass
+
+
+class PointLight(Light):
+    pass
+
+
+class PerspectiveCamera(Object3D):
+    def __init__(self, fov: float = 50, aspect: float = 1, near: float = 0.1, far: float = 2000) -> None:
+        super().__init__()
+        self._props.update(fov=fov, aspect=aspect, near=near, far=far)
+
+    def updateProjectionMatrix(self) -> None:
+        pass
+
+    def setFocalLength(self, length: float) -> None:
+        pass
+
+
+class WebGLRenderer(JsObject):
+    def __init__(self, **parameters: Any) -> None:
+        super().__init__(
+            domElement=Element('canvas'),
+            info=JsObject(
+                autoReset=True,
+                render=JsObject(frame=0, calls=0, triangles=0, points=0, lines=0),
+                memory=JsObject(geometries=0, textures=0)),
+            **parameters)
+        self._loop: Callable[..., Any] | None = None
+
+    def setPixelRatio(self, ratio: float) -> None:
+        self._props['pixelRatio'] = ratio
+
+    def getPixelRatio(self) -> float:
+        return self._props.get('pixelRatio', 1.0)
+
+    def setSize(self, width: int, height: int, *args: Any) -> None:
+        self._props.update(width=width, height=height)
+
+    def setClearColor(self, *args: Any) -> None:
+        pass
+
+    def setAnimationLoop(self, callback: Callable[..., Any] | None) -> None:
+        if self._loop is not None:
+            FRAMES.loops.remove(self._loop)
+        self._loop = callback
+        if callback is not None:
+            FRAMES.loops.append(callback)
+
+    def render(self, scene: Object3D, camera: Any) -> None:
+        info: JsObject = self._get('info')._get('render')
+        if self._get('info')._get('autoReset'):
+            info._props.update(calls=0, triangles=0)
+        info._props['frame'] = info._get('frame') + 1
+        calls: int = 0
+        triangles: int = 0
+        for obj in scene._walk():
+            if isinstance(obj, _Drawable):
+                obj_calls, obj_triangles = obj._draw()
+                calls += obj_calls
+                triangles += obj_triangles
+        info._props['calls'] = info._get('calls') + calls
+        info._props['triangles'] = info._get('triangles') + triangles
+        STATS.draw_calls += calls
+        STATS.triangles += triangles
+
+    def dispose(self) -> None:
+        self.setAnimationLoop(None)
@@ -0,0 +1,86 @@
+# Stand-in for `pyodide.ffi`: `create_proxy()` and `to_js()`, counted, and
+# proxies that behave like pyodide's when used after `destroy()`.
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Any, Callable
+
+import numpy as np
+
+from js import Float32Array
+from js._base import STATS, JsObject
+
+# For annotations: anything that came from JS
+JsProxy = JsObject
+
+
+class JsException(Exception):
+    pass
+
+
+class PyProxy(JsObject):
+    # What JS holds when it's handed a Python object with `create_proxy()`
+    def __init__(self, obj: Any) -> None:
+        super().__init__()
+        self._obj: Any = obj
+        self._destroyed: bool = False
+
+    def __call__(self, *args: Any) -> Any:
+        # JS calling back into Python
+        if self._destroyed:
+            raise JsException('Error: Object has already been destroyed')
+        return self._obj(*args)
+
+    def destroy(self) -> None:
+        if not self._destroyed:
+            self._destroyed = True
+            STATS.proxies_destroyed += 1
+
+    def getBuffer(self, kind: str = 'u8') -> JsObject:
+        # A view onto the NumPy array, not a copy
+        array: np.ndarray = self._obj
+        return JsObject(data=Float32Array(array.reshape(-1).view(np.float32)),
+                        release=lambda: None)
+
+
+def create_proxy(obj: Any) -> PyProxy:
+    STATS.proxies_created += 1
+    return PyProxy(obj)
+
+
+def create_once_callable(obj: Callable[..., Any]) -> PyProxy:
+    STATS.proxies_created += 1
+    proxy: PyProxy = PyProxy(obj)
+
+    def once(*args: Any) -> Any:
+        proxy.destroy()
+        return obj(*args)
+    proxy._obj = once
+    return proxy
+
+
+def to_js(obj: Any, dict_converter: Callable[..., Any] | None = None, **kwargs: Any) -> Any:
+    # A conversion is one trip across the FFI, and allocates
+    if STATS.counting:
+        STATS.calls += 1
+        STATS.allocations += 1
+    STATS.depth += 1
+    try:
+        if isinstance(obj, dict):
+            return dict_converter(list(obj.items())) if dict_converter else JsObject(**obj)
+        if isinstance(obj, np.ndarray) and obj.dtype == np.float32:
+            return Float32Array(obj.copy())
+        if isinstance(obj, (list, tuple)):
+            return list(obj)
+        return obj
+    finally:
+        STATS.depth -= 1
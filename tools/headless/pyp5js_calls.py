@@ -0,0 +1,178 @@
+# Microbenchmark for the Transcrypt pyp5js runtime's p5 function calls.
+#
+# The Transcrypt Orbiting Squares sketch calls p5 through the module-level
+# functions of its target/pyp5js.py. Each one used to be a wrapper,
+# `def rect(*args): return _P5_INSTANCE.rect(*args)`; `bind_methods()` now
+# replaces the ones sketches call every frame with the instance's bound
+# methods. This script loads pyp5js.py under CPython against a stand-in p5
+# instance whose methods do nothing, makes the p5 calls one frame of the
+# sketch makes (`draw()`, and `Square.draw()` for every square), and
+# reports what they cost through the wrappers and once bound (the median
+# frame's time, and per call).
+#
+#   python tools/headless/pyp5js_calls.py
+#   python tools/headless/pyp5js_calls.py --squares 1000 --frames 600
+#
+# Only the difference between the two is meaningful: in the browser it's the
+# Transcrypt-compiled wrappers' argument arrays and `_P5_INSTANCE` lookups
+# that go, and CPython's costs for those are only roughly alike.
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import functools
+import json
+import pathlib
+import re
+import statistics
+import sys
+import time
+import types
+
+from types import ModuleType
+from typing import Any
+
+HERE: pathlib.Path = pathlib.Path(__file__).resolve().parent
+TARGET: pathlib.Path = (HERE.parent.parent / 'pages' / 'orbitingsquares-transcrypt-pyp5js'
+                        / 'target')
+
+# The p5 functions `Square.draw()` calls for a square on screen, in order:
+# `_move()`'s, `_recolor()`'s and the drawing itself
+SQUARE_CALLS: tuple[str, ...] = ('sin', 'cos', 'atan2', 'cos', 'sin', 'abs', 'abs', 'int',
+                                 'constrain', 'constrain', 'stroke', 'fill', 'push',
+                                 'translate', 'rotate', 'rect', 'pop')
+# ...and `draw()`'s own, once a frame
+FRAME_CALLS: tuple[str, ...] = ('color', 'background')
+
+
+class _Function(functools.partial):
+    # A p5 method, as the page sees it: calling it calls it on its instance,
+    # and `bind()` makes a new function bound to `this`, as JS's does
+    def bind(self, this: Any) -> functools.partial:
+        return functools.partial(self.func, this)
+
+
+class _P5():
+    # The p5 instance: every method pyp5js.py asks for just counts its calls
+    def __init__(self) -> None:
+        self.calls: int = 0
+
+    def __getattr__(self, name: str) -> _Function:
+        # Only for methods not asked for before
+        method: _Function = _Function(_P5._method, self)
+        setattr(self, name, method)
+        return method
+
+    @staticmethod
+    def _method(this: '_P5', *args: Any) -> None:
+        this.calls += 1
+
+
+def load() -> ModuleType:
+    # pyp5js.py, fresh, with what it needs of p5.js. Its `__pragma__()`s are
+    # Transcrypt's compile-time directives, so they go: they cost nothing in
+    # the browser.
+    if str(TARGET) not in sys.path:
+        sys.path.insert(0, str(TARGET))
+    path: pathlib.Path = TARGET / 'pyp5js.py'
+    source: str = re.sub(r"__pragma__\(.*\)", 'pass', path.read_text())
+    module: ModuleType = types.ModuleType('pyp5js')
+    module.__file__ = str(path)
+    module.p5 = types.SimpleNamespace(Vector=types.SimpleNamespace(
+        dist=None, add=None, sub=None, mult=None, div=None, dot=None, cross=None, lerp=None,
+        random2D=None, random3D=None, angleBetween=None, fromAngle=None, fromAngles=None,
+        equals=None))
+    exec(compile(source, str(path), 'exec'), module.__dict__)
+    return module
+
+
+def frame(calls: tuple[list[Any], list[Any]], squares: int) -> float:
+    # ms for one frame's calls; `calls` are the functions the sketch would
+    # see, pyp5js.py's module globals, looked up once, as the sketch's
+    # imports are
+    frame_calls, square_calls = calls
+    start: float = time.perf_counter()
+    for function in frame_calls:
+        function(70, 71, 76)
+    for _ in range(squares):
+        for function in square_calls:
+            function(1.0, 2.0, 3.0, 4.0)
+    return (time.perf_counter() - start) * 1000
+
+
+def run(squares: int, frames: int) -> dict[str, Any]:
+    # The two alternate, frame by frame, so both see the same machine
+    labels: tuple[str, ...] = ('wrapped', 'bound')
+    instances: dict[str, _P5] = {}
+    calls: dict[str, tuple[list[Any], list[Any]]] = {}
+    for label in labels:
+        module: ModuleType = load()
+        instances[label] = module._P5_INSTANCE = _P5()
+        if label == 'bound':
+            module.bind_methods(instances[label])
+        calls[label] = ([getattr(module, name) for name in FRAME_CALLS],
+                        [getattr(module, name) for name in SQUARE_CALLS])
+    frame_ms: dict[str, list[float]] = {label: [] for label in labels}
+    for _ in range(frames):
+        for label in labels:
+            frame_ms[label].append(frame(calls[label], squares))
+    results: dict[str, Any] = {'squares': squares}
+    for label in labels:
+        per_frame: float = instances[label].calls / frames
+        median: float = statistics.median(frame_ms[label])
+        results[label] = {
+            'calls_per_frame': per_frame,
+            'frame_ms': median,
+            'ns_per_call': median * 1e6 / per_frame,
+        }
+    results['speedup'] = results['wrapped']['frame_ms'] / results['bound']['frame_ms']
+    return results
+
+
+def report(results: list[dict[str, Any]]) -> str:
+    header: tuple[str, ...] = ('squares', 'calls/frame', 'wrapped ms', 'bound ms',
+                               'wrapped ns/call', 'bound ns/call', 'speedup')
+    rows: list[tuple[str, ...]] = [header]
+    for result in results:
+        rows.append((
+            str(result['squares']),
+            f"{result['bound']['calls_per_frame']:.0f}",
+            f"{result['wrapped']['frame_ms']:.3f}",
+            f"{result['bound']['frame_ms']:.3f}",
+            f"{result['wrapped']['ns_per_call']:.0f}",
+            f"{result['bound']['ns_per_call']:.0f}",
+            f"{result['speedup']:.2f}x",
+        ))
+    widths: list[int] = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    return '\n'.join('  '.join(cell.rjust(width) for cell, width in zip(row, widths))
+                     for row in rows)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Compare pyp5js.py's wrapped and bound p5 function calls.")
+    parser.add_argument('--squares', action='append', type=int,
+                        help='squares on screen (repeatable; default: 100 and 1000)')
+    parser.add_argument('--frames', type=int, default=300, help='frames to run (default: 300)')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args: argparse.Namespace = parser.parse_args(argv)
+
+    results: list[dict[str, Any]] = [run(squares, args.frames)
+                                     for squares in (args.squares or [100, 1000])]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(report(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+# Checks Bouncy Bubbles' `?engine=worker` message protocol headlessly.
+#
+# Runs the sketch with its physics in the stand-in `js.Worker` (a thread; see
+# js/__init__.py), optionally drawing at a lower rate than the worker
+# simulates, and checks that:
+# - the page only ever draws newer snapshots, and at most two snapshot
+#   buffers exist (the worker's double buffer)
+# - buffers really move: one handed back to the worker is empty on the page
+# - each snapshot drawn is exactly `BallArrays`, run in-process from the same
+#   start for as many steps (to float32 rounding)
+# and reports snapshots received, superseded before they were drawn (dropped)
+# and the Python time of a frame, which no longer includes the physics.
+#
+#   python tools/headless/worker_protocol.py
+#   python tools/headless/worker_protocol.py --balls 1000 --render-hz 20
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import importlib
+import json
+import math
+import statistics
+import time
+
+from types import ModuleType
+from typing import Any
+
+import numpy as np
+
+import bench
+import js
+
+from js._base import STATS
+
+# The demo's canvas and bubble count, whose density is kept at every n
+BASE_BALLS = 13
+BASE_WIDTH = 720
+BASE_HEIGHT = 400
+
+
+def run(balls: int, frames: int, render_hz: float | None = None, seed: int = 0) -> dict[str, Any]:
+    scale: float = math.sqrt(balls / BASE_BALLS)
+    width: int = round(BASE_WIDTH * scale)
+    height: int = round(BASE_HEIGHT * scale)
+    search: str = f'?engine=worker&balls={balls}&width={width}&height={height}'
+    if render_hz is not None:
+        search += f'&render_hz={render_hz:g}'
+    module: ModuleType = bench.load(bench.SKETCHES['bouncy_bubbles'], search, seed)
+    client: Any = module.SIMULATION
+    # Imported by the sketch, from its directory
+    physics: ModuleType = importlib.import_module('physics')
+
+    start: np.ndarray = np.array([(ball.x, ball.y, ball.diameter) for ball in module.BALLS],
+                                 dtype=np.float32)
+    reference: Any = physics.BallArrays(start[:, 0], start[:, 1], start[:, 2], width, height)
+    reference_step: int = 0
+    expected: np.ndarray = np.zeros(2 * balls, dtype=np.float32)
+    worst_error: float = 0.0
+    buffers: set[int] = set()
+    drawn: list[int] = []
+    frame_ms: list[float] = []
+    # Time spent checking, which is this script's own work, not the frame's
+    checking: list[float] = [0.0]
+    latest = client.latest
+
+    def checked_latest() -> bool:
+        nonlocal reference_step, worst_error
+        pending: Any = client._pending
+        if pending is not None:
+            # The memory behind it, which moves between threads
+            buffers.add(id(pending._array))
+        if not latest():
+            return False
+        if len(pending._array) != 0:
+            raise AssertionError('a snapshot handed back to the worker is still readable')
+        if drawn and client.step <= drawn[-1]:
+            raise AssertionError(f'drew step {client.step} after step {drawn[-1]}')
+        drawn.append(client.step)
+        begin: float = time.perf_counter()
+        while reference_step < client.step:
+            reference.step(module.TIMESTEP.dt)
+            reference_step += 1
+        reference.write_snapshot(expected)
+        worst_error = max(worst_error, float(np.abs(client.values - expected).max()))
+        checking[0] += time.perf_counter() - begin
+        return True
+
+    client.latest = checked_latest
+    STATS.reset()
+    for _ in range(frames):
+        js_before: float = STATS.js_seconds
+        checking[0] = 0.0
+        begin: float = time.perf_counter()
+        js.tick(bench.FRAME_MS)
+        frame_ms.append((time.perf_counter() - begin - checking[0]
+                         - (STATS.js_seconds - js_before)) * 1000)
+    client.latest = latest
+    client.destroy()
+    if len(buffers) > 2:
+        raise AssertionError(f'{len(buffers)} snapshot buffers, not 2')
+    if worst_error > 1e-3:
+        raise AssertionError(f'snapshots are off by up to {worst_error} px')
+    return {
+        'balls': balls,
+        'render_hz': render_hz,
+        'snapshots_received': client.received,
+        'snapshots_dropped': client.dropped,
+        'snapshots_drawn': len(drawn),
+        'last_step': client.step,
+        'max_error_px': worst_error,
+        'frame_ms': statistics.fmean(frame_ms),
+    }
+
+
+def report(results: list[dict[str, Any]]) -> str:
+    header: tuple[str, ...] = ('balls', 'render Hz', 'received', 'dropped', 'drawn',
+                               'last step', 'max error px', 'ms/frame')
+    rows: list[tuple[str, ...]] = [header]
+    for result in results:
+        rows.append((
+            str(result['balls']),
+            'display' if result['render_hz'] is None else f"{result['render_hz']:g}",
+            str(result['snapshots_received']),
+            str(result['snapshots_dropped']),
+            str(result['snapshots_drawn']),
+            str(result['last_step']),
+            f"{result['max_error_px']:.1e}",
+            f"{result['frame_ms']:.3f}",
+        ))
+    widths: list[int] = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    return '\n'.join('  '.join(cell.rjust(width) for cell, width in zip(row, widths))
+                     for row in rows)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Check Bouncy Bubbles' physics worker protocol headlessly.")
+    parser.add_argument('--balls', action='append', type=int,
+                        help='bubble count (repeatable; default: 13 and 1000)')
+    parser.add_argument('--render-hz', type=float, help='cap drawing at this rate')
+    parser.add_argument('--frames', type=int, default=120, help='frames to run (default: 120)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args: argparse.Namespace = parser.parse_args(argv)
+
+    results: list[dict[str, Any]] = [run(balls, args.frames, args.render_hz, args.seed)
+                                     for balls in (args.balls or [13, 1000])]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(report(results))
+
+
+if __name__ == '__main__':
+    main()
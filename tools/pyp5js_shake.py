@@ -0,0 +1,360 @@
+# Tree-shakes pyp5js for the Transcrypt Orbiting Squares sketch.
+#
+# pyp5js.py wraps all of p5.js, and Transcrypt compiles every wrapper into
+# target/pyp5js.js, so each visitor downloads and parses ~250 of them to
+# call a couple of dozen. This reads the sketch, finds the pyp5js names it
+# uses (scope by scope, with `symtable`, so its own variables don't count)
+# and writes a trimmed build to compile instead:
+# - target_sketch.py, the sketch wrapped as pyp5js wraps it, but telling
+#   `start_p5()` which of p5's per-frame variables it reads, so `pre_draw()`
+#   only refreshes those
+# - pyp5js.py, with only the definitions those names need, directly or
+#   through each other. The functions that assign p5's constants and state
+#   (`bind_constants()`, `pre_draw()`...) keep only the assignments to names
+#   that are kept.
+# - python_functions.py, if anything kept still needs it
+# and reports what that saves, in the Python and (estimated from the current
+# target/pyp5js.js) in the compiled JS.
+#
+#   python tools/pyp5js_shake.py
+#   python tools/pyp5js_shake.py --out build/orbitingsquares --json
+#
+# Then compile the trimmed sketch, and copy its JS over the sketch's target/:
+#
+#   transcrypt -b -m -n build/orbitingsquares-transcrypt-pyp5js/target_sketch.py
+
+# Copyright 2022 Ben Alkov
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#   http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import ast
+import json
+import pathlib
+import re
+import shutil
+import symtable
+
+from typing import Any
+
+ROOT: pathlib.Path = pathlib.Path(__file__).resolve().parent.parent
+SKETCH_DIR: pathlib.Path = ROOT / 'pages' / 'orbitingsquares-transcrypt-pyp5js'
+
+# pyp5js's wrapping of a sketch into target_sketch.py
+HEADER: str = '''from pyp5js import *
+
+def preload():
+    pass
+
+def setup():
+    pass
+
+def draw():
+    pass
+
+deviceMoved = None
+deviceTurned = None
+deviceShaken = None
+keyPressed = None
+keyReleased = None
+keyTyped = None
+mouseMoved = None
+mouseDragged = None
+mousePressed = None
+mouseReleased = None
+mouseClicked = None
+doubleClicked = None
+mouseWheel = None
+touchStarted = None
+touchMoved = None
+touchEnded = None
+windowResized = None
+keyIsDown = None
+
+
+'''
+FOOTER: str = '''
+
+
+event_functions = {
+    "deviceMoved": deviceMoved,
+    "deviceTurned": deviceTurned,
+    "deviceShaken": deviceShaken,
+    "keyPressed": keyPressed,
+    "keyReleased": keyReleased,
+    "keyTyped": keyTyped,
+    "mouseMoved": mouseMoved,
+    "mouseDragged": mouseDragged,
+    "mousePressed": mousePressed,
+    "mouseReleased": mouseReleased,
+    "mouseClicked": mouseClicked,
+    "doubleClicked": doubleClicked,
+    "mouseWheel": mouseWheel,
+    "touchStarted": touchStarted,
+    "touchMoved": touchMoved,
+    "touchEnded": touchEnded,
+    "windowResized": windowResized,
+    "keyIsDown": keyIsDown,
+}
+
+'''
+# What the wrapping itself calls
+ENTRY_POINTS: frozenset[str] = frozenset({'start_p5'})
+
+# A top-level statement of the compiled pyp5js.js: `export var rect = ...`
+JS_EXPORT: re.Pattern[str] = re.compile(r'^export var (\w+) = ', re.M)
+# pyp5js.py's groups of per-frame variables, `_SIZE_STATE = ('width', ...)`
+STATE_GROUP: re.Pattern[str] = re.compile(r'_[A-Z]+_STATE')
+
+
+def wrap_sketch(source: str, state_names: list[str] | None = None) -> str:
+    # With `state_names`, `start_p5()` is told the per-frame variables the
+    # sketch reads (see pyp5js.py's `select_state()`)
+    start: str = 'start_p5(preload, setup, draw, event_functions'
+    if state_names is not None:
+        start += f', state_names={sorted(state_names)!r}'
+    return HEADER + source.rstrip('\n') + FOOTER + start + ')\n'
+
+
+def state_names(pyp5js_source: str, used: set[str]) -> list[str]:
+    # Which of `used` are per-frame variables, in one of pyp5js.py's
+    # `_*_STATE` groups
+    state: set[str] = set()
+    for node in ast.parse(pyp5js_source).body:
+        if (isinstance(node, ast.Assign) and len(node.targets) == 1
+                and isinstance(node.targets[0], ast.Name)
+                and STATE_GROUP.fullmatch(node.targets[0].id)):
+            state.update(ast.literal_eval(node.value))
+    return sorted(state & used)
+
+
+def global_names(source: str, filename: str) -> set[str]:
+    # The names `source` reads but doesn't define: what `from pyp5js import *`
+    # has to provide (or Python's builtins)
+    table: symtable.SymbolTable = symtable.symtable(source, filename, 'exec')
+    defined: set[str] = {symbol.get_name() for symbol in table.get_symbols()
+                         if symbol.is_assigned() or symbol.is_imported()}
+    used: set[str] = set()
+    scopes: list[symtable.SymbolTable] = [table]
+    while scopes:
+        scope: symtable.SymbolTable = scopes.pop()
+        module_scope: bool = scope.get_type() == 'module'
+        used.update(symbol.get_name() for symbol in scope.get_symbols()
+                    if symbol.is_referenced() and (module_scope or symbol.is_global()))
+        scopes.extend(scope.get_children())
+    return used - defined
+
+
+class Chunk():
+    # A top-level statement of pyp5js.py, with the comments and blank lines
+    # before it
+    def __init__(self, node: ast.stmt, lines: list[str], first: int) -> None:
+        self.node: ast.stmt = node
+        # Line numbers are 1-based, as `ast`'s; `first` is the chunk's
+        self.lines: list[str] = lines
+        self.first: int = first
+        self.defines: set[str] = _defined_by(node)
+
+    def render(self, kept: set[str]) -> str:
+        # The chunk, less a function's assignments to globals that aren't kept
+        if not isinstance(self.node, ast.FunctionDef):
+            return ''.join(self.lines)
+        deleted: set[int] = set()
+        replaced: dict[int, str] = {}
+        declared: set[str] = {name for node in self.node.body if isinstance(node, ast.Global)
+                              for name in node.names}
+        if _prune(self.node.body, declared - kept, deleted, replaced):
+            replaced[self.node.body[0].lineno] = ' ' * self.node.body[0].col_offset + 'pass\n'
+        return ''.join(replaced.get(number, line)
+                       for number, line in enumerate(self.lines, self.first)
+                       if number in replaced or number not in deleted)
+
+
+def _defined_by(node: ast.stmt) -> set[str]:
+    if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+        return {node.name}
+    if isinstance(node, ast.Assign):
+        return {target.id for target in node.targets if isinstance(target, ast.Name)}
+    if isinstance(node, ast.ImportFrom):
+        return {alias.asname or alias.name for alias in node.names}
+    return set()
+
+
+def _prune(body: list[ast.stmt], dropped: set[str], deleted: set[int],
+           replaced: dict[int, str]) -> bool:
+    # Marks the lines of `body`'s statements that only declare or assign
+    # `dropped` names, and of `if`s left with nothing to do; True if that's
+    # every statement
+    emptied: bool = True
+    for node in body:
+        lines: range = range(node.lineno, node.end_lineno + 1)
+        if isinstance(node, ast.Global):
+            names: list[str] = [name for name in node.names if name not in dropped]
+            if names:
+                replaced[node.lineno] = ' ' * node.col_offset + 'global ' + ', '.join(names) + '\n'
+                emptied = False
+            else:
+                deleted.update(lines)
+        elif (isinstance(node, ast.Assign) and len(node.targets) == 1
+              and isinstance(node.targets[0], ast.Name) and node.targets[0].id in dropped):
+            deleted.update(lines)
+        elif (isinstance(node, ast.If) and isinstance(node.test, ast.Name) and not node.orelse
+              and _prune(node.body, dropped, deleted, replaced)):
+            deleted.update(lines)
+        else:
+            emptied = False
+    return emptied
+
+
+def _loaded(source: str) -> set[str]:
+    return {node.id for node in ast.walk(ast.parse(source))
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)}
+
+
+def split(source: str) -> list[Chunk]:
+    lines: list[str] = source.splitlines(keepends=True)
+    chunks: list[Chunk] = []
+    first: int = 1
+    for node in ast.parse(source).body:
+        chunks.append(Chunk(node, lines[first - 1:node.end_lineno], first))
+        first = node.end_lineno + 1
+    if first <= len(lines):
+        # Trailing comments, kept with the last statement
+        chunks[-1].lines.extend(lines[first - 1:])
+    return chunks
+
+
+def shake(chunks: list[Chunk], roots: set[str]) -> tuple[set[str], list[str]]:
+    # The pyp5js names needed for `roots`, and the kept chunks' text. Pruning
+    # a function can drop what it read (`pre_draw()` loses the `if`s of state
+    # nobody reads), so this repeats until nothing more goes.
+    provided: set[str] = {name for chunk in chunks for name in chunk.defines}
+    kept: set[str] = provided
+    while True:
+        texts: list[str] = [chunk.render(kept) for chunk in chunks]
+        uses: list[set[str]] = [_loaded(text) & provided for text in texts]
+        needed: set[str] = set(roots & provided)
+        pending: list[str] = list(needed)
+        while pending:
+            name: str = pending.pop()
+            for chunk, used in zip(chunks, uses):
+                if name in chunk.defines:
+                    for dependency in used - needed:
+                        needed.add(dependency)
+                        pending.append(dependency)
+        if needed == kept:
+            break
+        kept = needed
+    kept_texts: list[str] = [
+        text for chunk, text, used in zip(chunks, texts, uses)
+        # Statements that define nothing (`setattr(PVector, ...)`) go with
+        # what they use
+        if chunk.defines & kept or (not chunk.defines and used <= kept)]
+    return kept, kept_texts
+
+
+def js_sizes(path: pathlib.Path) -> dict[str, int]:
+    # Bytes of each `export var` of a compiled module, up to the next one
+    if not path.exists():
+        return {}
+    source: str = path.read_text()
+    starts: list[re.Match[str]] = list(JS_EXPORT.finditer(source))
+    sizes: dict[str, int] = {}
+    for match, following in zip(starts, starts[1:] + [None]):
+        end: int = following.start() if following is not None else len(source)
+        sizes[match.group(1)] = sizes.get(match.group(1), 0) + end - match.start()
+    return sizes
+
+
+def run(sketch: pathlib.Path, target: pathlib.Path, out: pathlib.Path) -> dict[str, Any]:
+    source: str = sketch.read_text()
+    pyp5js_source: str = (target / 'pyp5js.py').read_text()
+    chunks: list[Chunk] = split(pyp5js_source)
+    provided: set[str] = {name for chunk in chunks for name in chunk.defines}
+    used: set[str] = global_names(wrap_sketch(source), 'target_sketch.py') & provided
+    state: list[str] = state_names(pyp5js_source, used)
+    wrapped: str = wrap_sketch(source, state)
+    kept, texts = shake(chunks, used | ENTRY_POINTS)
+    trimmed: str = ''.join(texts)
+    missing: set[str] = (used | ENTRY_POINTS) - kept
+    if missing:
+        raise RuntimeError(f"trimmed pyp5js.py doesn't define {', '.join(sorted(missing))}")
+    compile(trimmed, 'pyp5js.py', 'exec')
+    compile(wrapped, 'target_sketch.py', 'exec')
+
+    out.mkdir(parents=True, exist_ok=True)
+    (out / 'target_sketch.py').write_text(wrapped)
+    (out / 'pyp5js.py').write_text(trimmed)
+    if 'PythonFunctions' in kept:
+        shutil.copyfile(target / 'python_functions.py', out / 'python_functions.py')
+
+    js: dict[str, int] = js_sizes(target / 'pyp5js.js')
+    functions: list[str] = [chunk.node.name for chunk in chunks
+                            if isinstance(chunk.node, ast.FunctionDef)]
+    return {
+        'sketch': str(sketch.relative_to(ROOT)),
+        'out': str(out.relative_to(ROOT)) if out.is_relative_to(ROOT) else str(out),
+        'names_used': sorted(used),
+        'state_names': state,
+        'functions': len(functions),
+        'functions_kept': len([name for name in functions if name in kept]),
+        'py_lines': len(pyp5js_source.splitlines()),
+        'py_lines_kept': len(trimmed.splitlines()),
+        'py_bytes': len(pyp5js_source.encode()),
+        'py_bytes_kept': len(trimmed.encode()),
+        'js_bytes': (target / 'pyp5js.js').stat().st_size if js else 0,
+        # Everything not in a dropped name's `export var`
+        'js_bytes_kept_estimate': ((target / 'pyp5js.js').stat().st_size
+                                   - sum(size for name, size in js.items() if name not in kept)
+                                   if js else 0),
+    }
+
+
+def report(result: dict[str, Any]) -> str:
+    def saving(before: int, after: int) -> str:
+        return f'{before:>7} -> {after:>7}  (-{1 - after / before:.0%})'
+
+    rows: list[str] = [
+        f"{result['sketch']} uses {len(result['names_used'])} pyp5js names:",
+        '  ' + ', '.join(result['names_used']),
+        f"per-frame state read: {', '.join(result['state_names']) or 'none'}",
+        f"pyp5js.py functions  {saving(result['functions'], result['functions_kept'])}",
+        f"pyp5js.py lines      {saving(result['py_lines'], result['py_lines_kept'])}",
+        f"pyp5js.py bytes      {saving(result['py_bytes'], result['py_bytes_kept'])}",
+    ]
+    if result['js_bytes']:
+        rows.append(f"pyp5js.js bytes (est.) "
+                    f"{saving(result['js_bytes'], result['js_bytes_kept_estimate'])}")
+    rows.append(f"wrote {result['out']}")
+    return '\n'.join(rows)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description='Write a pyp5js build trimmed to what a Transcrypt sketch uses.')
+    parser.add_argument('--sketch', type=pathlib.Path, default=SKETCH_DIR / 'orbitingsquares.py',
+                        help='the sketch (default: the Transcrypt Orbiting Squares)')
+    parser.add_argument('--target', type=pathlib.Path, default=SKETCH_DIR / 'target',
+                        help="the full build's directory, with pyp5js.py (default: its target/)")
+    parser.add_argument('--out', type=pathlib.Path,
+                        default=ROOT / 'build' / SKETCH_DIR.name,
+                        help='where to write the trimmed build (default: build/<sketch dir>/)')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args: argparse.Namespace = parser.parse_args(argv)
+
+    result: dict[str, Any] = run(args.sketch.resolve(), args.target.resolve(), args.out.resolve())
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(report(result))
+
+
+if __name__ == '__main__':
+    main()